@@ -0,0 +1,149 @@
+# backend/app/blocking.py
+import logging
+import os
+import time
+from urllib.parse import urlparse
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from .metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+TRACKER_DOMAINS = {
+    "google-analytics.com", "googletagmanager.com", "googleadservices.com",
+    "doubleclick.net", "googlesyndication.com", "connect.facebook.net",
+    "hotjar.com", "segment.io", "segment.com", "mixpanel.com", "amplitude.com",
+    "fullstory.com", "clarity.ms", "intercom.io", "hs-analytics.net",
+    "hs-scripts.com", "quantserve.com", "scorecardresearch.com", "criteo.com",
+    "taboola.com", "outbrain.com", "adnxs.com", "ads-twitter.com", "bat.bing.com",
+}
+TRACKER_DOMAINS |= {d.strip() for d in os.getenv("BLOCKED_DOMAINS", "").split(",") if d.strip()}
+
+# Typical transfer size per resource type. Blocked requests are aborted before
+# any response, so what blocking saved can only be estimated from these.
+ESTIMATED_BYTES = {
+    "image": 40_000,
+    "media": 500_000,
+    "font": 30_000,
+    "stylesheet": 20_000,
+    "script": 30_000,
+    "xhr": 5_000,
+    "fetch": 5_000,
+}
+DEFAULT_ESTIMATED_BYTES = 10_000
+
+LOAD_TIME_BUCKETS_MS = (100, 250, 500, 1000, 2000, 5000, 10000, 30000)
+BYTES_SAVED_BUCKETS = (0, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000)
+
+# Policies with load metrics, one label value of each family
+POLICY_NAMES = ("content", "screenshot")
+load_time_ms = {name: Histogram("page_load_ms", "Page load time per resource policy", LOAD_TIME_BUCKETS_MS,
+                                {"policy": name}) for name in POLICY_NAMES}
+bytes_saved_estimate = {name: Histogram("page_blocked_bytes_estimate",
+                                        "Bytes blocked per page per resource policy, estimated from resource types",
+                                        BYTES_SAVED_BUCKETS, {"policy": name}) for name in POLICY_NAMES}
+
+
+def _env_set(name, default):
+    return {t.strip() for t in os.getenv(name, default).split(",") if t.strip()}
+
+
+class ResourcePolicy:
+    """
+    Which subresources a page may load, and how long to wait for it. Loads
+    are recorded under the policy's name if it is one of POLICY_NAMES.
+    """
+
+    def __init__(self, name, resource_types, domains=TRACKER_DOMAINS,
+                 wait_until="domcontentloaded", idle_timeout_ms=0):
+        self.name = name
+        self.resource_types = frozenset(resource_types)
+        self.domains = frozenset(domains)
+        self.wait_until = wait_until
+        self.idle_timeout_ms = idle_timeout_ms
+
+    def blocks(self, resource_type, url):
+        if resource_type in self.resource_types:
+            return True
+        host = urlparse(url).hostname or ""
+        # Match the domain and every parent domain against the blocklist
+        parts = host.split(".")
+        return any(".".join(parts[i:]) in self.domains for i in range(len(parts) - 1))
+
+
+# Pages we only read the DOM of
+CONTENT_POLICY = ResourcePolicy(
+    "content",
+    _env_set("CONTENT_BLOCKED_TYPES", "image,media,font,stylesheet"),
+    wait_until=os.getenv("CONTENT_WAIT_UNTIL", "domcontentloaded"),
+    idle_timeout_ms=int(os.getenv("CONTENT_IDLE_TIMEOUT_MS", "1000"))
+)
+# The homepage, which is rendered for its screenshot
+SCREENSHOT_POLICY = ResourcePolicy(
+    "screenshot",
+    _env_set("SCREENSHOT_BLOCKED_TYPES", "media"),
+    wait_until=os.getenv("SCREENSHOT_WAIT_UNTIL", "load"),
+    idle_timeout_ms=int(os.getenv("SCREENSHOT_IDLE_TIMEOUT_MS", "3000"))
+)
+
+
+class PageLoadStats:
+    """What a policy blocked on a single page"""
+
+    def __init__(self):
+        self.blocked = 0
+        self.bytes_saved_estimate = 0
+
+    def record(self, resource_type):
+        self.blocked += 1
+        self.bytes_saved_estimate += ESTIMATED_BYTES.get(resource_type, DEFAULT_ESTIMATED_BYTES)
+
+
+async def apply_policy(page, policy):
+    """Install route handlers on `page` enforcing `policy`"""
+    stats = PageLoadStats()
+
+    async def handle(route):
+        request = route.request
+        if policy.blocks(request.resource_type, request.url):
+            stats.record(request.resource_type)
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await page.route("**/*", handle)
+    return stats
+
+
+async def load_page(page, url, policy, timeout_ms=None):
+    """
+    Navigate with the policy's wait strategy and record what it saved.
+    `timeout_ms` bounds the navigation (Playwright's 30 s default otherwise).
+    """
+    stats = await apply_policy(page, policy)
+    started = time.monotonic()
+    if timeout_ms is None:
+        await page.goto(url, wait_until=policy.wait_until)
+    else:
+        await page.goto(url, wait_until=policy.wait_until, timeout=timeout_ms)
+    if policy.idle_timeout_ms:
+        # Give late content a short chance to settle without waiting on every beacon
+        try:
+            await page.wait_for_load_state("networkidle", timeout=policy.idle_timeout_ms)
+        except PlaywrightTimeoutError:
+            pass
+    elapsed_ms = (time.monotonic() - started) * 1000
+
+    if policy.name in load_time_ms:
+        load_time_ms[policy.name].observe(elapsed_ms)
+        bytes_saved_estimate[policy.name].observe(stats.bytes_saved_estimate)
+    logger.info(
+        f"Loaded {url} in {elapsed_ms:.0f} ms ({policy.name} policy), "
+        f"blocked {stats.blocked} requests, ~{stats.bytes_saved_estimate // 1024} KB saved (estimated)"
+    )
+    return stats
+
+
+def log_load_histograms():
+    for name in POLICY_NAMES:
+        logger.info(f"{name} policy: {load_time_ms[name].summary()}")
+        logger.info(f"{name} policy: {bytes_saved_estimate[name].summary()}")
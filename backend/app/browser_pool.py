@@ -0,0 +1,269 @@
+# backend/app/browser_pool.py
+import asyncio
+import logging
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+
+try:
+    import psutil
+except ImportError:  # RSS based recycling is skipped without psutil
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+MAX_PAGES_PER_BROWSER = int(os.getenv("BROWSER_MAX_PAGES", "500"))
+MAX_BROWSER_RSS_MB = int(os.getenv("BROWSER_MAX_RSS_MB", "1024"))
+# A leased browser's memory is checked every this many pages
+RSS_CHECK_PAGES = int(os.getenv("BROWSER_RSS_CHECK_PAGES", "25"))
+# A recycled browser is closed once its open pages are, or after this long
+DRAIN_SECONDS = float(os.getenv("BROWSER_DRAIN_SECONDS", "60"))
+
+# Passed to every Chromium we launch so its process tree can be found for RSS checks
+MARKER_ARG = "--email3-pool-marker"
+
+
+class PooledBrowser:
+    """One warm Chromium plus its browser context"""
+
+    def __init__(self, slot_id):
+        self.slot_id = slot_id
+        self.browser = None
+        self.context = None
+        self.marker = None
+        self.pages = 0
+        self.rss_checked_at = 0
+        # Pages of the current browser not closed yet
+        self.open_pages = set()
+        self.crashed = False
+        self.lock = asyncio.Lock()
+
+    @property
+    def healthy(self):
+        return self.browser is not None and not self.crashed and self.browser.is_connected()
+
+
+class BrowserLease:
+    """
+    A job's hold on a pooled browser. Every page opens in whatever browser
+    the slot holds by then: one that crashed is restarted, and one past its
+    page or memory limit is swapped for a fresh one mid-job.
+    """
+
+    def __init__(self, pool, slot):
+        self._pool = pool
+        self._slot = slot
+
+    async def new_page(self):
+        await self._pool._refresh(self._slot)
+        return await self._slot.context.new_page()
+
+
+class BrowserPool:
+    """Fixed-size pool of warm Chromium browsers leased out to crawl jobs"""
+
+    def __init__(self, size=POOL_SIZE, max_pages=MAX_PAGES_PER_BROWSER,
+                 max_rss_mb=MAX_BROWSER_RSS_MB, launch_options=None):
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.launch_options = launch_options or {}
+        self._playwright = None
+        self._slots = []
+        self._idle = None
+        self._draining = set()
+        self._stats = {
+            "leases": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "recycles": 0,
+            "restarts": 0,
+        }
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        """Start Playwright and launch all browsers in the pool"""
+        if self._playwright is not None:
+            return
+        self._playwright = await async_playwright().start()
+        self._idle = asyncio.Queue()
+        self._slots = [PooledBrowser(i) for i in range(self.size)]
+        for slot in self._slots:
+            await self._launch(slot)
+            self._idle.put_nowait(slot)
+        logger.info(f"Browser pool started with {self.size} browsers")
+
+    async def close(self):
+        """Close every browser and stop Playwright"""
+        for task in list(self._draining):
+            task.cancel()
+        await asyncio.gather(*self._draining, return_exceptions=True)
+        for slot in self._slots:
+            await self._shutdown(slot)
+        self._slots = []
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    @asynccontextmanager
+    async def lease(self):
+        """Lease a browser for the duration of a job; pages are opened with the lease's new_page()"""
+        if self._playwright is None:
+            raise RuntimeError("Browser pool is not started")
+
+        started = time.monotonic()
+        if self._idle.empty():
+            self._stats["waits"] += 1
+        slot = await self._idle.get()
+        self._stats["wait_seconds"] += time.monotonic() - started
+        self._stats["leases"] += 1
+
+        try:
+            if not slot.healthy:
+                await self._restart(slot)
+            yield BrowserLease(self, slot)
+        finally:
+            try:
+                await self._release(slot)
+            finally:
+                self._idle.put_nowait(slot)
+
+    def stats(self):
+        """Pool counters used for sizing"""
+        in_use = len(self._slots) - (self._idle.qsize() if self._idle else 0)
+        return {
+            **self._stats,
+            "size": self.size,
+            "in_use": in_use,
+            "pages": {slot.slot_id: slot.pages for slot in self._slots},
+        }
+
+    async def _release(self, slot):
+        if not slot.healthy:
+            await self._restart(slot)
+            return
+
+        reason = self._recycle_reason(slot, check_rss=True)
+        if reason:
+            logger.info(f"Recycling browser {slot.slot_id} after {reason}")
+            self._stats["recycles"] += 1
+            await self._shutdown(slot)
+            await self._launch(slot)
+
+    async def _refresh(self, slot):
+        """Before a leased slot opens a page: restart it if it crashed, recycle it if it's spent"""
+        async with slot.lock:
+            if not slot.healthy:
+                await self._restart(slot)
+                return
+            check_rss = slot.pages - slot.rss_checked_at >= RSS_CHECK_PAGES
+            reason = self._recycle_reason(slot, check_rss)
+            if reason:
+                await self._retire(slot, reason)
+
+    def _recycle_reason(self, slot, check_rss):
+        if self.max_pages and slot.pages >= self.max_pages:
+            return f"{slot.pages} pages"
+        if check_rss and self.max_rss_mb:
+            slot.rss_checked_at = slot.pages
+            rss = self._rss_mb(slot)
+            if rss is not None and rss >= self.max_rss_mb:
+                return f"{rss:.0f} MB RSS"
+        return None
+
+    async def _retire(self, slot, reason):
+        """Swap a fresh browser into a leased slot; the old one closes once its pages are done"""
+        logger.info(f"Recycling browser {slot.slot_id} after {reason}")
+        self._stats["recycles"] += 1
+        browser, open_pages = slot.browser, slot.open_pages
+        await self._launch(slot)
+        task = asyncio.create_task(self._close_when_idle(slot.slot_id, browser, open_pages))
+        self._draining.add(task)
+        task.add_done_callback(self._draining.discard)
+
+    async def _close_when_idle(self, slot_id, browser, open_pages):
+        deadline = time.monotonic() + DRAIN_SECONDS
+        try:
+            while open_pages and time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+        finally:
+            try:
+                await browser.close()
+            except Exception as e:
+                logger.warning(f"Error closing browser {slot_id}: {str(e)}")
+
+    async def _restart(self, slot):
+        logger.warning(f"Restarting crashed browser {slot.slot_id}")
+        self._stats["restarts"] += 1
+        await self._shutdown(slot)
+        await self._launch(slot)
+
+    async def _launch(self, slot):
+        options = dict(self.launch_options)
+        slot.marker = uuid.uuid4().hex
+        options["args"] = [*options.get("args", []), f"{MARKER_ARG}={slot.marker}"]
+
+        browser = await self._playwright.chromium.launch(**options)
+        slot.browser = browser
+        slot.context = await browser.new_context()
+        slot.pages = slot.rss_checked_at = 0
+        slot.crashed = False
+        open_pages = slot.open_pages = set()
+
+        def on_disconnected(_):
+            # A recycled browser closing isn't a crash of the slot's current one
+            if slot.browser is browser:
+                slot.crashed = True
+
+        def on_page(page):
+            slot.pages += 1
+            open_pages.add(page)
+            page.on("close", open_pages.discard)
+
+        slot.browser.on("disconnected", on_disconnected)
+        slot.context.on("page", on_page)
+
+    async def _shutdown(self, slot):
+        browser, slot.browser, slot.context = slot.browser, None, None
+        if browser is None:
+            return
+        try:
+            await browser.close()
+        except Exception as e:
+            logger.warning(f"Error closing browser {slot.slot_id}: {str(e)}")
+
+    def _rss_mb(self, slot):
+        """Resident memory of the browser's process tree, or None if unknown"""
+        if psutil is None or not slot.marker:
+            return None
+        marker = f"{MARKER_ARG}={slot.marker}"
+        try:
+            for proc in psutil.Process().children(recursive=True):
+                if marker in proc.cmdline():
+                    tree = [proc, *proc.children(recursive=True)]
+                    return sum(p.memory_info().rss for p in tree) / (1024 * 1024)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+        return None
+
+
+_default_pool = None
+
+
+def get_browser_pool():
+    """Pool owned by the running app, if any"""
+    return _default_pool
+
+
+def set_browser_pool(pool):
+    global _default_pool
+    _default_pool = pool
@@ -2,17 +2,26 @@ import os
 import glob
 import time
 from apscheduler.schedulers.background import BackgroundScheduler
+from .crawl_cache import get_crawl_cache
+from .export_cache import get_export_cache
+from .host_health import get_host_health
+from .job_queue import get_job_queue
+from .screenshot import SCREENSHOT_DIR
 from .storage import db_connection
 
+# Screenshots are kept this long; export artifacts are bounded by size instead
+SCREENSHOT_MAX_AGE = 86400
+
 def cleanup_old_files():
-    """Delete temporary files older than 24 hours"""
+    """Delete screenshots older than 24 hours and trim the export cache"""
     now = time.time()
-    for file in glob.glob('/tmp/*'):
-        if os.path.isfile(file) and now - os.stat(file).st_mtime > 86400:  # 24 hours
+    for file in glob.glob(os.path.join(SCREENSHOT_DIR, '*')):
+        if os.path.isfile(file) and now - os.stat(file).st_mtime > SCREENSHOT_MAX_AGE:
             try:
                 os.remove(file)
             except Exception as e:
                 print(f"Error deleting file {file}: {str(e)}")
+    get_export_cache().evict()
 
 def cleanup_old_jobs():
     """Delete jobs older than 7 days from database"""
@@ -21,11 +30,18 @@ def cleanup_old_jobs():
         DELETE FROM jobs 
         WHERE created_at < datetime('now', '-7 days')
         ''')
-        conn.execute('''
-        DELETE FROM progress
-        WHERE job_id NOT IN (SELECT id FROM jobs)
-        ''')
+        for table in ('progress', 'site_results', 'contacts'):
+            conn.execute(f'''
+            DELETE FROM {table}
+            WHERE job_id NOT IN (SELECT id FROM jobs)
+            ''')
         conn.commit()
+    # Queue entries of the deleted jobs, done or failed
+    get_job_queue().prune()
+    cache = get_crawl_cache()
+    if cache:
+        cache.expire()
+    get_host_health().expire()
 
 def setup_scheduler():
     """Setup scheduled cleanup tasks"""
@@ -0,0 +1,158 @@
+# backend/app/crawl_cache.py
+import json
+import os
+import time
+from . import storage
+from .screenshot import default_settings
+from .storage import add_column, db_connection
+from .utils import normalize_url
+
+CRAWL_CACHE_ENABLED = os.getenv("CRAWL_CACHE_ENABLED", "1") == "1"
+# Oldest site result a job reuses unless it asks for fresher data with max_age
+SITE_CACHE_TTL = float(os.getenv("SITE_CACHE_TTL", "86400"))
+# Pages are revalidated with their ETag / Last-Modified, so they may be kept longer
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", str(7 * 86400)))
+
+
+def screenshot_key(screenshots):
+    """A ScreenshotSettings.key as stored with cached sites"""
+    return json.dumps(list(screenshots or default_settings().key))
+
+
+class CachedSite:
+    def __init__(self, result, crawled_at):
+        self.result = result
+        self.crawled_at = crawled_at
+
+    @property
+    def age(self):
+        return time.time() - self.crawled_at
+
+
+class CachedPage:
+    def __init__(self, etag, last_modified, contact_info, links):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.contact_info = contact_info
+        self.links = links
+
+
+class CrawlCache:
+    """
+    Results of earlier crawls shared between jobs: a whole site's result by
+    normalized base URL, and per page the extracted data with the validators
+    needed for a conditional re-fetch.
+    """
+
+    def __init__(self, site_ttl=SITE_CACHE_TTL, page_ttl=PAGE_CACHE_TTL):
+        self.site_ttl = site_ttl
+        self.page_ttl = page_ttl
+        self._ready = set()
+
+    def get_site(self, base_url, max_age=None, screenshots=None):
+        """
+        A site's cached result no older than `max_age` (capped by the TTL), or
+        None. Only crawls made with the same screenshot settings count:
+        `screenshots` is a ScreenshotSettings.key, the default settings' if not given.
+        """
+        max_age = self.site_ttl if max_age is None else min(max_age, self.site_ttl)
+        with self._connection() as conn:
+            row = conn.execute('''
+            SELECT result, crawled_at FROM site_cache
+            WHERE site = ? AND crawled_at >= ? AND screenshot_key = ?
+            ''', (normalize_url(base_url), time.time() - max_age, screenshot_key(screenshots))).fetchone()
+        if row is None:
+            return None
+        result = json.loads(row[0])
+        # Screenshots age out separately; a result pointing at a deleted one is stale
+        screenshot = result.get("screenshots", {}).get("homepage")
+        if screenshot and not os.path.exists(screenshot):
+            return None
+        return CachedSite(result, row[1])
+
+    def put_site(self, base_url, result, screenshots=None):
+        with self._connection() as conn:
+            conn.execute('''
+            INSERT OR REPLACE INTO site_cache (site, result, crawled_at, screenshot_key) VALUES (?, ?, ?, ?)
+            ''', (normalize_url(base_url), json.dumps(result), time.time(), screenshot_key(screenshots)))
+            conn.commit()
+
+    def get_page(self, url):
+        with self._connection() as conn:
+            row = conn.execute('''
+            SELECT etag, last_modified, contact_info, links FROM page_cache
+            WHERE url = ? AND fetched_at >= ?
+            ''', (url, time.time() - self.page_ttl)).fetchone()
+        if row is None:
+            return None
+        # Extracted fields are sets, as extract_page returns them
+        contact_info = {field: set(values) for field, values in json.loads(row[2]).items()}
+        return CachedPage(row[0], row[1], contact_info, json.loads(row[3]))
+
+    def put_page(self, url, etag, last_modified, contact_info, links):
+        with self._connection() as conn:
+            conn.execute('''
+            INSERT OR REPLACE INTO page_cache (url, etag, last_modified, contact_info, links, fetched_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', (url, etag, last_modified, json.dumps({field: sorted(values) for field, values in contact_info.items()}),
+                  json.dumps(links), time.time()))
+            conn.commit()
+
+    def touch_page(self, url):
+        """Record a successful revalidation"""
+        with self._connection() as conn:
+            conn.execute('UPDATE page_cache SET fetched_at = ? WHERE url = ?', (time.time(), url))
+            conn.commit()
+
+    def expire(self):
+        """Drop entries past their TTL"""
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute('DELETE FROM site_cache WHERE crawled_at < ?', (now - self.site_ttl,))
+            conn.execute('DELETE FROM page_cache WHERE fetched_at < ?', (now - self.page_ttl,))
+            conn.commit()
+
+    def _connection(self):
+        # Tables are created on first use of each database file
+        if storage.DB_PATH not in self._ready:
+            with db_connection() as conn:
+                conn.execute('''
+                CREATE TABLE IF NOT EXISTS site_cache (
+                    site TEXT PRIMARY KEY,
+                    result TEXT,
+                    crawled_at REAL
+                )
+                ''')
+                # Screenshot settings of the crawl; rows from before it was kept match no job
+                add_column(conn, 'site_cache', 'screenshot_key', 'TEXT')
+                conn.execute('''
+                CREATE TABLE IF NOT EXISTS page_cache (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    contact_info TEXT,
+                    links TEXT,
+                    fetched_at REAL
+                )
+                ''')
+                conn.commit()
+            self._ready.add(storage.DB_PATH)
+        return db_connection()
+
+
+_default_cache = None
+
+
+def get_crawl_cache():
+    """The crawl cache, or None when CRAWL_CACHE_ENABLED is off"""
+    global _default_cache
+    if not CRAWL_CACHE_ENABLED:
+        return None
+    if _default_cache is None:
+        _default_cache = CrawlCache()
+    return _default_cache
+
+
+def set_crawl_cache(cache):
+    global _default_cache
+    _default_cache = cache
@@ -1,45 +1,299 @@
 # backend/app/crawler.py
 import asyncio
-from playwright.async_api import async_playwright
-from .extractor import extract_contact_info
-from .screenshot import capture_screenshot
-from .storage import update_job
-import re
+import os
+import time
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from .blocking import CONTENT_POLICY, SCREENSHOT_POLICY, load_page, log_load_histograms
+from .browser_pool import BrowserPool, get_browser_pool
+from .crawl_cache import get_crawl_cache
+from .discovery import DISCOVERY_ENABLED, discover_site
+from .frontier import Frontier, found_targets
+from .host_health import PAGE_RETRIES, HostUnavailable, get_host_health, host_of, is_transient, retry_delay
+from .metrics import LATENCY_BUCKETS_MS, Gauge, Histogram, start_trace, timed
+from .page_extraction import extract_in_page
+from .singleflight import AsyncSingleFlight
+from .extraction_pool import extract_page_async
+from .fetcher import StaticFetcher, get_static_fetcher, looks_js_rendered
+from .screenshot import ScreenshotSettings, capture_screenshot, default_settings, log_screenshot_histograms
+from .storage import save_site_result, update_job
+from .thumbnails import create_thumbnail
 import logging
-from urllib.parse import urlparse, urljoin
-from .utils import normalize_url, should_crawl
+from urllib.parse import urlparse
+from .utils import normalize_url
 
 logger = logging.getLogger(__name__)
 MAX_DEPTH = 2
 MAX_PAGES = 10
 REQUEST_DELAY = 1.0
 
-async def crawl_website(job_id: str, urls: list[str]):
-    try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            context = await browser.new_context()
-            
-            results = {}
-            for url in urls:
+# Page loads in flight across every job in this process
+GLOBAL_PAGE_CONCURRENCY = int(os.getenv("CRAWL_GLOBAL_PAGES", "16"))
+# Page loads in flight for a single job, and sites it works on at once
+JOB_PAGE_CONCURRENCY = int(os.getenv("CRAWL_JOB_PAGES", "8"))
+JOB_SITE_CONCURRENCY = int(os.getenv("CRAWL_JOB_SITES", str(JOB_PAGE_CONCURRENCY)))
+# Politeness per host: sustained page loads per second and burst size
+HOST_RATE = float(os.getenv("CRAWL_HOST_RATE", str(1 / REQUEST_DELAY)))
+HOST_BURST = int(os.getenv("CRAWL_HOST_BURST", "1"))
+# Hosts whose rate limits are remembered; the least recently crawled are forgotten first
+HOST_BUCKETS = int(os.getenv("CRAWL_HOST_BUCKETS", "10000"))
+
+# Where a crawl spends its time: waiting for a page slot, opening a page in the
+# leased browser, navigation, screenshot, reading the DOM, link harvest, parsing,
+# static HTTP fetches, robots.txt / sitemap discovery, and whole sites
+CRAWL_PHASES = ("slot", "lease", "goto", "screenshot", "content", "links", "extract", "fetch", "discover", "site")
+phase_ms = {phase: Histogram("crawl_phase_ms", "Time spent in each phase of a crawl", LATENCY_BUCKETS_MS,
+                             {"phase": phase}) for phase in CRAWL_PHASES}
+pages_in_flight = Gauge("crawl_pages_in_flight", "Page loads holding a page slot")
+
+
+class TokenBucket:
+    """Token bucket limiting how often a single host is hit"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class CrawlScheduler:
+    """Bounds page loads globally, per job and per host"""
+
+    def __init__(self, global_limit=GLOBAL_PAGE_CONCURRENCY, job_limit=JOB_PAGE_CONCURRENCY,
+                 host_rate=HOST_RATE, host_burst=HOST_BURST, max_hosts=HOST_BUCKETS):
+        self.job_limit = job_limit
+        self.host_rate = host_rate
+        self.host_burst = host_burst
+        self.max_hosts = max_hosts
+        self._global = asyncio.Semaphore(global_limit)
+        self._buckets = OrderedDict()
+
+    def job_slots(self):
+        """Semaphore bounding the page loads of one job"""
+        return asyncio.Semaphore(self.job_limit)
+
+    @asynccontextmanager
+    async def page_slot(self, url, job_slots=None):
+        """
+        Hold a job and a global page slot, then wait for the host's rate
+        limit. The host's token is only taken once the page can load, so
+        time spent queueing for a slot doesn't bunch up loads of one host.
+        """
+        bucket = self._bucket(urlparse(url).netloc.lower())
+        with timed(phase_ms["slot"], "slot"):
+            if job_slots is not None:
+                await job_slots.acquire()
+            try:
+                await self._global.acquire()
                 try:
-                    update_job(job_id, f"Processing {url}", url)
-                    result = await crawl_single_site(context, url)
-                    results[url] = result
-                    update_job(job_id, f"Completed {url}", url, "completed")
-                except Exception as e:
-                    logger.error(f"Error crawling {url}: {str(e)}")
-                    update_job(job_id, f"Failed {url}: {str(e)}", url, "failed")
-            
-            await browser.close()
-            update_job(job_id, "All URLs processed", overall_status="completed", results=results)
+                    await bucket.acquire()
+                except BaseException:
+                    self._global.release()
+                    raise
+            except BaseException:
+                if job_slots is not None:
+                    job_slots.release()
+                raise
+
+        pages_in_flight.inc()
+        try:
+            yield
+        finally:
+            pages_in_flight.dec()
+            self._global.release()
+            if job_slots is not None:
+                job_slots.release()
+
+    def _bucket(self, host):
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.host_rate, self.host_burst)
+            if len(self._buckets) > self.max_hosts:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(host)
+        return bucket
+
+
+_default_scheduler = None
+
+
+def get_scheduler():
+    """Process-wide scheduler for the running event loop"""
+    global _default_scheduler
+    loop = asyncio.get_running_loop()
+    if _default_scheduler is None or _default_scheduler[0] is not loop:
+        _default_scheduler = (loop, CrawlScheduler())
+    return _default_scheduler[1]
+
+
+_default_site_flights = None
+
+
+def get_site_flights():
+    """Site crawls in flight in this process, shared by every job that asks for the same site"""
+    global _default_site_flights
+    loop = asyncio.get_running_loop()
+    if _default_site_flights is None or _default_site_flights[0] is not loop:
+        _default_site_flights = (loop, AsyncSingleFlight())
+    return _default_site_flights[1]
+
+
+def tier_summary(tiers):
+    """Human readable hit rate of the static HTTP tier and the crawl cache"""
+    total = tiers["http"] + tiers["browser"]
+    parts = []
+    if total:
+        parts.append(f"{tiers['http']}/{total} pages via HTTP ({100 * tiers['http'] / total:.0f}%)")
+    if tiers["not_modified"]:
+        parts.append(f"{tiers['not_modified']} unchanged since the last crawl")
+    if tiers["site_cache"]:
+        parts.append(f"{tiers['site_cache']} sites from cache")
+    if tiers["shared"]:
+        parts.append(f"{tiers['shared']} sites shared with other jobs")
+    if tiers["discovery"]:
+        parts.append(f"{tiers['discovery']} robots.txt, sitemap and probe requests")
+    return ", ".join(parts) or "no pages loaded"
+
+def describe_age(seconds):
+    if seconds < 3600:
+        return f"{max(1, round(seconds / 60))} min"
+    if seconds < 86400:
+        return f"{round(seconds / 3600)} h"
+    return f"{round(seconds / 86400)} days"
+
+async def crawl_website(job_id: str, urls: list[str], pool: BrowserPool | None = None,
+                        fetcher: StaticFetcher | None = None, max_age: float | None = None,
+                        screenshot_mode: str | None = None, trace: bool = False):
+    """
+    Crawl every site of a job. Sites crawled by any job within `max_age`
+    seconds (SITE_CACHE_TTL when not given) are served from the crawl cache.
+    `screenshot_mode` overrides SCREENSHOT_MODE for this job. With `trace`,
+    each site's progress row records the time it spent in each phase.
+    """
+    pool = pool or get_browser_pool()
+    fetcher = fetcher or get_static_fetcher()
+    owned_pool = owned_fetcher = None
+    try:
+        if pool is None:
+            # Outside the app (scripts, tests) fall back to a private single-browser pool
+            pool = owned_pool = BrowserPool(size=1)
+            await pool.start()
+        if fetcher is None:
+            fetcher = owned_fetcher = StaticFetcher()
+
+        scheduler = get_scheduler()
+        job_slots = scheduler.job_slots()
+        site_slots = asyncio.Semaphore(JOB_SITE_CONCURRENCY)
+        job_tiers = Counter()
+        cache = get_crawl_cache()
+        screenshots = ScreenshotSettings(mode=screenshot_mode) if screenshot_mode else default_settings()
+
+        flights = get_site_flights()
+
+        def job_stats():
+            return {"fetch_tiers": dict(job_tiers), "cache_hits": job_tiers["site_cache"],
+                    "shared_sites": job_tiers["shared"]}
+
+        async with pool.lease() as context:
+            async def crawl_one(position, url):
+                async with site_slots:
+                    site_trace = start_trace() if trace else None
+                    try:
+                        cached = await asyncio.to_thread(cache.get_site, url, max_age, screenshots.key) if cache else None
+                        if cached is not None:
+                            job_tiers["site_cache"] += 1
+                            save_site_result(job_id, url, position, cached.result)
+                            update_job(job_id, f"Completed {url}: cached result from {describe_age(cached.age)} ago",
+                                       url, "completed", stats=job_stats())
+                            return cached.result
+
+                        crawled_here = False
+
+                        async def crawl_site():
+                            nonlocal crawled_here
+                            crawled_here = True
+                            tiers = Counter()
+                            with timed(phase_ms["site"], "site"):
+                                result = await crawl_single_site(context, url, scheduler, job_slots, fetcher, tiers,
+                                                                 screenshots)
+                            if cache:
+                                await asyncio.to_thread(cache.put_site, url, result, screenshots.key)
+                            return result, tiers
+
+                        # Another job crawling the same site right now: wait for its result.
+                        # Only a crawl taking the same kind of screenshot (or none) is shared.
+                        key = (normalize_url(url), screenshots.key)
+                        if flights.running(key):
+                            update_job(job_id, f"Waiting for another job's crawl of {url}", url)
+                        else:
+                            update_job(job_id, f"Processing {url}", url)
+                        result, tiers = await flights.do(key, crawl_site)
+                        if not crawled_here:
+                            job_tiers["shared"] += 1
+                            summary = f"shared crawl with another job ({tier_summary(tiers)})"
+                        else:
+                            job_tiers.update(tiers)
+                            summary = tier_summary(tiers)
+                        # Saved as each site finishes, so a crash keeps what was crawled
+                        save_site_result(job_id, url, position, result)
+                        update_job(job_id, f"Completed {url}: {summary}", url, "completed", stats=job_stats(),
+                                   trace=site_trace and site_trace.summary())
+                        return result
+                    except Exception as e:
+                        logger.error(f"Error crawling {url}: {str(e)}")
+                        update_job(job_id, f"Failed {url}: {str(e)}", url, "failed",
+                                   trace=site_trace and site_trace.summary())
+                        return None
+
+            await asyncio.gather(*(crawl_one(position, url) for position, url in enumerate(urls)))
+
+        update_job(job_id, f"All URLs processed: {tier_summary(job_tiers)}", overall_status="completed",
+                   stats=job_stats())
+        log_load_histograms()
+        log_screenshot_histograms()
     except Exception as e:
-        logger.error(f"Job failed: {str(e)}")
-        update_job(job_id, f"Job failed: {str(e)}", overall_status="failed")
+        logger.error(f"Job attempt failed: {str(e)}")
+        # The worker records the failure: it may retry the job, and only it knows when attempts run out
+        raise
+    finally:
+        if owned_fetcher is not None:
+            await owned_fetcher.close()
+        if owned_pool is not None:
+            await owned_pool.close()
 
-async def crawl_single_site(context, base_url):
-    visited = set()
-    queue = [(base_url, 0)]
+async def crawl_single_site(context, base_url, scheduler=None, job_slots=None, fetcher=None, tiers=None,
+                            screenshots=None):
+    """
+    Crawl one site from its homepage, best pages first (see frontier.py).
+    Up to JOB_PAGE_CONCURRENCY pages load at once, and the crawl stops as soon
+    as every target field has been found.
+    With a `fetcher`, the site's robots.txt, sitemaps and common contact
+    paths seed the frontier first (see discovery.py), and pages are tried over
+    plain HTTP before using the browser; `tiers` counts the pages served by each tier. `screenshots` are the
+    homepage screenshot settings, SCREENSHOT_MODE and friends by default.
+    Raises HostUnavailable when the site's host circuit is open, and stops
+    early if it opens during the crawl.
+    """
+    health = get_host_health()
+    if not health.available(base_url):
+        raise HostUnavailable(f"{host_of(base_url)} failed repeatedly and is skipped for now")
+    scheduler = scheduler or get_scheduler()
+    screenshots = screenshots or default_settings()
+    frontier = Frontier(base_url, MAX_DEPTH, MAX_PAGES)
     results = {
         "emails": set(),
         "facebook": set(),
@@ -47,52 +301,222 @@ async def crawl_single_site(context, base_url):
         "tiktok": set(),
         "screenshots": {}
     }
-    
-    while queue:
-        url, depth = queue.pop(0)
-        normalized_url = normalize_url(url)
-        
-        if depth > MAX_DEPTH or len(visited) >= MAX_PAGES or normalized_url in visited:
-            continue
-        
-        visited.add(normalized_url)
-        
-        try:
-            page = await context.new_page()
-            await page.goto(url, wait_until="networkidle")
-            await asyncio.sleep(REQUEST_DELAY)
-            
-            # Capture homepage screenshot
-            if depth == 0:
-                screenshot_path = await capture_screenshot(page, base_url)
+
+    thumbnail = None
+    discovery = None
+    if fetcher is not None and DISCOVERY_ENABLED:
+        discovery = await discover_pages(fetcher, base_url, scheduler, job_slots, tiers)
+        for url in discovery.candidates:
+            frontier.add(url, 1)
+
+    while frontier and not found_targets(results):
+        if not health.available(base_url):
+            if not any(results[field] for field in ("emails", "facebook", "instagram", "tiktok")):
+                raise HostUnavailable(f"{host_of(base_url)} stopped answering")
+            break
+        batch = frontier.pop_batch(JOB_PAGE_CONCURRENCY)
+        if not batch:
+            break
+
+        pages = await asyncio.gather(*(
+            crawl_page(context, url, base_url, depth, scheduler, job_slots, fetcher, tiers, screenshots,
+                       discovery and discovery.pages.pop(url, None))
+            for url, depth in batch
+        ))
+
+        for (url, depth), page_result in zip(batch, pages):
+            if page_result is None:
+                continue
+            contact_info, links, screenshot_path = page_result
+
+            if screenshot_path:
                 results["screenshots"]["homepage"] = screenshot_path
-            
-            # Extract content
-            content = await page.content()
-            contact_info = extract_contact_info(content, url)
-            
+                # Made in the background while the rest of the site is crawled
+                thumbnail = asyncio.ensure_future(create_thumbnail(screenshot_path))
+
             # Process results
             results["emails"].update(contact_info["emails"])
             results["facebook"].update(contact_info["facebook"])
             results["instagram"].update(contact_info["instagram"])
             results["tiktok"].update(contact_info["tiktok"])
-            
-            # Find links to crawl
-            if depth < MAX_DEPTH:
-                links = await page.eval_on_selector_all("a", "elements => elements.map(el => el.href)")
-                for link in links:
-                    full_url = urljoin(url, link)
-                    if should_crawl(full_url, base_url) and normalize_url(full_url) not in visited:
-                        queue.append((full_url, depth + 1))
-            
-            await page.close()
-        except Exception as e:
-            logger.warning(f"Error processing {url}: {str(e)}")
-    
+
+            # Links are absolute already; the frontier drops repeats and pages not worth a visit
+            for link in links:
+                if discovery is None or discovery.robots.allows(link):
+                    frontier.add(link, depth + 1)
+
+    if thumbnail is not None:
+        thumbnail_path = await thumbnail
+        if thumbnail_path:
+            results["screenshots"]["thumbnail"] = thumbnail_path
+
     # Convert sets to lists for JSON serialization
     results["emails"] = list(results["emails"])
     results["facebook"] = list(results["facebook"])
     results["instagram"] = list(results["instagram"])
     results["tiktok"] = list(results["tiktok"])
-    
+
     return results
+
+async def discover_pages(fetcher, base_url, scheduler, job_slots=None, tiers=None):
+    """
+    Run discovery for a site with its requests held to the same page slots
+    and host rate as page loads, and counted in `tiers` as "discovery".
+    """
+    async def fetch_file(url, max_bytes):
+        if tiers is not None:
+            tiers["discovery"] += 1
+        async with scheduler.page_slot(url, job_slots):
+            return await fetcher.fetch_file(url, max_bytes)
+
+    async def fetch_page(url):
+        if tiers is not None:
+            tiers["discovery"] += 1
+        async with scheduler.page_slot(url, job_slots):
+            return await fetcher.fetch_page(url)
+
+    with timed(phase_ms["discover"], "discover"):
+        return await discover_site(base_url, fetch_file, fetch_page)
+
+async def crawl_page(context, url, base_url, depth, scheduler, job_slots=None, fetcher=None, tiers=None,
+                     screenshots=None, prefetched=None):
+    """
+    Load one page; returns (contact_info, links, screenshot_path) or None on
+    failure. `prefetched` is the page's StaticPage if discovery fetched it.
+    """
+    # The homepage needs a browser for its screenshot, unless screenshots are off
+    screenshot = depth == 0 and (screenshots or default_settings()).enabled
+    if fetcher is not None and not screenshot:
+        static_result = await fetch_static_page(fetcher, url, depth, scheduler, job_slots, tiers, prefetched)
+        if static_result is not None:
+            if tiers is not None:
+                tiers["http"] += 1
+            return static_result
+
+    if tiers is not None:
+        tiers["browser"] += 1
+    return await render_page(context, url, base_url, depth, scheduler, job_slots, screenshots)
+
+async def fetch_static_page(fetcher, url, depth, scheduler, job_slots=None, tiers=None, page=None):
+    """
+    Try a page over plain HTTP; None means it needs the browser. Pages seen
+    before are revalidated, and reused as extracted then if unchanged. A
+    `page` fetched already (by discovery) is used as is.
+    """
+    cache = get_crawl_cache()
+    cached = None
+    if page is None:
+        cached = await asyncio.to_thread(cache.get_page, url) if cache else None
+        async with scheduler.page_slot(url, job_slots):
+            with timed(phase_ms["fetch"], "fetch"):
+                if cached is not None:
+                    page = await fetcher.fetch_page(url, cached.etag, cached.last_modified)
+                else:
+                    page = await fetcher.fetch_page(url)
+    if page is None:
+        return None
+
+    if page.not_modified:
+        if tiers is not None:
+            tiers["not_modified"] += 1
+        await asyncio.to_thread(cache.touch_page, url)
+        return cached.contact_info, cached.links if depth < MAX_DEPTH else [], None
+
+    if looks_js_rendered(page.html):
+        return None
+    with timed(phase_ms["extract"], "extract"):
+        contact_info, links = await extract_page_async(page.html, url)
+    if not any(contact_info.values()):
+        return None
+    if cache and (page.etag or page.last_modified):
+        await asyncio.to_thread(cache.put_page, url, page.etag, page.last_modified, contact_info, links)
+
+    return contact_info, links if depth < MAX_DEPTH else [], None
+
+class PageLoadError(Exception):
+    """Navigation itself failed, as opposed to working with the loaded page"""
+
+    def __init__(self, error):
+        super().__init__(str(error))
+        self.error = error
+
+async def render_page(context, url, base_url, depth, scheduler, job_slots=None, screenshots=None):
+    """
+    Load a page in the browser. Transient load errors (timeouts, dropped
+    connections) are retried up to PAGE_RETRIES times within the host's retry
+    budget, backing off with jitter outside the page slot.
+    """
+    health = get_host_health()
+    attempt = 0
+    while True:
+        try:
+            return await render_page_once(context, url, base_url, depth, scheduler, job_slots, screenshots, health)
+        except HostUnavailable:
+            logger.info(f"Skipping {url}: {host_of(url)} is failing")
+            return None
+        except PageLoadError as e:
+            if attempt >= PAGE_RETRIES or not is_transient(e.error) or not health.take_retry(url):
+                logger.warning(f"Error loading {url}: {str(e)}")
+                return None
+            await asyncio.sleep(retry_delay(attempt))
+            attempt += 1
+        except Exception as e:
+            logger.warning(f"Error processing {url}: {str(e)}")
+            return None
+
+async def render_page_once(context, url, base_url, depth, scheduler, job_slots, screenshots, health):
+    screenshots = screenshots or default_settings()
+    page = None
+    # Checked before and after the wait for a slot: the circuit may open meanwhile
+    if not health.available(url):
+        raise HostUnavailable(url)
+    try:
+        async with scheduler.page_slot(url, job_slots):
+            if not health.allow(url):
+                raise HostUnavailable(url)
+            with timed(phase_ms["lease"], "lease"):
+                page = await context.new_page()
+            # Only the homepage is rendered for a screenshot; other pages just need the DOM
+            screenshot = depth == 0 and screenshots.enabled
+            policy = SCREENSHOT_POLICY if screenshot else CONTENT_POLICY
+            with timed(phase_ms["goto"], "goto"):
+                started = time.monotonic()
+                try:
+                    await load_page(page, url, policy, health.timeout_ms(url))
+                except Exception as e:
+                    health.record_failure(url, e)
+                    raise PageLoadError(e) from e
+                health.record_success(url, (time.monotonic() - started) * 1000)
+
+            # Capture homepage screenshot; the page's contacts are still worth having without it
+            screenshot_path = None
+            if screenshot:
+                try:
+                    with timed(phase_ms["screenshot"], "screenshot"):
+                        screenshot_path = await capture_screenshot(page, base_url, screenshots)
+                except Exception as e:
+                    logger.warning(f"Error capturing screenshot of {url}: {str(e)}")
+
+            # One round trip for text, anchors and links instead of the serialized DOM
+            with timed(phase_ms["content"], "content"):
+                extracted = await extract_in_page(page, base_url, with_links=depth < MAX_DEPTH)
+            if extracted is not None:
+                contact_info, links = extracted
+                return contact_info, links, screenshot_path
+
+            with timed(phase_ms["content"], "content"):
+                content = await page.content()
+
+            links = []
+            if depth < MAX_DEPTH:
+                with timed(phase_ms["links"], "links"):
+                    links = await page.eval_on_selector_all("a", "elements => elements.map(el => el.href)")
+
+        # Parse off the event loop, after the page slot is released
+        with timed(phase_ms["extract"], "extract"):
+            contact_info, _ = await extract_page_async(content, url)
+        return contact_info, links, screenshot_path
+    finally:
+        # Browsers are long-lived now, so pages must not leak on errors
+        if page is not None:
+            await page.close()
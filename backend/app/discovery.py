@@ -0,0 +1,220 @@
+# backend/app/discovery.py
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from html import unescape
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+from .frontier import PRIORITY_KEYWORDS, canonical_parts, priority, same_site
+
+logger = logging.getLogger(__name__)
+
+# Look for candidate pages in robots.txt, sitemaps and common paths before crawling a site
+DISCOVERY_ENABLED = os.getenv("CRAWL_DISCOVERY", "1") == "1"
+# Skip pages robots.txt disallows for our agent token (the homepage is always loaded)
+ROBOTS_RESPECT = os.getenv("CRAWL_RESPECT_ROBOTS", "1") == "1"
+ROBOTS_AGENT = os.getenv("CRAWL_ROBOTS_AGENT", "contact-crawler")
+ROBOTS_CACHE_TTL = float(os.getenv("ROBOTS_CACHE_TTL", "86400"))
+# A robots.txt that couldn't be read (timeout, 5xx) is retried this much sooner
+ROBOTS_ERROR_TTL = float(os.getenv("ROBOTS_ERROR_TTL", "300"))
+ROBOTS_CACHE_HOSTS = int(os.getenv("ROBOTS_CACHE_HOSTS", "50000"))
+ROBOTS_MAX_BYTES = 512 * 1024
+# Sitemap files read per site (an index and its most promising children), their size once unzipped,
+# and the candidate pages seeded into the frontier
+SITEMAP_MAX_FILES = int(os.getenv("SITEMAP_MAX_FILES", "4"))
+SITEMAP_MAX_BYTES = int(os.getenv("SITEMAP_MAX_BYTES", str(10 * 1024 * 1024)))
+DISCOVERY_MAX_CANDIDATES = int(os.getenv("DISCOVERY_MAX_CANDIDATES", "4"))
+# Tried over HTTP when the sitemap has no page for their keyword
+CONTACT_PATHS = tuple(p.strip() for p in os.getenv("CONTACT_PATHS", "/contact,/contact-us,/about,/about-us").split(",")
+                      if p.strip())
+
+LOC_REGEX = re.compile(r'<loc>\s*(.*?)\s*</loc>', re.IGNORECASE | re.DOTALL)
+SITEMAP_INDEX_REGEX = re.compile(r'<sitemapindex\b', re.IGNORECASE)
+
+
+class RobotsRules:
+    """A host's robots.txt: which paths we may crawl, and the sitemaps it lists"""
+
+    def __init__(self, text=""):
+        self._parser = RobotFileParser()
+        self._parser.parse(text.splitlines())
+        self.sitemaps = self._parser.site_maps() or []
+
+    def allows(self, url):
+        return not ROBOTS_RESPECT or self._parser.can_fetch(ROBOTS_AGENT, url)
+
+
+class RobotsCache:
+    """Parsed robots.txt per origin, shared by every job in the process for ROBOTS_CACHE_TTL"""
+
+    def __init__(self, ttl=ROBOTS_CACHE_TTL, max_hosts=ROBOTS_CACHE_HOSTS):
+        self.ttl = ttl
+        self.max_hosts = max_hosts
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, origin):
+        with self._lock:
+            entry = self._entries.get(origin)
+            if entry is None or time.time() > entry[0]:
+                return None
+            self._entries.move_to_end(origin)
+            return entry[1]
+
+    def put(self, origin, rules, ttl=None):
+        with self._lock:
+            self._entries[origin] = (time.time() + (self.ttl if ttl is None else ttl), rules)
+            self._entries.move_to_end(origin)
+            while len(self._entries) > self.max_hosts:
+                self._entries.popitem(last=False)
+
+
+_default_robots = None
+
+
+def get_robots_cache():
+    global _default_robots
+    if _default_robots is None:
+        _default_robots = RobotsCache()
+    return _default_robots
+
+
+def set_robots_cache(cache):
+    global _default_robots
+    _default_robots = cache
+
+
+class Discovery:
+    """
+    What a site gave away before crawling it: its robots rules, the pages most
+    likely to hold contacts (best first), and those among them already
+    fetched by a probe, by URL.
+    """
+
+    def __init__(self, robots, candidates=(), pages=None):
+        self.robots = robots
+        self.candidates = list(candidates)
+        self.pages = pages or {}
+
+
+def read_sitemap(body):
+    """(is an index, URLs listed) of a sitemap file, plain or gzipped XML, or a text sitemap"""
+    if body[:2] == b"\x1f\x8b":
+        # Bounded, so a small gzip bomb can't unpack into gigabytes
+        body = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(body, SITEMAP_MAX_BYTES)
+    text = body.decode("utf-8", errors="replace")
+    if "<" not in text[:512]:
+        return False, [line.strip() for line in text.splitlines() if line.strip().startswith("http")]
+    return bool(SITEMAP_INDEX_REGEX.search(text)), [unescape(loc) for loc in LOC_REGEX.findall(text)]
+
+
+def sitemap_rank(url):
+    """Children of a sitemap index named after a keyword first, then ones of plain pages (not posts or products)"""
+    name = url.rsplit("/", 1)[-1].lower()
+    rank = priority(name)
+    if rank is not None:
+        return rank
+    return len(PRIORITY_KEYWORDS) + (0 if "page" in name else 1)
+
+
+def rank_candidates(urls, base_url, robots):
+    """Pages of the site worth crawling, best first: by keyword, then shallowest and shortest path"""
+    base_origin = canonical_parts(base_url)[0]
+    ranked = {}
+    for url in urls:
+        parts = canonical_parts(url)
+        if parts is None or not same_site(parts[0], base_origin):
+            continue
+        path = parts[1].partition("?")[0]
+        rank = priority(path)
+        if rank is None or path in ranked or not robots.allows(url):
+            continue
+        if parts[0] != base_origin:
+            # Sitemaps often list the www. or https twin of the URL the job was given
+            split = urlsplit(url)
+            url = base_origin + split.path + (f"?{split.query}" if split.query else "")
+        ranked[path] = ((rank, path.count("/"), len(path)), url)
+    return [url for _, url in sorted(ranked.values())]
+
+
+async def fetch_robots(fetch_file, base_url):
+    origin = canonical_parts(base_url)[0]
+    cache = get_robots_cache()
+    rules = cache.get(origin)
+    if rules is None:
+        response = await fetch_file(f"{origin}/robots.txt", ROBOTS_MAX_BYTES)
+        if response is not None and response.status == 200 and response.body is not None:
+            rules = RobotsRules(response.body.decode("utf-8", errors="replace"))
+            cache.put(origin, rules)
+        elif response is not None and response.status in (404, 410):
+            # No robots.txt allows everything
+            rules = RobotsRules()
+            cache.put(origin, rules)
+        else:
+            # Unreachable or failing: crawl this time, but ask again soon
+            rules = RobotsRules()
+            cache.put(origin, rules, ROBOTS_ERROR_TTL)
+    return rules
+
+
+async def sitemap_urls(fetch_file, sitemaps):
+    """URLs listed by `sitemaps`, following indexes, within SITEMAP_MAX_FILES files"""
+    queue = list(sitemaps)
+    seen = set()
+    urls = []
+    while queue and len(seen) < SITEMAP_MAX_FILES:
+        sitemap = queue.pop(0)
+        if sitemap in seen:
+            continue
+        seen.add(sitemap)
+        response = await fetch_file(sitemap, SITEMAP_MAX_BYTES)
+        if response is None or not response.body:
+            continue
+        try:
+            is_index, locs = read_sitemap(response.body)
+        except zlib.error as e:
+            logger.debug(f"Unreadable sitemap {sitemap}: {str(e)}")
+            continue
+        if is_index:
+            queue.extend(sorted(locs, key=sitemap_rank))
+        else:
+            urls.extend(locs)
+    return urls
+
+
+async def discover_site(base_url, fetch_file, fetch_page):
+    """
+    Find a site's likely contact pages over plain HTTP before any browser
+    page opens: pages named after PRIORITY_KEYWORDS in its sitemaps (from
+    robots.txt, or /sitemap.xml), then CONTACT_PATHS for keywords the sitemap
+    has no page for. `fetch_file(url, max_bytes)` and `fetch_page(url)` are
+    the fetcher's, wrapped in the crawl's politeness limits.
+    """
+    origin = canonical_parts(base_url)[0]
+    try:
+        robots = await fetch_robots(fetch_file, base_url)
+        listed = await sitemap_urls(fetch_file, robots.sitemaps or [f"{origin}/sitemap.xml"])
+        candidates = rank_candidates(listed, base_url, robots)[:DISCOVERY_MAX_CANDIDATES]
+
+        pages = {}
+        covered = {priority(canonical_parts(url)[1]) for url in candidates}
+        for path in CONTACT_PATHS:
+            rank = priority(path)
+            url = origin + path
+            if rank in covered or len(candidates) >= DISCOVERY_MAX_CANDIDATES or not robots.allows(url):
+                continue
+            page = await fetch_page(url)
+            if page is not None and page.html:
+                pages[url] = page
+                candidates.append(url)
+                covered.add(rank)
+    except Exception as e:
+        logger.warning(f"Discovery failed for {base_url}: {str(e)}")
+        return Discovery(RobotsRules())
+
+    logger.debug(f"Discovered {len(candidates)} candidate pages of {base_url} ({len(listed)} in sitemaps)")
+    return Discovery(robots, rank_candidates(candidates, base_url, robots), pages)
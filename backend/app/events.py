@@ -0,0 +1,273 @@
+# backend/app/events.py
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from .storage import get_job
+
+logger = logging.getLogger(__name__)
+
+# Events queued for one watcher before it is considered too slow and dropped
+SUBSCRIBER_BUFFER = int(os.getenv("EVENTS_SUBSCRIBER_BUFFER", "256"))
+# Recent events kept per job so reconnecting clients can resume
+REPLAY_BUFFER = int(os.getenv("EVENTS_REPLAY_BUFFER", "512"))
+# How often a watched job is re-read when no local write woke it up (e.g. separate workers)
+TAIL_INTERVAL = float(os.getenv("EVENTS_TAIL_INTERVAL", "1.0"))
+KEEPALIVE_INTERVAL = float(os.getenv("EVENTS_KEEPALIVE_INTERVAL", "15"))
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+class Event:
+    """One change of a job. `id` is the job revision it brings the client to."""
+
+    def __init__(self, id, event, data, prev_id=None):
+        self.id = id
+        self.event = event
+        self.data = data
+        self.prev_id = prev_id
+        self._json = None
+        self._sse = None
+
+    @property
+    def json(self):
+        # Encoded once and shared by every watcher
+        if self._json is None:
+            self._json = json.dumps({"id": self.id, "event": self.event, "data": self.data})
+        return self._json
+
+    @property
+    def sse(self):
+        if self._sse is None:
+            self._sse = f"id: {self.id}\nevent: {self.event}\ndata: {json.dumps(self.data)}\n\n"
+        return self._sse
+
+
+class Subscription:
+    """A single watcher's bounded event buffer"""
+
+    def __init__(self, job_id, maxsize):
+        self.job_id = job_id
+        self.maxsize = maxsize
+        self.dropped = False
+        self._queue = asyncio.Queue()
+
+    def push(self, event):
+        """Queue an event; False if the watcher is too far behind"""
+        if self._queue.qsize() >= self.maxsize:
+            self.dropped = True
+            self._queue.put_nowait(None)
+            return False
+        self._queue.put_nowait(event)
+        return True
+
+    async def events(self, keepalive=None):
+        """
+        Yield events until the job finishes or the watcher is dropped. With
+        `keepalive`, None is yielded after that many idle seconds.
+        """
+        while True:
+            try:
+                event = await asyncio.wait_for(self._queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if event is None:
+                return
+            yield event
+            if event.event == "complete":
+                return
+
+
+class JobChannel:
+    """Fan-out point for one job: its latest state, replay buffer and watchers"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.subscribers = set()
+        self.replay = deque(maxlen=REPLAY_BUFFER)
+        self.revision = None
+        self.status = None
+        self.progress = {}
+        self.missing = False
+        # Why the job's state couldn't be read when the channel opened
+        self.error = None
+        self.ready = asyncio.Event()
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+    def snapshot(self):
+        return Event(self.revision, "snapshot", {
+            "revision": self.revision,
+            "status": self.status,
+            "progress": dict(self.progress),
+        })
+
+    def complete_event(self):
+        return Event(self.revision, "complete", {"revision": self.revision, "status": self.status})
+
+
+class EventHub:
+    """
+    In-process pub/sub for job progress. Each watched job has a single tailer
+    reading changes from the database, however many clients watch it.
+    """
+
+    def __init__(self, subscriber_buffer=SUBSCRIBER_BUFFER, tail_interval=TAIL_INTERVAL):
+        self.subscriber_buffer = subscriber_buffer
+        self.tail_interval = tail_interval
+        self._channels = {}
+        self._loop = None
+        self._stats = {"published": 0, "dropped": 0}
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    async def close(self):
+        for channel in list(self._channels.values()):
+            if channel.task is not None:
+                channel.task.cancel()
+        self._channels = {}
+        self._loop = None
+
+    def notify(self, job_id):
+        """Wake the job's tailer now; safe to call from any thread"""
+        loop = self._loop
+        if loop is not None and job_id in self._channels:
+            loop.call_soon_threadsafe(self._wake, job_id)
+
+    def stats(self):
+        return {
+            **self._stats,
+            "jobs": len(self._channels),
+            "subscribers": sum(len(c.subscribers) for c in self._channels.values()),
+        }
+
+    async def subscribe(self, job_id, last_event_id=None):
+        """
+        Start watching a job; None if it doesn't exist. Raises what reading the
+        job raised if it couldn't be read; the next subscribe tries again.
+        """
+        channel = self._channels.get(job_id)
+        if channel is None:
+            channel = self._channels[job_id] = JobChannel(job_id)
+            channel.task = asyncio.create_task(self._tail(channel))
+        await channel.ready.wait()
+        if channel.missing:
+            self._discard(channel)
+            return None
+        if channel.error is not None:
+            self._discard(channel)
+            raise channel.error
+
+        subscription = Subscription(job_id, self.subscriber_buffer)
+        for event in self._backlog(channel, last_event_id):
+            subscription.push(event)
+        channel.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        channel = self._channels.get(subscription.job_id)
+        if channel is None:
+            return
+        channel.subscribers.discard(subscription)
+        if not channel.subscribers:
+            self._discard(channel)
+
+    def _backlog(self, channel, last_event_id):
+        """Events a new watcher needs to catch up to the current revision"""
+        events = []
+        if last_event_id is None:
+            events.append(channel.snapshot())
+        elif last_event_id < channel.revision:
+            replay = list(channel.replay)
+            missed = [e for e in replay if e.id > last_event_id]
+            if (replay and replay[0].prev_id is not None and replay[0].prev_id <= last_event_id
+                    and len(missed) <= self.subscriber_buffer):
+                events.extend(missed)
+            else:
+                # Too far behind for the replay buffer: start over from the full state
+                events.append(channel.snapshot())
+        if channel.status in TERMINAL_STATUSES and not (events and events[-1].event == "complete"):
+            events.append(channel.complete_event())
+        return events
+
+    def _publish(self, channel, event):
+        channel.replay.append(event)
+        self._stats["published"] += 1
+        for subscription in list(channel.subscribers):
+            if not subscription.push(event):
+                logger.info(f"Dropping slow watcher of job {channel.job_id}")
+                self._stats["dropped"] += 1
+                channel.subscribers.discard(subscription)
+
+    def _wake(self, job_id):
+        channel = self._channels.get(job_id)
+        if channel is not None:
+            channel.wakeup.set()
+
+    def _discard(self, channel):
+        if self._channels.get(channel.job_id) is channel:
+            del self._channels[channel.job_id]
+        if channel.task is not None:
+            channel.task.cancel()
+
+    async def _tail(self, channel):
+        try:
+            job = await asyncio.to_thread(get_job, channel.job_id, include_results=False)
+        except Exception as e:
+            # Fail every subscribe waiting on it instead of leaving them without a tailer
+            logger.warning(f"Error reading job {channel.job_id}: {str(e)}")
+            channel.error = e
+            channel.ready.set()
+            return
+        try:
+            if job is None:
+                channel.missing = True
+                return
+            channel.revision = job["revision"]
+            channel.status = job["status"]
+            channel.progress = job["progress"]
+        finally:
+            channel.ready.set()
+
+        while channel.status not in TERMINAL_STATUSES:
+            try:
+                await asyncio.wait_for(channel.wakeup.wait(), self.tail_interval)
+            except asyncio.TimeoutError:
+                pass
+            channel.wakeup.clear()
+
+            try:
+                job = await asyncio.to_thread(get_job, channel.job_id, since=channel.revision, include_results=False)
+            except Exception as e:
+                logger.warning(f"Error reading job {channel.job_id}: {str(e)}")
+                continue
+            if job is None or job["revision"] == channel.revision:
+                continue
+
+            previous = channel.revision
+            channel.revision = job["revision"]
+            channel.status = job["status"]
+            channel.progress.update(job["progress"])
+            self._publish(channel, Event(channel.revision, "progress", {
+                "revision": channel.revision,
+                "status": channel.status,
+                "progress": job["progress"],
+            }, prev_id=previous))
+
+        self._publish(channel, channel.complete_event())
+
+
+_default_hub = None
+
+
+def get_event_hub():
+    """Hub owned by the running app, if any"""
+    return _default_hub
+
+
+def set_event_hub(hub):
+    global _default_hub
+    _default_hub = hub
@@ -0,0 +1,119 @@
+# backend/app/export_cache.py
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", "/tmp/email3-exports")
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_MB", "1024")) * 1024 * 1024
+# Artifacts used this recently are never evicted, so a download in flight keeps its file
+EXPORT_CACHE_MIN_AGE = float(os.getenv("EXPORT_CACHE_MIN_AGE", "300"))
+
+
+class ExportCache:
+    """
+    Export files on disk, addressed by (job_id, format, revision). A job's
+    results never change without a new revision, so an artifact is valid for
+    as long as it exists. The least recently used ones go once the directory
+    outgrows `max_bytes`.
+    """
+
+    def __init__(self, directory=EXPORT_CACHE_DIR, max_bytes=EXPORT_CACHE_MAX_BYTES,
+                 min_age=EXPORT_CACHE_MIN_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        self._flights = SingleFlight()
+        self._evict_lock = threading.Lock()
+        self._stats = {"hits": 0, "builds": 0, "evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, job_id, format, extension, revision):
+        digest = hashlib.sha256(f"{job_id}\0{format}\0{revision}".encode()).hexdigest()[:32]
+        return os.path.join(self.directory, f"{digest}.{extension}")
+
+    def get_or_build(self, job_id, format, extension, revision, build):
+        """
+        Path of the artifact, calling `build(path)` to write it if it isn't
+        cached. Concurrent requests for the same artifact share one build.
+        """
+        path = self.path_for(job_id, format, extension, revision)
+        if self._touch(path):
+            self._stats["hits"] += 1
+            return path
+        return self._flights.do(path, lambda: self._build(path, build))
+
+    def evict(self):
+        """Remove least recently used artifacts until the cache fits its budget"""
+        with self._evict_lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".part") or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+            cutoff = time.time() - self.min_age
+            removed = 0
+            for mtime, size, path in sorted(entries):
+                if total <= self.max_bytes or mtime > cutoff:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            self._stats["evictions"] += removed
+            return removed
+
+    def stats(self):
+        return {**self._stats, "coalesced": self._flights.coalesced}
+
+    def _touch(self, path):
+        # mtime doubles as the last-used time for LRU eviction
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _build(self, path, build):
+        # Built by the call we waited on, before this one took the lead
+        if self._touch(path):
+            self._stats["hits"] += 1
+            return path
+
+        started = time.monotonic()
+        part = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            build(part)
+            os.replace(part, path)
+        finally:
+            if os.path.exists(part):
+                os.remove(part)
+        self._stats["builds"] += 1
+        logger.info(f"Built export {os.path.basename(path)} in {time.monotonic() - started:.2f}s")
+        self.evict()
+        return path
+
+
+_default_cache = None
+
+
+def get_export_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ExportCache()
+    return _default_cache
+
+
+def set_export_cache(cache):
+    global _default_cache
+    _default_cache = cache
@@ -1,9 +1,27 @@
-import pandas as pd
-from fpdf import FPDF
+import csv
+import io
 import os
+import tempfile
+import zipfile
 from datetime import datetime
-from .storage import get_job
+from fpdf import FPDF
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
 from PIL import Image
+from .export_cache import get_export_cache
+from .metrics import Histogram, timed
+from .storage import get_job, iter_job_results
+from .thumbnails import THUMBNAIL_QUALITY, make_thumbnail
+
+EXPORT_COLUMNS = ['URL', 'Emails', 'Facebook', 'Instagram', 'TikTok', 'Screenshot']
+# Streamed exports are sent in chunks of about this many bytes
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "65536"))
+# fpdf builds a whole PDF in memory, so reports are split into parts of about this size
+PDF_PART_MAX_BYTES = int(os.getenv("PDF_PART_MAX_MB", "50")) * 1024 * 1024
+# Rough size a site's text adds to a PDF
+PDF_SITE_BYTES = 2048
+
+EXPORT_BUILD_BUCKETS_MS = (10, 50, 100, 500, 1000, 5000, 10000, 30000, 60000, 300000)
 
 class PDFExporter(FPDF):
     def header(self):
@@ -16,101 +34,189 @@ class PDFExporter(FPDF):
         self.set_font('Arial', 'I', 8)
         self.cell(0, 10, f'Page {self.page_no()}/{{nb}}', 0, 0, 'C')
 
-def export_csv(job_id):
-    """Export results to CSV format"""
-    job = get_job(job_id)
-    if not job or job['status'] != 'completed':
-        return None
-    
-    data = []
-    for url, result in job['results'].items():
-        row = {
-            'URL': url,
-            'Emails': ', '.join(result['emails']),
-            'Facebook': ', '.join(result['facebook']),
-            'Instagram': ', '.join(result['instagram']),
-            'TikTok': ', '.join(result['tiktok']),
-            'Screenshot': result['screenshots'].get('homepage', '')
-        }
-        data.append(row)
-    
-    df = pd.DataFrame(data)
-    path = f"/tmp/{job_id}.csv"
-    df.to_csv(path, index=False)
-    return path
+def result_row(url, result, separator):
+    """One export row for a site's results"""
+    return [
+        url,
+        separator.join(result.get('emails', [])),
+        separator.join(result.get('facebook', [])),
+        separator.join(result.get('instagram', [])),
+        separator.join(result.get('tiktok', [])),
+        result.get('screenshots', {}).get('homepage', ''),
+    ]
 
-def export_excel(job_id):
-    """Export results to Excel format"""
-    job = get_job(job_id)
-    if not job or job['status'] != 'completed':
-        return None
-    
-    data = []
-    for url, result in job['results'].items():
-        row = {
-            'URL': url,
-            'Emails': '\n'.join(result['emails']),
-            'Facebook': '\n'.join(result['facebook']),
-            'Instagram': '\n'.join(result['instagram']),
-            'TikTok': '\n'.join(result['tiktok']),
-            'Screenshot': result['screenshots'].get('homepage', '')
-        }
-        data.append(row)
-    
-    df = pd.DataFrame(data)
-    path = f"/tmp/{job_id}.xlsx"
-    df.to_excel(path, index=False)
-    return path
+def iter_csv(job_id):
+    """Yield a job's results as CSV, a chunk of rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for url, result in iter_job_results(job_id):
+        writer.writerow(result_row(url, result, ', '))
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
 
-def export_pdf(job_id):
-    """Export results to PDF format with screenshots"""
-    job = get_job(job_id)
-    if not job or job['status'] != 'completed':
-        return None
-    
+def iter_excel(job_id):
+    """
+    Yield a job's results as an xlsx workbook. Rows go through openpyxl's
+    write-only mode into a temporary file, which is then streamed.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Results')
+    sheet.append(EXPORT_COLUMNS)
+    for url, result in iter_job_results(job_id):
+        sheet.append([ILLEGAL_CHARACTERS_RE.sub('', value) for value in result_row(url, result, '\n')])
+
+    with tempfile.TemporaryFile() as file:
+        workbook.save(file)
+        file.seek(0)
+        while chunk := file.read(EXPORT_CHUNK_SIZE):
+            yield chunk
+
+def write_chunks(chunks, path):
+    with open(path, 'wb') as file:
+        for chunk in chunks:
+            file.write(chunk)
+
+def write_csv(job_id, path):
+    write_chunks(iter_csv(job_id), path)
+
+def write_excel(job_id, path):
+    write_chunks(iter_excel(job_id), path)
+
+def pdf_document():
     pdf = PDFExporter()
     pdf.alias_nb_pages()
     pdf.add_page()
     pdf.set_font('Arial', '', 10)
+    return pdf
+
+def report_image(result, workdir, name):
+    """JPEG or PNG of the homepage to embed in a report, or None"""
+    screenshots = result.get('screenshots', {})
+    thumbnail = screenshots.get('thumbnail')
+    if thumbnail and os.path.exists(thumbnail):
+        if thumbnail.endswith(('.jpg', '.png')):
+            return thumbnail
+        # fpdf only embeds JPEG and PNG
+        path = os.path.join(workdir, f'{name}.jpg')
+        with Image.open(thumbnail) as image:
+            image.convert('RGB').save(path, quality=THUMBNAIL_QUALITY)
+        return path
+
+    # Jobs crawled before thumbnails were made at capture time
+    screenshot = screenshots.get('homepage')
+    if screenshot and os.path.exists(screenshot):
+        return make_thumbnail(screenshot, os.path.join(workdir, f'{name}.jpg'), format='jpeg')
+    return None
+
+def write_site(pdf, url, result, workdir, name):
+    """Add one site's section to a report; returns the size of its image"""
+    # Add URL header
+    pdf.set_font('Arial', 'B', 11)
+    pdf.cell(0, 10, url, 0, 1)
+    pdf.set_font('Arial', '', 10)
+    
+    # Add emails
+    pdf.cell(40, 8, 'Emails:', 0, 0)
+    pdf.multi_cell(0, 8, ', '.join(result['emails']) or 'None', 0, 1)
+    
+    # Add social links
+    pdf.cell(40, 8, 'Facebook:', 0, 0)
+    pdf.multi_cell(0, 8, '\n'.join(result['facebook']) or 'None', 0, 1)
+    
+    pdf.cell(40, 8, 'Instagram:', 0, 0)
+    pdf.multi_cell(0, 8, '\n'.join(result['instagram']) or 'None', 0, 1)
     
-    for url, result in job['results'].items():
-        # Add URL header
-        pdf.set_font('Arial', 'B', 11)
-        pdf.cell(0, 10, url, 0, 1)
-        pdf.set_font('Arial', '', 10)
-        
-        # Add emails
-        pdf.cell(40, 8, 'Emails:', 0, 0)
-        pdf.multi_cell(0, 8, ', '.join(result['emails']) or 'None', 0, 1)
-        
-        # Add social links
-        pdf.cell(40, 8, 'Facebook:', 0, 0)
-        pdf.multi_cell(0, 8, '\n'.join(result['facebook']) or 'None', 0, 1)
-        
-        pdf.cell(40, 8, 'Instagram:', 0, 0)
-        pdf.multi_cell(0, 8, '\n'.join(result['instagram']) or 'None', 0, 1)
-        
-        pdf.cell(40, 8, 'TikTok:', 0, 0)
-        pdf.multi_cell(0, 8, '\n'.join(result['tiktok']) or 'None', 0, 1)
-        
-        # Add screenshot if available
-        screenshot = result['screenshots'].get('homepage')
-        if screenshot and os.path.exists(screenshot):
-            try:
-                # Resize image to fit PDF
-                img = Image.open(screenshot)
-                img.thumbnail((150, 150))
-                temp_path = f"/tmp/{os.path.basename(screenshot)}"
-                img.save(temp_path)
-                
-                pdf.cell(40, 8, 'Screenshot:', 0, 1)
-                pdf.image(temp_path, x=10, w=80)
-                os.remove(temp_path)
-            except Exception as e:
-                pdf.cell(0, 8, f'Screenshot error: {str(e)}', 0, 1)
-        
-        pdf.ln(5)
+    pdf.cell(40, 8, 'TikTok:', 0, 0)
+    pdf.multi_cell(0, 8, '\n'.join(result['tiktok']) or 'None', 0, 1)
     
-    path = f"/tmp/{job_id}.pdf"
-    pdf.output(path)
-    return path
+    # Add screenshot if available
+    size = 0
+    try:
+        image = report_image(result, workdir, name)
+        if image:
+            size = os.path.getsize(image)
+            pdf.cell(40, 8, 'Screenshot:', 0, 1)
+            pdf.image(image, x=10, w=80)
+    except Exception as e:
+        pdf.cell(0, 8, f'Screenshot error: {str(e)}', 0, 1)
+    
+    pdf.ln(5)
+    return size
+
+def write_pdf(job_id, path):
+    """
+    Write a PDF report with screenshots. fpdf keeps a whole document in
+    memory, so large reports are split into parts of about PDF_PART_MAX_BYTES
+    and delivered as a zip of them.
+    """
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(path) or None) as workdir:
+        parts = []
+        pdf, size = pdf_document(), 0
+        for n, (url, result) in enumerate(iter_job_results(job_id)):
+            if size >= PDF_PART_MAX_BYTES:
+                parts.append(os.path.join(workdir, f'report-part-{len(parts) + 1:03d}.pdf'))
+                pdf.output(parts[-1])
+                pdf, size = pdf_document(), 0
+            size += PDF_SITE_BYTES + write_site(pdf, url, result, workdir, str(n))
+
+        if not parts:
+            pdf.output(path)
+            return
+        parts.append(os.path.join(workdir, f'report-part-{len(parts) + 1:03d}.pdf'))
+        pdf.output(parts[-1])
+        # PDFs are already compressed
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as archive:
+            for part in parts:
+                archive.write(part, os.path.basename(part))
+
+# format: (file extension, media type, writer)
+EXPORT_FORMATS = {
+    'csv': ('csv', 'text/csv; charset=utf-8', write_csv),
+    'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', write_excel),
+    'pdf': ('pdf', 'application/pdf', write_pdf),
+}
+
+export_build_ms = {format: Histogram('export_build_ms', 'Time to build an export file', EXPORT_BUILD_BUCKETS_MS,
+                                    {'format': format}) for format in EXPORT_FORMATS}
+
+def build_export(writer, job_id, format, path):
+    with timed(export_build_ms[format]):
+        writer(job_id, path)
+
+def export_file(job_id, format):
+    """
+    Path of a finished job's export, built on first request and served from
+    the export cache afterwards; None if the job isn't completed.
+    """
+    job = get_job(job_id, include_results=False)
+    if not job or job['status'] != 'completed':
+        return None
+    extension, _, writer = EXPORT_FORMATS[format]
+    return get_export_cache().get_or_build(
+        job_id, format, extension, job['revision'], lambda path: build_export(writer, job_id, format, path)
+    )
+
+def export_csv(job_id):
+    """Export results to CSV format"""
+    return export_file(job_id, 'csv')
+
+def export_excel(job_id):
+    """Export results to Excel format"""
+    return export_file(job_id, 'excel')
+
+def export_pdf(job_id):
+    """Export results to PDF format with screenshots"""
+    return export_file(job_id, 'pdf')
+
+def export_type(format, path):
+    """(file extension, media type) of an export artifact"""
+    extension, media_type, _ = EXPORT_FORMATS[format]
+    if format == 'pdf':
+        with open(path, 'rb') as file:
+            if file.read(4) == b'PK\x03\x04':
+                return 'zip', 'application/zip'
+    return extension, media_type
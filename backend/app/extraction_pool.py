@@ -0,0 +1,192 @@
+# backend/app/extraction_pool.py
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from .extractor import extract_page
+
+logger = logging.getLogger(__name__)
+
+# "process", "thread" or "inline" (parse on the event loop, for tests and debugging)
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "process")
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Pages submitted but not yet extracted; crawlers wait once this is reached
+EXTRACTION_MAX_PENDING = int(os.getenv("EXTRACTION_MAX_PENDING", "64"))
+EXTRACTION_BATCH_SIZE = int(os.getenv("EXTRACTION_BATCH_SIZE", "8"))
+
+
+def extract_batch(pages):
+    """Run in a worker: extract every (html, url) pair, keeping failures per page"""
+    results = []
+    for html, url in pages:
+        try:
+            results.append((True, extract_page(html, url)))
+        except Exception as e:
+            results.append((False, f"{type(e).__name__}: {str(e)}"))
+    return results
+
+
+class ExtractionError(Exception):
+    pass
+
+
+class ExtractionPool:
+    """Runs HTML extraction in a worker pool so parsing never blocks the event loop"""
+
+    def __init__(self, mode=EXTRACTION_MODE, workers=EXTRACTION_WORKERS,
+                 max_pending=EXTRACTION_MAX_PENDING, batch_size=EXTRACTION_BATCH_SIZE):
+        if mode not in ("process", "thread", "inline"):
+            raise ValueError(f"Unknown extraction mode: {mode}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.batch_size = max(1, batch_size)
+        self._executor = None
+        self._queue = None
+        self._pending = None
+        self._batch_slots = None
+        self._dispatcher = None
+        # Batches taken off the queue and not completed yet
+        self._in_flight = set()
+        self._stats = {"pages": 0, "batches": 0, "errors": 0, "restarts": 0}
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        if self._pending is not None:
+            return
+        self._pending = asyncio.Semaphore(self.max_pending)
+        if self.mode == "inline":
+            return
+        self._executor = self._new_executor()
+        self._queue = asyncio.Queue()
+        self._batch_slots = asyncio.Semaphore(self.workers)
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        logger.info(f"Extraction pool started: {self.mode} mode, {self.workers} workers")
+
+    async def close(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        # Nobody would resolve pages still queued or being extracted once the executor is gone
+        while self._queue is not None and not self._queue.empty():
+            self._queue.get_nowait()[2].cancel()
+        for batch in self._in_flight:
+            for _, _, future in batch:
+                future.cancel()
+        self._in_flight.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._pending = None
+
+    async def extract_page(self, html, url):
+        """(contact_info, links) for a page, waiting if too many pages are pending"""
+        if self._pending is None:
+            raise RuntimeError("Extraction pool is not started")
+
+        async with self._pending:
+            self._stats["pages"] += 1
+            if self.mode == "inline":
+                return extract_page(html, url)
+
+            future = asyncio.get_running_loop().create_future()
+            self._queue.put_nowait((html, url, future))
+            ok, value = await future
+        if not ok:
+            self._stats["errors"] += 1
+            raise ExtractionError(value)
+        return value
+
+    def stats(self):
+        return {
+            **self._stats,
+            "mode": self.mode,
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+        }
+
+    def _new_executor(self):
+        if self.mode == "process":
+            # Forking a process that runs an event loop and threads is unsafe
+            return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="extract")
+
+    def _replace_broken(self, executor):
+        """Swap in a fresh executor for `executor` once one of its workers died"""
+        if self._executor is not executor:
+            return
+        logger.warning("Extraction worker died, restarting the pool")
+        self._stats["restarts"] += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._new_executor()
+
+    async def _dispatch(self):
+        """Group whatever is queued into batches, one executor call per batch"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            batch = tuple(batch)
+            self._in_flight.add(batch)
+
+            await self._batch_slots.acquire()
+            self._stats["batches"] += 1
+            executor = self._executor
+            pages = [(html, url) for html, url, _ in batch]
+            try:
+                work = loop.run_in_executor(executor, extract_batch, pages)
+            except BrokenProcessPool:
+                self._replace_broken(executor)
+                executor = self._executor
+                work = loop.run_in_executor(executor, extract_batch, pages)
+            work.add_done_callback(lambda done, batch=batch, executor=executor: self._complete(batch, executor, done))
+
+    def _complete(self, batch, executor, done):
+        self._batch_slots.release()
+        self._in_flight.discard(batch)
+        if done.cancelled():
+            outcomes = [(False, "extraction cancelled")] * len(batch)
+        elif done.exception() is not None:
+            # The worker itself died, fail the whole batch and carry on with a new pool
+            if isinstance(done.exception(), BrokenProcessPool):
+                self._replace_broken(executor)
+            outcomes = [(False, str(done.exception()))] * len(batch)
+        else:
+            outcomes = done.result()
+        for (_, _, future), outcome in zip(batch, outcomes):
+            if not future.done():
+                future.set_result(outcome)
+
+
+_default_pool = None
+
+
+def get_extraction_pool():
+    """Pool owned by the running app, if any"""
+    return _default_pool
+
+
+def set_extraction_pool(pool):
+    global _default_pool
+    _default_pool = pool
+
+
+async def extract_page_async(html, url):
+    """Extract through the app's pool, or in a thread when none is running"""
+    pool = get_extraction_pool()
+    if pool is None:
+        return await asyncio.to_thread(extract_page, html, url)
+    return await pool.extract_page(html, url)
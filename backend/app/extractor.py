@@ -1,5 +1,6 @@
 import re
 from bs4 import BeautifulSoup
+from lxml import etree
 from urllib.parse import urljoin
 import logging
 from .utils import normalize_social_url
@@ -16,11 +17,28 @@ EMAIL_REGEX = re.compile(
     re.IGNORECASE
 )
 
+SOCIAL_PLATFORMS = ('facebook', 'instagram', 'tiktok')
+SOCIAL_HOST_REGEX = re.compile(r'(facebook|instagram|tiktok)\.com')
+HANDLE_URL_FORMATS = {
+    'facebook': 'https://facebook.com/{}',
+    'instagram': 'https://instagram.com/{}',
+    'tiktok': 'https://tiktok.com/@{}',
+}
+
+# Strings BeautifulSoup does not count as text (see bs4 string_containers)
+NON_TEXT_TAGS = frozenset(('script', 'style', 'template', 'rt', 'rp'))
+WHITESPACE_PRESERVING_TAGS = frozenset(('pre', 'textarea'))
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
 def extract_emails(text):
     """Extract and normalize emails from text, including obfuscated formats"""
     emails = set()
     for match in EMAIL_REGEX.finditer(text):
         email = match.group(0).lower()
+        # Every obfuscation contains one of these, so plain addresses skip the rewriting
+        if ' ' not in email and '[' not in email and '(' not in email:
+            emails.add(email)
+            continue
         # Normalize obfuscation
         email = email.replace('[at]', '@').replace('(at)', '@').replace(' at ', '@')
         email = email.replace('[dot]', '.').replace('(dot)', '.').replace(' dot ', '.')
@@ -61,9 +79,146 @@ def extract_social_links(soup, base_url):
     
     return social_links
 
+class PageCollector:
+    """
+    lxml parser target collecting visible text, meta content and anchors in a
+    single pass. Text follows BeautifulSoup's get_text() rules exactly, so the
+    results match the soup based extractor.
+    """
+
+    def __init__(self):
+        self.text = []
+        self.meta = []
+        self.anchors = []  # [href, text parts, aria-label]
+        self._open_anchors = []
+        self._pending = []
+        self._non_text = 0
+        self._preserve = 0
+
+    def _flush(self):
+        if not self._pending:
+            return
+        data = ''.join(self._pending)
+        self._pending = []
+        if self._non_text:
+            return
+        if not self._preserve and not data.strip(ASCII_SPACES):
+            data = '\n' if '\n' in data else ' '
+        self.text.append(data)
+        for anchor in self._open_anchors:
+            anchor[1].append(data)
+
+    def start(self, tag, attrib):
+        self._flush()
+        if tag in NON_TEXT_TAGS:
+            self._non_text += 1
+        elif tag in WHITESPACE_PRESERVING_TAGS:
+            self._preserve += 1
+        elif tag == 'meta':
+            content = attrib.get('content')
+            if content is not None:
+                self.meta.append(content)
+        elif tag == 'a':
+            anchor = [attrib.get('href'), [], attrib.get('aria-label', '')]
+            self._open_anchors.append(anchor)
+            if anchor[0] is not None:
+                self.anchors.append(anchor)
+
+    def end(self, tag):
+        self._flush()
+        if tag in NON_TEXT_TAGS:
+            self._non_text = max(0, self._non_text - 1)
+        elif tag in WHITESPACE_PRESERVING_TAGS:
+            self._preserve = max(0, self._preserve - 1)
+        elif tag == 'a' and self._open_anchors:
+            self._open_anchors.pop()
+
+    def data(self, data):
+        self._pending.append(data)
+
+    def comment(self, text):
+        self._flush()
+
+    def pi(self, target, data=None):
+        self._flush()
+
+    def doctype(self, *args):
+        self._flush()
+
+    def close(self):
+        self._flush()
+        return self
+
+def parse_page(html):
+    """Parse HTML once into a PageCollector"""
+    collector = PageCollector()
+    if not html:
+        return collector
+    parser = etree.HTMLParser(target=collector, recover=True)
+    parser.feed(html)
+    return parser.close()
+
+def collect_social_links(anchors):
+    """Social links from (href, text, aria-label) anchors"""
+    social_links = {platform: set() for platform in SOCIAL_PLATFORMS}
+    for href, text, aria_label in anchors:
+        href = href.strip()
+        on_host = set(SOCIAL_HOST_REGEX.findall(href))
+        for platform in on_host:
+            social_links[platform].add(normalize_social_url(href, platform))
+
+        # Handles like "@company" labelled with the platform name
+        if len(on_host) < len(SOCIAL_PLATFORMS):
+            text = text.strip()
+            if text.startswith('@'):
+                aria_label = aria_label.lower()
+                for platform in SOCIAL_PLATFORMS:
+                    if platform not in on_host and platform in aria_label:
+                        social_links[platform].add(HANDLE_URL_FORMATS[platform].format(text[1:]))
+    return social_links
+
+def contact_info_from_collector(collector):
+    result = {'emails': extract_emails(''.join(collector.text))}
+    for content in collector.meta:
+        result['emails'].update(extract_emails(content))
+    anchors = ((href, ''.join(parts), aria_label) for href, parts, aria_label in collector.anchors)
+    result.update(collect_social_links(anchors))
+    return result
+
+def contact_info_from_payload(payload):
+    """Contact info from what the in-page extraction script returned"""
+    result = {'emails': extract_emails(payload['text'])}
+    for content in payload['meta']:
+        result['emails'].update(extract_emails(content))
+    result.update(collect_social_links(payload['anchors']))
+    return result
+
+def extract_links(html, base_url):
+    """Absolute hrefs of all links, as the browser's `el.href` reports them"""
+    return [urljoin(base_url, anchor[0].strip()) for anchor in parse_page(html).anchors]
+
+def extract_page(html, base_url):
+    """Contact info and absolute links of a page from a single parse"""
+    collector = parse_page(html)
+    links = [urljoin(base_url, anchor[0].strip()) for anchor in collector.anchors]
+    return contact_info_from_collector(collector), links
+
 def extract_contact_info(html, base_url):
     """
-    Extract contact information from HTML content
+    Extract contact information from HTML content in a single streaming pass
+    Returns: {
+        'emails': set(),
+        'facebook': set(),
+        'instagram': set(),
+        'tiktok': set()
+    }
+    """
+    return contact_info_from_collector(parse_page(html))
+
+def extract_contact_info_soup(html, base_url):
+    """
+    Reference BeautifulSoup implementation of extract_contact_info, kept for
+    parity tests and benchmarks
     Returns: {
         'emails': set(),
         'facebook': set(),
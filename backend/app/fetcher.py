@@ -0,0 +1,189 @@
+# backend/app/fetcher.py
+import logging
+import os
+import re
+import time
+import aiohttp
+from .host_health import HostError, get_host_health, is_host_error
+
+logger = logging.getLogger(__name__)
+
+STATIC_FETCH_TIMEOUT = float(os.getenv("STATIC_FETCH_TIMEOUT", "15"))
+STATIC_MAX_BYTES = int(os.getenv("STATIC_MAX_BYTES", str(5 * 1024 * 1024)))
+STATIC_CONNECTIONS = int(os.getenv("STATIC_CONNECTIONS", "100"))
+STATIC_CONNECTIONS_PER_HOST = int(os.getenv("STATIC_CONNECTIONS_PER_HOST", "4"))
+USER_AGENT = os.getenv(
+    "CRAWL_USER_AGENT",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+# Mount points of client-side frameworks that ship an empty shell
+APP_SHELL_REGEX = re.compile(
+    r'<div[^>]+id=["\'](?:root|app|__next|__nuxt|svelte)["\'][^>]*>\s*</div>'
+    r'|\bng-app\b|\bdata-reactroot\b'
+    r'|<noscript>[^<]*(?:enable|requires?)\s+javascript',
+    re.IGNORECASE
+)
+SCRIPT_OR_STYLE_REGEX = re.compile(r'<(script|style|template)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+TAG_REGEX = re.compile(r'<[^>]+>')
+MIN_VISIBLE_TEXT = 200
+
+
+def looks_js_rendered(html):
+    """Cheap check whether a page needs a browser to show its content"""
+    if APP_SHELL_REGEX.search(html):
+        return True
+    text = TAG_REGEX.sub(' ', SCRIPT_OR_STYLE_REGEX.sub(' ', html))
+    return len(''.join(text.split())) < MIN_VISIBLE_TEXT
+
+
+class StaticPage:
+    """A page fetched over plain HTTP, with the validators to revalidate it later"""
+
+    def __init__(self, html, etag=None, last_modified=None, not_modified=False):
+        self.html = html
+        self.etag = etag
+        self.last_modified = last_modified
+        self.not_modified = not_modified
+
+
+class StaticFile:
+    """Answer to a plain file request; `body` is only set for a 200 within the size limit"""
+
+    def __init__(self, status, body=None):
+        self.status = status
+        self.body = body
+
+
+class StaticFetcher:
+    """Pooled aiohttp client used before falling back to a browser"""
+
+    def __init__(self, timeout=STATIC_FETCH_TIMEOUT, max_bytes=STATIC_MAX_BYTES,
+                 limit=STATIC_CONNECTIONS, limit_per_host=STATIC_CONNECTIONS_PER_HOST):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self._session = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"User-Agent": USER_AGENT}
+            )
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def fetch(self, url):
+        """Return the HTML of `url`, or None if it isn't a readable HTML page"""
+        page = await self.fetch_page(url)
+        return page.html if page is not None else None
+
+    async def fetch_page(self, url, etag=None, last_modified=None):
+        """
+        Fetch `url` as a StaticPage, or None if it isn't a readable HTML page.
+        With validators from an earlier fetch the request is conditional, and
+        an unchanged page comes back with `not_modified` set and no HTML.
+        Hosts whose circuit is open, or that keep failing plain HTTP requests,
+        aren't contacted, and the timeout adapts to how fast the host answered
+        before (never above `timeout`).
+        """
+        health = get_host_health()
+        if not health.allow(url, "http"):
+            return None
+        await self.start()
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        timeout = aiohttp.ClientTimeout(total=min(self.timeout, health.timeout_ms(url, "http") / 1000))
+        started = time.monotonic()
+        try:
+            async with self._session.get(url, allow_redirects=True, headers=headers, timeout=timeout) as response:
+                if is_host_error(response.status):
+                    health.record_failure(url, HostError(f"HTTP {response.status}"), "http")
+                    return None
+                health.record_success(url, (time.monotonic() - started) * 1000, "http")
+                if response.status == 304 and headers:
+                    return StaticPage(None, etag, last_modified, not_modified=True)
+                if response.status != 200:
+                    return None
+                if 'html' not in response.headers.get('Content-Type', 'text/html').lower():
+                    return None
+                body = await read_limited(response, self.max_bytes)
+                if body is None:
+                    return None
+                return StaticPage(
+                    body.decode(response.get_encoding(), errors='replace'),
+                    response.headers.get('ETag'),
+                    response.headers.get('Last-Modified')
+                )
+        except Exception as e:
+            health.record_failure(url, e, "http")
+            logger.debug(f"Static fetch failed for {url}: {str(e)}")
+            return None
+
+    async def fetch_file(self, url, max_bytes=None):
+        """
+        Fetch `url` whatever its type (robots.txt, sitemaps) as a StaticFile
+        with the response status, and the body bytes if it answered 200 within
+        `max_bytes`. None if the host couldn't be reached.
+        """
+        health = get_host_health()
+        if not health.allow(url, "http"):
+            return None
+        await self.start()
+        timeout = aiohttp.ClientTimeout(total=min(self.timeout, health.timeout_ms(url, "http") / 1000))
+        started = time.monotonic()
+        try:
+            async with self._session.get(url, allow_redirects=True, timeout=timeout) as response:
+                if is_host_error(response.status):
+                    health.record_failure(url, HostError(f"HTTP {response.status}"), "http")
+                    return StaticFile(response.status)
+                health.record_success(url, (time.monotonic() - started) * 1000, "http")
+                if response.status != 200:
+                    return StaticFile(response.status)
+                return StaticFile(response.status, await read_limited(response, max_bytes or self.max_bytes))
+        except Exception as e:
+            health.record_failure(url, e, "http")
+            logger.debug(f"Static fetch failed for {url}: {str(e)}")
+            return None
+
+
+async def read_limited(response, max_bytes):
+    """The whole response body, or None if it's longer than `max_bytes`"""
+    chunks = []
+    size = 0
+    async for chunk in response.content.iter_chunked(64 * 1024):
+        size += len(chunk)
+        if size > max_bytes:
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+_default_fetcher = None
+
+
+def get_static_fetcher():
+    """Fetcher owned by the running app, if any"""
+    return _default_fetcher
+
+
+def set_static_fetcher(fetcher):
+    global _default_fetcher
+    _default_fetcher = fetcher
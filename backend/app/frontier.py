@@ -0,0 +1,109 @@
+# backend/app/frontier.py
+import heapq
+import os
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+# Path keywords of pages worth crawling, most likely to list contact details first
+PRIORITY_KEYWORDS = ("contact", "about", "team", "support", "connect")
+# Stop crawling a site once all of these have been found
+TARGET_FIELDS = tuple(f.strip() for f in os.getenv("CRAWL_TARGET_FIELDS", "emails,facebook,instagram,tiktok").split(",") if f.strip())
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonical_parts(url):
+    """(origin, path and query) of a URL's canonical form, or None if it can't be parsed"""
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    netloc = parts.hostname or ""
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+    path = parts.path.rstrip("/").lower()
+    if parts.query:
+        path += "?" + urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{scheme}://{netloc}", path
+
+
+def same_site(origin, base_origin):
+    """Whether two origins are one site, allowing for a www. prefix and http vs https"""
+    def host(value):
+        host = value.partition("://")[2]
+        return host[4:] if host.startswith("www.") else host
+    return host(origin) == host(base_origin)
+
+
+def url_key(url):
+    """
+    Canonical form of a URL for deduplication: no fragment, sorted query,
+    default port dropped, no trailing slash. Like normalize_url, paths
+    compare case-insensitively. None if the URL can't be parsed.
+    """
+    parts = canonical_parts(url)
+    return parts[0] + parts[1] if parts else None
+
+
+def priority(path):
+    """Rank of a path by the first keyword in it; None if it has none"""
+    for rank, keyword in enumerate(PRIORITY_KEYWORDS):
+        if keyword in path:
+            return rank
+    return None
+
+
+class Frontier:
+    """
+    Pages of one site still to crawl, best first. A URL is only ever queued
+    once, whether it was already crawled or is still waiting.
+    """
+
+    def __init__(self, base_url, max_depth, max_pages):
+        self.max_depth = max_depth
+        self.pages_left = max_pages
+        self._origin, base_path = canonical_parts(base_url)
+        self._heap = []
+        self._seen = {base_path}
+        # Links repeat on every page of a site (navigation, footer); skip parsing them again
+        self._seen_raw = set()
+        self._counter = 0
+        self._push(base_url, 0, -1)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def add(self, url, depth):
+        """Queue a link found at `depth - 1` if it's a new page worth crawling"""
+        if depth > self.max_depth or url in self._seen_raw:
+            return False
+        self._seen_raw.add(url)
+        parts = canonical_parts(url)
+        # Sites link their http:// or www. twin as often as themselves
+        if parts is None or not same_site(parts[0], self._origin) or parts[1] in self._seen:
+            return False
+        rank = priority(parts[1].partition("?")[0])
+        if rank is None:
+            return False
+        self._seen.add(parts[1])
+        self._push(url, depth, rank)
+        return True
+
+    def pop_batch(self, size):
+        """Up to `size` of the best queued pages, within the page budget"""
+        batch = []
+        while self._heap and len(batch) < min(size, self.pages_left):
+            _, depth, _, url = heapq.heappop(self._heap)
+            batch.append((url, depth))
+        self.pages_left -= len(batch)
+        return batch
+
+    def _push(self, url, depth, rank):
+        # Ties keep discovery order, so equal pages are crawled breadth first
+        self._counter += 1
+        heapq.heappush(self._heap, (rank, depth, self._counter, url))
+
+
+def found_targets(results, fields=TARGET_FIELDS):
+    return all(results.get(field) for field in fields)
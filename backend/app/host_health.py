@@ -0,0 +1,357 @@
+# backend/app/host_health.py
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import aiohttp
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from . import storage
+from .metrics import Counter, Gauge
+from .storage import db_connection
+
+logger = logging.getLogger(__name__)
+
+# Timeout for hosts not seen yet, and the range adaptive timeouts are kept in
+HOST_TIMEOUT_INITIAL_MS = float(os.getenv("HOST_TIMEOUT_INITIAL_MS", "15000"))
+HOST_TIMEOUT_MIN_MS = float(os.getenv("HOST_TIMEOUT_MIN_MS", "3000"))
+HOST_TIMEOUT_MAX_MS = float(os.getenv("HOST_TIMEOUT_MAX_MS", "30000"))
+# Retries of one page after a transient error, and the base delay of their jittered backoff
+PAGE_RETRIES = int(os.getenv("CRAWL_PAGE_RETRIES", "2"))
+RETRY_BACKOFF = float(os.getenv("CRAWL_RETRY_BACKOFF", "0.5"))
+# Retries a host may use up front; every successful load earns back a fraction of one
+HOST_RETRY_BUDGET = float(os.getenv("HOST_RETRY_BUDGET", "5"))
+HOST_RETRY_RATIO = float(os.getenv("HOST_RETRY_RATIO", "0.2"))
+# Consecutive browser failures that open a host's circuit, and how long it stays open (doubled on every trip in a row).
+# Plain HTTP failures only switch the static tier off for the host for HOST_OPEN_SECONDS
+HOST_FAILURE_THRESHOLD = int(os.getenv("HOST_FAILURE_THRESHOLD", "5"))
+HOST_OPEN_SECONDS = float(os.getenv("HOST_OPEN_SECONDS", "60"))
+HOST_OPEN_MAX_SECONDS = float(os.getenv("HOST_OPEN_MAX_SECONDS", "3600"))
+# Open circuits are written to the database and read back by other worker processes this often
+HOST_HEALTH_SHARED = os.getenv("HOST_HEALTH_SHARED", "1") == "1"
+HOST_HEALTH_SYNC = float(os.getenv("HOST_HEALTH_SYNC", "5"))
+HOST_HEALTH_MAX_HOSTS = int(os.getenv("HOST_HEALTH_MAX_HOSTS", "100000"))
+
+# Network errors worth another try; anything else (DNS, refused, TLS) fails the page at once
+TRANSIENT_NET_ERRORS = (
+    "ERR_CONNECTION_RESET", "ERR_CONNECTION_CLOSED", "ERR_EMPTY_RESPONSE", "ERR_TIMED_OUT",
+    "ERR_CONNECTION_TIMED_OUT", "ERR_NETWORK_CHANGED", "ERR_HTTP2_PROTOCOL_ERROR",
+)
+
+retries_total = Counter("crawl_page_retries_total", "Page loads retried after a transient error")
+circuit_trips_total = Counter("host_circuit_trips_total", "Times a host's circuit opened")
+fast_fails_total = Counter("host_fast_fails_total", "Page loads skipped because their host's circuit is open")
+
+
+class HostUnavailable(Exception):
+    """A host's circuit is open: it failed repeatedly and is skipped for a while"""
+
+
+class HostError(Exception):
+    """The host answered, but with a server error or a rate limit (5xx, 429)"""
+
+
+def is_host_error(status):
+    return status >= 500 or status == 429
+
+
+def host_of(url):
+    return urlparse(url).netloc.lower()
+
+
+def is_timeout(error):
+    return isinstance(error, (asyncio.TimeoutError, PlaywrightTimeoutError))
+
+
+def is_transient(error):
+    """Whether a failed load may well succeed if tried again"""
+    if is_timeout(error) or isinstance(error, (ConnectionResetError, aiohttp.ServerDisconnectedError,
+                                               aiohttp.ClientPayloadError)):
+        return True
+    message = str(error)
+    return any(code in message for code in TRANSIENT_NET_ERRORS)
+
+
+def retry_delay(attempt):
+    """Full jitter backoff: anywhere up to RETRY_BACKOFF * 2^attempt seconds"""
+    return random.uniform(0, RETRY_BACKOFF * 2 ** attempt)
+
+
+class LatencyEstimate:
+    """Smoothed latency and its variation, estimated as TCP does for round trips (RFC 6298)"""
+
+    __slots__ = ("smoothed", "variation", "backoff")
+
+    def __init__(self):
+        self.smoothed = None
+        self.variation = 0.0
+        self.backoff = 1
+
+    def observe(self, elapsed_ms):
+        if self.smoothed is None:
+            self.smoothed = elapsed_ms
+            self.variation = elapsed_ms / 2
+        else:
+            self.variation = 0.75 * self.variation + 0.25 * abs(self.smoothed - elapsed_ms)
+            self.smoothed = 0.875 * self.smoothed + 0.125 * elapsed_ms
+        self.backoff = 1
+
+    def timed_out(self):
+        # The next attempt gets longer, so a slow but working host still gets through
+        self.backoff = min(self.backoff * 2, 16)
+
+    def timeout_ms(self):
+        base = HOST_TIMEOUT_INITIAL_MS if self.smoothed is None else self.smoothed + 4 * self.variation
+        return min(HOST_TIMEOUT_MAX_MS, max(HOST_TIMEOUT_MIN_MS, base) * self.backoff)
+
+
+class HostState:
+    __slots__ = ("latency", "failures", "open_until", "trips", "probing", "retry_tokens", "static_off_until")
+
+    def __init__(self):
+        # Per fetch tier: plain HTTP responses come back much sooner than browser loads,
+        # and a host may turn away plain HTTP clients while rendering fine in the browser
+        self.latency = {}
+        self.failures = {}
+        self.static_off_until = 0.0
+        self.open_until = 0.0
+        self.trips = 0
+        self.probing = None
+        self.retry_tokens = HOST_RETRY_BUDGET
+
+
+class HostHealth:
+    """
+    What the crawler has learned about each host, shared by every job in the
+    process: how long its pages take to load, how many retries it may still
+    use, and whether it failed often enough to be skipped for a while. Once a
+    host's circuit has been open for its cooldown, one probe load is let
+    through; success closes the circuit, failure opens it again for longer.
+    Only browser loads open the circuit: failing plain HTTP requests just stop
+    the static tier for the host, and its pages go to the browser instead.
+    """
+
+    def __init__(self, shared=HOST_HEALTH_SHARED, clock=time.time):
+        self.shared = shared
+        self._clock = clock
+        self._hosts = OrderedDict()
+        self._lock = threading.Lock()
+        self._synced = 0.0
+        self._syncing = False
+        self._ready = set()
+        # Database reads and writes run here, in order, never on the event loop
+        self._executor = None
+
+    def timeout_ms(self, url, tier="browser"):
+        """Time to allow a load from the host of `url`, adapted to its past loads"""
+        with self._lock:
+            return self._latency(self._state(host_of(url)), tier).timeout_ms()
+
+    def available(self, url):
+        """Whether the host of `url` may be loaded from, without taking its probe"""
+        self._sync()
+        now = self._clock()
+        with self._lock:
+            state = self._state(host_of(url))
+            return state.open_until <= now and not self._probing(state, now)
+
+    def allow(self, url, tier="browser"):
+        """Whether to load `url` now; after an open circuit's cooldown the first caller is its probe"""
+        self._sync()
+        now = self._clock()
+        with self._lock:
+            state = self._state(host_of(url))
+            if tier != "browser":
+                # Plain HTTP requests never probe an open circuit; that is left to the browser
+                if state.static_off_until <= now and state.open_until <= now:
+                    return True
+            elif not state.open_until:
+                return True
+            elif state.open_until <= now and not self._probing(state, now):
+                state.probing = now
+                return True
+        fast_fails_total.inc()
+        return False
+
+    def take_retry(self, url):
+        """Spend one of the host's retries, if it has any left"""
+        with self._lock:
+            state = self._state(host_of(url))
+            if state.retry_tokens < 1:
+                return False
+            state.retry_tokens -= 1
+        retries_total.inc()
+        return True
+
+    def record_success(self, url, elapsed_ms, tier="browser"):
+        host = host_of(url)
+        with self._lock:
+            state = self._state(host)
+            self._latency(state, tier).observe(elapsed_ms)
+            state.failures[tier] = 0
+            state.retry_tokens = min(HOST_RETRY_BUDGET, state.retry_tokens + HOST_RETRY_RATIO)
+            if tier != "browser":
+                return
+            closed = bool(state.open_until)
+            state.open_until = 0.0
+            state.trips = 0
+            state.probing = None
+        if closed:
+            logger.info(f"{host} is answering again, circuit closed")
+            self._publish(host, None, 0)
+
+    def record_failure(self, url, error, tier="browser"):
+        host = host_of(url)
+        now = self._clock()
+        with self._lock:
+            state = self._state(host)
+            if is_timeout(error):
+                self._latency(state, tier).timed_out()
+            failures = state.failures[tier] = state.failures.get(tier, 0) + 1
+            if tier != "browser":
+                if failures < HOST_FAILURE_THRESHOLD:
+                    return
+                state.failures[tier] = 0
+                state.static_off_until = now + HOST_OPEN_SECONDS
+                logger.info(f"Plain HTTP requests to {host} keep failing, using the browser for {HOST_OPEN_SECONDS:.0f} s: {error}")
+                return
+            # A failed probe reopens the circuit straight away
+            if state.probing is None and failures < HOST_FAILURE_THRESHOLD:
+                return
+            state.trips += 1
+            state.open_until = now + min(HOST_OPEN_MAX_SECONDS, HOST_OPEN_SECONDS * 2 ** (state.trips - 1))
+            state.failures[tier] = 0
+            state.probing = None
+            open_until, trips = state.open_until, state.trips
+        circuit_trips_total.inc()
+        logger.warning(f"Circuit opened for {host} for {open_until - now:.0f} s after repeated failures: {error}")
+        self._publish(host, open_until, trips)
+
+    def open_hosts(self):
+        now = self._clock()
+        with self._lock:
+            return sum(1 for state in self._hosts.values() if state.open_until > now)
+
+    def expire(self):
+        """Forget shared circuits that closed long ago"""
+        if self.shared:
+            with self._connection() as conn:
+                conn.execute('DELETE FROM host_circuits WHERE open_until < ?', (self._clock() - HOST_OPEN_MAX_SECONDS,))
+                conn.commit()
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState()
+            if len(self._hosts) > HOST_HEALTH_MAX_HOSTS:
+                self._hosts.popitem(last=False)
+        else:
+            self._hosts.move_to_end(host)
+        return state
+
+    @staticmethod
+    def _latency(state, tier):
+        estimate = state.latency.get(tier)
+        if estimate is None:
+            estimate = state.latency[tier] = LatencyEstimate()
+        return estimate
+
+    @staticmethod
+    def _probing(state, now):
+        # A probe that never reported back (its task was cancelled) doesn't block the host forever
+        return state.probing is not None and now - state.probing < 2 * HOST_TIMEOUT_MAX_MS / 1000
+
+    def _in_background(self, fn, *args):
+        """Run a database call on this registry's own thread when called from an event loop"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            fn(*args)
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="host-health")
+        loop.run_in_executor(self._executor, fn, *args)
+
+    def _publish(self, host, open_until, trips):
+        if self.shared:
+            self._in_background(self._write_circuit, host, open_until, trips)
+
+    def _write_circuit(self, host, open_until, trips):
+        try:
+            with self._connection() as conn:
+                if open_until is None:
+                    conn.execute('DELETE FROM host_circuits WHERE host = ?', (host,))
+                else:
+                    conn.execute('INSERT OR REPLACE INTO host_circuits (host, open_until, trips) VALUES (?, ?, ?)',
+                                 (host, open_until, trips))
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"Could not share circuit state of {host}: {str(e)}")
+
+    def _sync(self):
+        """Adopt circuits other worker processes opened since the last look"""
+        now = self._clock()
+        if not self.shared or self._syncing or now - self._synced < HOST_HEALTH_SYNC:
+            return
+        self._synced = now
+        self._syncing = True
+        self._in_background(self._read_circuits, now)
+
+    def _read_circuits(self, now):
+        try:
+            with self._connection() as conn:
+                rows = conn.execute('SELECT host, open_until, trips FROM host_circuits WHERE open_until > ?',
+                                    (now,)).fetchall()
+        except Exception as e:
+            logger.warning(f"Could not read shared circuit state: {str(e)}")
+            return
+        finally:
+            self._syncing = False
+        with self._lock:
+            for host, open_until, trips in rows:
+                state = self._state(host)
+                if state.open_until < open_until:
+                    state.open_until, state.trips, state.probing = open_until, trips, None
+
+    def wait_idle(self):
+        """Block until queued database calls are done (tests, shutdown)"""
+        if self._executor is not None:
+            self._executor.submit(lambda: None).result()
+
+    def _connection(self):
+        if storage.DB_PATH not in self._ready:
+            with db_connection() as conn:
+                conn.execute('''
+                CREATE TABLE IF NOT EXISTS host_circuits (
+                    host TEXT PRIMARY KEY,
+                    open_until REAL,
+                    trips INTEGER
+                )
+                ''')
+                conn.commit()
+            self._ready.add(storage.DB_PATH)
+        return db_connection()
+
+
+_default_health = None
+
+
+def get_host_health():
+    """Host health shared by every job and event loop in this process"""
+    global _default_health
+    if _default_health is None:
+        _default_health = HostHealth()
+    return _default_health
+
+
+def set_host_health(health):
+    global _default_health
+    _default_health = health
+
+
+open_circuits = Gauge("host_circuits_open", "Hosts currently skipped because their circuit is open",
+                      callback=lambda: _default_health.open_hosts() if _default_health is not None else 0)
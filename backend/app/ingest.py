@@ -0,0 +1,356 @@
+# backend/app/ingest.py
+"""
+Bulk URL ingestion. Uploads are parsed as they are read, URLs are cleaned
+and deduplicated by site, and inputs too big for one job are split into
+child jobs of a parent job.
+"""
+import asyncio
+import codecs
+import csv
+import json
+import logging
+import os
+import re
+import tempfile
+import uuid
+from .job_queue import get_job_queue
+from .storage import complete_parent, store_job, update_job
+from .utils import clean_urls
+
+logger = logging.getLogger(__name__)
+
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", str(1024 * 1024)))
+# Larger inputs become a parent job with child jobs of at most this many URLs
+JOB_MAX_URLS = int(os.getenv("JOB_MAX_URLS", "5000"))
+# Accepted URLs are spooled in batches of this many
+INGEST_BATCH_SIZE = 10_000
+
+UPLOAD_FORMATS = {
+    ".csv": "csv",
+    ".txt": "csv",
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+}
+
+JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Runs of array items at least this long are decoded in one go
+JSON_BULK_MIN = 4096
+
+
+def upload_format(filename):
+    return UPLOAD_FORMATS.get(os.path.splitext(filename or "")[1].lower())
+
+
+def iter_text(file, chunk_size=INGEST_CHUNK_SIZE):
+    """Decoded text of a binary file, a chunk at a time"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+def iter_line_batches(chunks):
+    """The complete lines, without endings, in each chunk of text"""
+    rest = ""
+    for chunk in chunks:
+        lines = (rest + chunk).split("\n")
+        rest = lines.pop()
+        if lines:
+            yield lines
+    if rest:
+        yield [rest]
+
+
+def iter_lines(chunks):
+    """Lines, with their endings, of text coming in chunks"""
+    for lines in iter_line_batches(chunks):
+        for line in lines:
+            yield line + "\n"
+
+
+def iter_ndjson(chunks):
+    """Items of newline delimited JSON, decoded a chunk of lines at a time"""
+    for lines in iter_line_batches(chunks):
+        lines = [line for line in lines if line.strip()]
+        try:
+            items = json.loads("[" + ",".join(lines) + "]")
+        except json.JSONDecodeError:
+            # Some line is broken: go through them one by one
+            items = []
+            for line in lines:
+                try:
+                    items.append(json.loads(line))
+                except json.JSONDecodeError:
+                    items.append(None)
+        yield from items
+
+
+def url_of(item):
+    """The URL of a JSON item: a string, or an object with a "url" field"""
+    if isinstance(item, dict):
+        item = item.get("url")
+    return item if isinstance(item, str) else None
+
+
+class JsonStream:
+    """
+    Reads a JSON array of URLs, or an object with one under "urls", an item
+    at a time. Only the item being decoded is held in memory.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._items_one_by_one = False
+
+    def __iter__(self):
+        char = self._peek()
+        if char == "[":
+            yield from self._array()
+        elif char == "{":
+            self._pos += 1
+            if self._peek() == "}":
+                return
+            while True:
+                key = self._value()
+                self._expect(":")
+                if key == "urls":
+                    yield from self._array()
+                else:
+                    self._value()
+                if self._next() == "}":
+                    return
+        else:
+            raise ValueError("Expected a JSON array or object")
+
+    def _array(self):
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            items = self._buffered_items()
+            if items is not None:
+                yield from map(url_of, items)
+                continue
+            yield url_of(self._value())
+            char = self._next()
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']' in JSON array, got {char!r}")
+
+    def _buffered_items(self):
+        """
+        The array items up to the last comma in the buffer, decoded at once,
+        or None. That comma may be inside an item; then this buffer is read
+        an item at a time instead.
+        """
+        if self._items_one_by_one:
+            return None
+        cut = self._buffer.rfind(",", self._pos)
+        if cut - self._pos < JSON_BULK_MIN:
+            return None
+        try:
+            items = json.loads("[" + self._buffer[self._pos:cut] + "]")
+        except json.JSONDecodeError:
+            self._items_one_by_one = True
+            return None
+        self._pos = cut + 1
+        return items
+
+    def _fill(self):
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        self._items_one_by_one = False
+        return True
+
+    def _peek(self):
+        while True:
+            self._pos = JSON_WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON input")
+
+    def _next(self):
+        char = self._peek()
+        self._pos += 1
+        return char
+
+    def _expect(self, char):
+        found = self._next()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in JSON input, got {found!r}")
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # Most likely cut off at the end of the buffer
+                if self._fill():
+                    continue
+                raise
+            # A number could continue in the next chunk
+            if end == len(self._buffer) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+def iter_upload_urls(file, format, chunk_size=INGEST_CHUNK_SIZE):
+    """Candidate URLs of an upload; None for items that can't be one"""
+    chunks = iter_text(file, chunk_size)
+    if format == "csv":
+        for row in csv.reader(iter_lines(chunks)):
+            if row:
+                yield row[0]
+    elif format == "ndjson":
+        yield from map(url_of, iter_ndjson(chunks))
+    elif format == "json":
+        yield from JsonStream(chunks)
+    else:
+        raise ValueError(f"Unknown upload format: {format}")
+
+
+class SiteKeySet:
+    """
+    Sites seen so far, stored as the hashes of their keys. At millions of
+    rows this takes a fraction of the memory of the strings; two sites
+    sharing a 64-bit hash within one upload is vanishingly unlikely.
+    """
+
+    def __init__(self):
+        self._hashes = set()
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def add(self, key):
+        """Add a site key; False if it was already there"""
+        digest = hash(key)
+        if digest in self._hashes:
+            return False
+        self._hashes.add(digest)
+        return True
+
+
+class UrlIngest:
+    """
+    Cleans and deduplicates URLs from any number of sources. Accepted URLs
+    are spooled to a temporary file, so jobs are only created once the whole
+    input has been read without errors.
+    """
+
+    def __init__(self):
+        self.accepted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self._sites = SiteKeySet()
+        self._spool = tempfile.TemporaryFile("w+", encoding="utf-8")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._spool.close()
+
+    def add_all(self, urls):
+        accepted = []
+        for cleaned in clean_urls(urls):
+            if cleaned is None:
+                self.invalid += 1
+            elif self._sites.add(cleaned[1]):
+                accepted.append(cleaned[0])
+                if len(accepted) == INGEST_BATCH_SIZE:
+                    self._write(accepted)
+                    accepted = []
+            else:
+                self.duplicates += 1
+        self._write(accepted)
+
+    def add_upload(self, file, format, chunk_size=INGEST_CHUNK_SIZE):
+        self.add_all(iter_upload_urls(file, format, chunk_size))
+
+    async def add_upload_file(self, upload, chunk_size=INGEST_CHUNK_SIZE):
+        """Ingest a FastAPI UploadFile off the event loop"""
+        format = upload_format(upload.filename)
+        if format is None:
+            raise ValueError(f"Unsupported file type: {upload.filename}")
+        await asyncio.to_thread(self.add_upload, upload.file, format, chunk_size)
+
+    def urls(self):
+        self._spool.flush()
+        self._spool.seek(0)
+        for line in self._spool:
+            yield line.rstrip("\n")
+
+    def batches(self, size):
+        batch = []
+        for url in self.urls():
+            batch.append(url)
+            if len(batch) == size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def stats(self):
+        return {"urls": self.accepted, "duplicates": self.duplicates, "invalid": self.invalid}
+
+    def _write(self, urls):
+        # Cleaned URLs have no whitespace, so one per line is unambiguous
+        if urls:
+            self._spool.write("\n".join(urls) + "\n")
+            self.accepted += len(urls)
+
+
+def submit_ingest(ingest, options, batch_size=None, queue=None):
+    """
+    Queue the ingested URLs as one job, or as a parent job with child jobs
+    of up to `batch_size` URLs. Returns (job id, child job ids).
+    """
+    batch_size = batch_size or JOB_MAX_URLS
+    queue = queue or get_job_queue()
+    if ingest.accepted <= batch_size:
+        job_id = str(uuid.uuid4())
+        urls = list(ingest.urls())
+        store_job(job_id, {"status": "pending", "urls": urls})
+        queue.enqueue(job_id, {"urls": urls, **options})
+        return job_id, []
+
+    parent_id = str(uuid.uuid4())
+    store_job(parent_id, {"status": "pending"})
+    child_ids = []
+    for n, urls in enumerate(ingest.batches(batch_size)):
+        child_id = str(uuid.uuid4())
+        store_job(child_id, {"status": "pending", "urls": urls}, parent_id=parent_id, first_position=n * batch_size)
+        queue.enqueue(child_id, {"urls": urls, **options})
+        child_ids.append(child_id)
+
+    update_job(parent_id, overall_status="processing",
+               stats={**ingest.stats(), "child_jobs": len(child_ids)})
+    # Children finishing before this point could not complete the parent yet
+    complete_parent(parent_id)
+    logger.info(f"Split {ingest.accepted} URLs into {len(child_ids)} child jobs of {parent_id}")
+    return parent_id, child_ids
@@ -0,0 +1,204 @@
+# backend/app/job_queue.py
+import abc
+import json
+import os
+import random
+import time
+from .metrics import Gauge
+from .storage import db_connection
+
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "sqlite")
+# A running job whose worker hasn't heartbeated for this long is handed to another worker
+VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "120"))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("JOB_RETRY_BASE_DELAY", "30"))
+
+
+class QueuedJob:
+    """A job claimed by a worker"""
+
+    def __init__(self, job_id, payload, attempts, max_attempts):
+        self.job_id = job_id
+        self.payload = payload
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+
+
+class JobQueueBackend(abc.ABC):
+    """Interface every job queue backend implements"""
+
+    @abc.abstractmethod
+    def enqueue(self, job_id, payload, max_attempts=MAX_ATTEMPTS):
+        """Queue a job; it can be claimed right away"""
+
+    @abc.abstractmethod
+    def claim(self, worker_id):
+        """Take the next runnable job, or None. Stale running jobs are reclaimed."""
+
+    @abc.abstractmethod
+    def heartbeat(self, job_id, worker_id):
+        """Extend the claim; False means the job was reclaimed by someone else"""
+
+    @abc.abstractmethod
+    def complete(self, job_id, worker_id):
+        """Mark a claimed job done"""
+
+    @abc.abstractmethod
+    def fail(self, job_id, worker_id, error):
+        """Record a failed attempt; returns True if the job will be retried"""
+
+    @abc.abstractmethod
+    def reap(self):
+        """Give up on stale jobs with no attempts left; returns their ids"""
+
+    @abc.abstractmethod
+    def depth(self):
+        """Jobs waiting to be claimed"""
+
+    @abc.abstractmethod
+    def prune(self):
+        """Drop entries of deleted jobs, except ones a worker may still be running"""
+
+
+def retry_delay(attempts):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, RETRY_BASE_DELAY * 2 ** (attempts - 1))
+
+
+class SQLiteJobQueue(JobQueueBackend):
+    """Job queue stored next to the jobs in the SQLite database"""
+
+    def __init__(self, visibility_timeout=VISIBILITY_TIMEOUT):
+        self.visibility_timeout = visibility_timeout
+        with db_connection() as conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS job_queue (
+                job_id TEXT PRIMARY KEY,
+                payload TEXT,
+                status TEXT,
+                attempts INTEGER DEFAULT 0,
+                max_attempts INTEGER,
+                available_at REAL,
+                claimed_by TEXT,
+                heartbeat_at REAL,
+                last_error TEXT
+            )
+            ''')
+            conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_job_queue_status
+            ON job_queue (status, available_at)
+            ''')
+            conn.commit()
+
+    def enqueue(self, job_id, payload, max_attempts=MAX_ATTEMPTS):
+        with db_connection() as conn:
+            conn.execute('''
+            INSERT INTO job_queue (job_id, payload, status, max_attempts, available_at)
+            VALUES (?, ?, 'queued', ?, ?)
+            ''', (job_id, json.dumps(payload), max_attempts, time.time()))
+            conn.commit()
+
+    def claim(self, worker_id):
+        now = time.time()
+        with db_connection() as conn:
+            row = conn.execute('''
+            UPDATE job_queue
+            SET status = 'running', claimed_by = ?, heartbeat_at = ?, attempts = attempts + 1
+            WHERE job_id = (
+                SELECT job_id FROM job_queue
+                WHERE (status = 'queued' AND available_at <= ?)
+                   OR (status = 'running' AND heartbeat_at < ? AND attempts < max_attempts)
+                ORDER BY available_at
+                LIMIT 1
+            )
+            RETURNING job_id, payload, attempts, max_attempts
+            ''', (worker_id, now, now, now - self.visibility_timeout)).fetchone()
+            conn.commit()
+
+        if row is None:
+            return None
+        return QueuedJob(row[0], json.loads(row[1]), row[2], row[3])
+
+    def heartbeat(self, job_id, worker_id):
+        with db_connection() as conn:
+            cursor = conn.execute('''
+            UPDATE job_queue SET heartbeat_at = ?
+            WHERE job_id = ? AND claimed_by = ? AND status = 'running'
+            ''', (time.time(), job_id, worker_id))
+            conn.commit()
+            return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id):
+        with db_connection() as conn:
+            conn.execute('''
+            UPDATE job_queue SET status = 'done'
+            WHERE job_id = ? AND claimed_by = ?
+            ''', (job_id, worker_id))
+            conn.commit()
+
+    def fail(self, job_id, worker_id, error):
+        with db_connection() as conn:
+            row = conn.execute('''
+            SELECT attempts, max_attempts FROM job_queue
+            WHERE job_id = ? AND claimed_by = ?
+            ''', (job_id, worker_id)).fetchone()
+            if row is None:
+                return False
+
+            attempts, max_attempts = row
+            retry = attempts < max_attempts
+            conn.execute('''
+            UPDATE job_queue SET status = ?, available_at = ?, last_error = ?
+            WHERE job_id = ?
+            ''', ('queued' if retry else 'failed', time.time() + retry_delay(attempts), error, job_id))
+            conn.commit()
+            return retry
+
+    def reap(self):
+        with db_connection() as conn:
+            rows = conn.execute('''
+            UPDATE job_queue SET status = 'failed', last_error = 'Worker stopped heartbeating'
+            WHERE status = 'running' AND heartbeat_at < ? AND attempts >= max_attempts
+            RETURNING job_id
+            ''', (time.time() - self.visibility_timeout,)).fetchall()
+            conn.commit()
+            return [row[0] for row in rows]
+
+    def depth(self):
+        with db_connection() as conn:
+            return conn.execute('''
+            SELECT COUNT(*) FROM job_queue WHERE status = 'queued'
+            ''').fetchone()[0]
+
+    def prune(self):
+        with db_connection() as conn:
+            conn.execute('''
+            DELETE FROM job_queue
+            WHERE status != 'running' AND job_id NOT IN (SELECT id FROM jobs)
+            ''')
+            conn.commit()
+
+
+BACKENDS = {
+    "sqlite": SQLiteJobQueue,
+}
+
+_default_queue = None
+
+
+def queue_depth():
+    """Jobs waiting to be claimed, read when metrics are scraped"""
+    return get_job_queue().depth()
+
+
+queue_depth_gauge = Gauge("job_queue_depth", "Jobs queued and not yet claimed", callback=queue_depth)
+
+
+def get_job_queue():
+    """Queue backend selected by JOB_QUEUE_BACKEND"""
+    global _default_queue
+    if _default_queue is None:
+        if JOB_QUEUE_BACKEND not in BACKENDS:
+            raise ValueError(f"Unknown job queue backend: {JOB_QUEUE_BACKEND}")
+        _default_queue = BACKENDS[JOB_QUEUE_BACKEND]()
+    return _default_queue
@@ -1,20 +1,61 @@
 # backend/app/main.py
 import os
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from .routes import router
 from .cleanup import setup_scheduler
+from .runtime import crawl_runtime
+from .events import EventHub, set_event_hub
+from .metrics import render_metrics
+from .storage import add_change_listener, remove_change_listener
+from .worker import run_workers
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
 os.environ["PLAYWRIGHT_BROWSERS_PATH"] = os.getenv("PLAYWRIGHT_BROWSERS_PATH", "/opt/render/.cache/playwright")
 
+# Crawl workers started inside the API process; set to 0 when running `python -m app.worker`
+EMBEDDED_WORKERS = int(os.getenv("EMBEDDED_WORKERS", "1"))
+# Seconds a running crawl gets to finish on shutdown; unfinished jobs are reclaimed later
+SHUTDOWN_GRACE = float(os.getenv("SHUTDOWN_GRACE", "20"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_scheduler()
+
+    # Live progress streams; local writes wake the watched job's tailer immediately
+    hub = EventHub()
+    await hub.start()
+    set_event_hub(hub)
+    add_change_listener(hub.notify)
+
+    async with crawl_runtime() as pool:
+        app.state.browser_pool = pool
+        stop = asyncio.Event()
+        workers = asyncio.create_task(run_workers(stop, EMBEDDED_WORKERS)) if EMBEDDED_WORKERS else None
+        try:
+            yield
+        finally:
+            stop.set()
+            if workers is not None:
+                try:
+                    await asyncio.wait_for(workers, SHUTDOWN_GRACE)
+                except asyncio.TimeoutError:
+                    pass
+            remove_change_listener(hub.notify)
+            set_event_hub(None)
+            await hub.close()
+
 app = FastAPI(
     title="Contact Info & Social Media Extractor",
     description="API for extracting contact information from websites",
     version="1.0.0",
-    openapi_url="/openapi.json"
+    openapi_url="/openapi.json",
+    lifespan=lifespan
 )
 
 # Setup rate limiter
@@ -41,7 +82,7 @@ app.include_router(router, prefix="/api")
 def read_root():
     return {"message": "Email & Social Link Extractor API is running"}
 
-# Startup event for cleanup scheduler
-@app.on_event("startup")
-async def startup_event():
-    setup_scheduler()
+# Prometheus scrape target: crawl phases, job store latency, exports, queue depth
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,227 @@
+# backend/app/metrics.py
+import bisect
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# Off, timers are a shared no-op and every observe/inc/dec returns without recording
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def register(metric):
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+
+def format_labels(labels, extra=None):
+    pairs = {**(labels or {}), **(extra or {})}
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs.items()) + "}"
+
+
+class Histogram:
+    """Cumulative bucket histogram, cheap enough to observe on every page load"""
+
+    type = "histogram"
+
+    def __init__(self, name, description, buckets, labels=None):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+        register(self)
+
+    def observe(self, value):
+        if not METRICS_ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def summary(self):
+        if not self.count:
+            return f"{self.name}: no samples"
+        mean = self.sum / self.count
+        return (
+            f"{self.name}: n={self.count} mean={mean:.0f} "
+            f"p50<={self.quantile(0.5):g} p90<={self.quantile(0.9):g} p99<={self.quantile(0.99):g}"
+        )
+
+    def samples(self):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            le = "+Inf" if bound == float('inf') else f"{bound:g}"
+            yield f"{self.name}_bucket{format_labels(self.labels, {'le': le})} {cumulative}"
+        yield f"{self.name}_sum{format_labels(self.labels)} {total:g}"
+        yield f"{self.name}_count{format_labels(self.labels)} {count}"
+
+
+class Counter:
+    """Monotonic count of events"""
+
+    type = "counter"
+
+    def __init__(self, name, description, labels=None):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.value = 0
+        self._lock = threading.Lock()
+        register(self)
+
+    def inc(self, amount=1):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self.value += amount
+
+    def samples(self):
+        yield f"{self.name}{format_labels(self.labels)} {self.value:g}"
+
+
+class Gauge:
+    """Value that goes up and down; with `callback`, read at scrape time"""
+
+    type = "gauge"
+
+    def __init__(self, name, description, callback=None, labels=None):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.callback = callback
+        self.value = 0
+        self._lock = threading.Lock()
+        register(self)
+
+    def inc(self, amount=1):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def samples(self):
+        value = self.value
+        if self.callback is not None:
+            try:
+                value = self.callback()
+            except Exception:
+                return
+        if value is not None:
+            yield f"{self.name}{format_labels(self.labels)} {value:g}"
+
+
+def render_metrics():
+    """Every registered metric in the Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry)
+    families = {}
+    for metric in metrics:
+        families.setdefault(metric.name, []).append(metric)
+    lines = []
+    for name, family in families.items():
+        lines.append(f"# HELP {name} {family[0].description}")
+        lines.append(f"# TYPE {name} {family[0].type}")
+        for metric in family:
+            lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+class Trace:
+    """Time spent per phase while working on one item, e.g. one site of a job"""
+
+    def __init__(self):
+        self.phases = {}
+
+    def add(self, phase, elapsed_ms):
+        entry = self.phases.setdefault(phase, [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed_ms
+
+    def summary(self):
+        return {phase: {"count": count, "ms": round(total)} for phase, (count, total) in self.phases.items()}
+
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+
+
+def start_trace():
+    """Record phases timed from now on in this task (and tasks it starts) into a new Trace"""
+    trace = Trace()
+    _current_trace.set(trace)
+    return trace
+
+
+class _Timer:
+    __slots__ = ("histogram", "phase", "started")
+
+    def __init__(self, histogram, phase):
+        self.histogram = histogram
+        self.phase = phase
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed_ms = (time.perf_counter() - self.started) * 1000
+        self.histogram.observe(elapsed_ms)
+        if self.phase is not None:
+            trace = _current_trace.get()
+            if trace is not None:
+                trace.add(self.phase, elapsed_ms)
+
+
+_NULL_TIMER = nullcontext()
+
+
+def timed(histogram, phase=None):
+    """Context manager observing its duration in ms, and adding it to the current trace as `phase`"""
+    return _Timer(histogram, phase) if METRICS_ENABLED else _NULL_TIMER
+
+
+def timed_calls(histogram):
+    """Decorator observing every call's duration in ms; leaves the function as is when metrics are off"""
+    def decorate(fn):
+        if not METRICS_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timer(histogram, None):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,99 @@
+# backend/app/page_extraction.py
+import logging
+import os
+from .extractor import NON_TEXT_TAGS, SOCIAL_HOST_REGEX, WHITESPACE_PRESERVING_TAGS, contact_info_from_payload
+from .frontier import PRIORITY_KEYWORDS, canonical_parts
+
+logger = logging.getLogger(__name__)
+
+IN_PAGE_EXTRACTION = os.getenv("CRAWL_IN_PAGE_EXTRACTION", "1") == "1"
+# Visible text sent back per page, in characters; contact details sit well within it
+PAGE_TEXT_LIMIT = int(os.getenv("PAGE_TEXT_LIMIT", "200000"))
+
+# Runs in the page and returns only what extraction needs: visible text joined
+# like PageCollector does it, meta content, anchors that may be social links,
+# and same-site links the frontier would accept (www. twins included, as in
+# frontier.same_site).
+PAGE_EXTRACT_SCRIPT = """
+({ host, keywords, socialHost, nonText, preserve, textLimit, withLinks }) => {
+    const skip = new Set(nonText);
+    const keep = new Set(preserve);
+    const parts = [];
+    let length = 0;
+    let truncated = false;
+    const root = document.documentElement;
+    const walker = root ? document.createTreeWalker(root, NodeFilter.SHOW_TEXT) : null;
+    for (let node = walker && walker.nextNode(); node; node = walker.nextNode()) {
+        let hidden = false;
+        let preserving = false;
+        for (let el = node.parentElement; el; el = el.parentElement) {
+            const tag = el.localName;
+            if (skip.has(tag)) { hidden = true; break; }
+            if (keep.has(tag)) preserving = true;
+        }
+        if (hidden) continue;
+        let data = node.data;
+        if (!preserving && !/[^ \\n\\t\\f\\r]/.test(data)) data = data.includes("\\n") ? "\\n" : " ";
+        if (length + data.length > textLimit) {
+            parts.push(data.slice(0, textLimit - length));
+            truncated = true;
+            break;
+        }
+        parts.push(data);
+        length += data.length;
+    }
+
+    const bare = name => name.startsWith("www.") ? name.slice(4) : name;
+    const social = new RegExp(socialHost);
+    const anchors = [];
+    const links = new Set();
+    for (const a of document.querySelectorAll("a[href]")) {
+        const href = a.getAttribute("href");
+        const text = a.textContent || "";
+        if (social.test(href) || text.trim().startsWith("@")) {
+            anchors.push([href, text, a.getAttribute("aria-label") || ""]);
+        }
+        if (!withLinks) continue;
+        let url;
+        try { url = new URL(a.href); } catch (e) { continue; }
+        const path = url.pathname.toLowerCase();
+        if (bare(url.host) === host && keywords.some(keyword => path.includes(keyword))) links.add(url.href);
+    }
+    const meta = Array.from(document.querySelectorAll("meta[content]"), m => m.getAttribute("content"));
+    return { text: parts.join(""), truncated, meta, anchors, links: Array.from(links) };
+}
+"""
+
+
+def script_args(base_url, with_links=True, text_limit=PAGE_TEXT_LIMIT):
+    origin = canonical_parts(base_url)[0]
+    host = origin.partition("://")[2]
+    return {
+        "host": host[4:] if host.startswith("www.") else host,
+        "keywords": list(PRIORITY_KEYWORDS),
+        "socialHost": SOCIAL_HOST_REGEX.pattern,
+        "nonText": sorted(NON_TEXT_TAGS),
+        "preserve": sorted(WHITESPACE_PRESERVING_TAGS),
+        "textLimit": text_limit,
+        "withLinks": with_links,
+    }
+
+
+async def extract_in_page(page, base_url, with_links=True):
+    """
+    Contact info and candidate links of a loaded page from one evaluate
+    call, or None if the script couldn't run (e.g. the page navigated away
+    meanwhile) and the caller should fall back to parsing the HTML.
+    """
+    if not IN_PAGE_EXTRACTION:
+        return None
+    try:
+        payload = await page.evaluate(PAGE_EXTRACT_SCRIPT, script_args(base_url, with_links))
+    except Exception as e:
+        logger.debug(f"In-page extraction failed on {page.url}: {str(e)}")
+        return None
+    if not isinstance(payload, dict):
+        return None
+    if payload.get("truncated"):
+        logger.debug(f"Visible text of {page.url} cut at {PAGE_TEXT_LIMIT} characters")
+    return contact_info_from_payload(payload), payload["links"]
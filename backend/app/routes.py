@@ -1,11 +1,15 @@
 # backend/app/routes.py
+import asyncio
 import os
-import uuid
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
-from fastapi.responses import FileResponse, JSONResponse
-from .crawler import crawl_website
-from .storage import store_job, get_job, update_job
-from .utils import validate_urls, process_uploaded_file
+import base64
+import json
+from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect, UploadFile, File, HTTPException, Depends, Query
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from .browser_pool import get_browser_pool
+from .events import KEEPALIVE_INTERVAL, get_event_hub
+from .exporter import export_file, export_type
+from .storage import RESULT_FIELDS, count_site_results, get_job, get_job_revision, get_site_results
+from .ingest import UrlIngest, submit_ingest
 from .limiter import limiter
 
 router = APIRouter()
@@ -13,58 +17,226 @@ router = APIRouter()
 @router.post("/submit-urls")
 @limiter.limit("10/minute")
 async def submit_urls(
+    request: Request,
     urls: list[str] = Query(default=[]),
     file: UploadFile = File(None),
-    background_tasks: BackgroundTasks
+    max_age: int | None = Query(default=None, ge=0),
+    screenshot_mode: str | None = Query(default=None, pattern="^(off|viewport|full)$"),
+    trace: bool = False
 ):
+    """
+    Queue a crawl job. `max_age` (seconds) limits how old cached site results
+    may be; 0 crawls every site afresh. `screenshot_mode` picks how homepages
+    are captured for this job: off, viewport, or full (height capped).
+    With `trace`, each site's progress records where its crawl spent its time.
+    Uploads (CSV, JSON, NDJSON) are parsed as they are read; URLs are kept
+    once per site, and more than JOB_MAX_URLS of them are split into child jobs.
+    """
     try:
-        # Process input
-        if file:
-            file_urls = await process_uploaded_file(file)
-            urls.extend(file_urls)
-        
-        if not urls:
-            raise HTTPException(status_code=400, detail="No valid URLs provided")
-        
-        # Validate URLs
-        valid_urls = validate_urls(urls)
-        if not valid_urls:
-            raise HTTPException(status_code=400, detail="No valid URLs found")
-        
-        # Create job
-        job_id = str(uuid.uuid4())
-        store_job(job_id, {"status": "pending", "urls": valid_urls})
-        
-        # Start crawling
-        background_tasks.add_task(crawl_website, job_id, valid_urls)
-        
-        return {"job_id": job_id}
+        with UrlIngest() as ingest:
+            ingest.add_all(urls)
+            if file:
+                try:
+                    await ingest.add_upload_file(file)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=f"Invalid upload: {str(e)}")
+
+            if not ingest.accepted:
+                raise HTTPException(status_code=400, detail="No valid URLs found")
+
+            # Hand the crawl to the workers; job rows are written off the event loop
+            job_id, child_ids = await asyncio.to_thread(submit_ingest, ingest, {
+                "max_age": max_age, "screenshot_mode": screenshot_mode, "trace": trace or None
+            })
+
+        response = {"job_id": job_id, **ingest.stats()}
+        if child_ids:
+            response["child_job_ids"] = child_ids
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/job-status/{job_id}")
-def get_job_status(job_id: str):
-    job = get_job(job_id)
+def get_job_status(
+    job_id: str,
+    request: Request,
+    since: int | None = Query(default=None, ge=0),
+    include_results: bool = False
+):
+    """
+    Job status. Replies 304 when the client's ETag is current; with `since`,
+    only progress rows changed after that revision are returned.
+    """
+    revision = get_job_revision(job_id)
+    if revision is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    etag = f'"{revision}{"-r" if include_results else ""}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    job = get_job(job_id, since=since, include_results=include_results)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    return job
+    if since is not None:
+        job["since"] = since
+    return JSONResponse(job, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+def encode_cursor(cursor):
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode().rstrip("=")
+
+def decode_cursor(text):
+    try:
+        value, position = json.loads(base64.urlsafe_b64decode(text + "=" * (-len(text) % 4)))
+        return value, int(position)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/jobs/{job_id}/results")
+def get_job_results(
+    job_id: str,
+    request: Request,
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=500),
+    sort: str = Query(default="position", pattern="^(position|url|emails)$"),
+    order: str = Query(default="asc", pattern="^(asc|desc)$"),
+    has_email: bool | None = None,
+    platform: str | None = Query(default=None, pattern="^(facebook|instagram|tiktok)$"),
+    q: str | None = Query(default=None, max_length=200),
+    fields: str | None = None,
+    total: bool = False
+):
+    """
+    One page of a job's site results, filtered and sorted by the server.
+    `fields` is a comma separated projection of RESULT_FIELDS (all when not
+    given); url and position are always included. Pass `next_cursor` back as
+    `cursor` for the following page. `total` also counts the matching sites.
+    """
+    revision = get_job_revision(job_id)
+    if revision is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    etag = f'"{revision}-results"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    projection = None
+    if fields is not None:
+        projection = tuple(field.strip() for field in fields.split(",") if field.strip())
+        unknown = set(projection) - set(RESULT_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    filters = {"has_email": has_email, "platform": platform, "search": q}
+    rows, next_cursor = get_site_results(
+        job_id, decode_cursor(cursor) if cursor else None, limit, sort, order == "desc", fields=projection, **filters
+    )
+    page = {
+        "items": rows,
+        "next_cursor": encode_cursor(next_cursor) if next_cursor else None,
+        "revision": revision,
+    }
+    if total:
+        page["total"] = count_site_results(job_id, **filters)
+    return JSONResponse(page, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+async def subscribe_to_job(job_id, last_event_id):
+    hub = get_event_hub()
+    if hub is None:
+        raise HTTPException(status_code=503, detail="Event streaming not available")
+    try:
+        subscription = await hub.subscribe(job_id, last_event_id)
+    except Exception:
+        raise HTTPException(status_code=503, detail="Job state unavailable, try again")
+    if subscription is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return hub, subscription
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    request: Request,
+    last_event_id: int | None = Query(default=None, ge=0)
+):
+    """Server-Sent Events stream of a job's progress, resumable via Last-Event-ID"""
+    header = request.headers.get("last-event-id")
+    if header and header.isdigit():
+        last_event_id = int(header)
+    hub, subscription = await subscribe_to_job(job_id, last_event_id)
+
+    async def stream():
+        try:
+            async for event in subscription.events(keepalive=KEEPALIVE_INTERVAL):
+                yield event.sse if event is not None else ": keepalive\n\n"
+        finally:
+            hub.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+@router.websocket("/jobs/{job_id}/ws")
+async def job_events_websocket(websocket: WebSocket, job_id: str, last_event_id: int | None = None):
+    """
+    WebSocket equivalent of the events stream; each message is one JSON event,
+    and {"event": "keepalive"} is sent after KEEPALIVE_INTERVAL idle seconds.
+    """
+    try:
+        hub, subscription = await subscribe_to_job(job_id, last_event_id)
+    except HTTPException as e:
+        await websocket.close(code=4000 + e.status_code, reason=e.detail)
+        return
+
+    async def send_events():
+        async for event in subscription.events(keepalive=KEEPALIVE_INTERVAL):
+            await websocket.send_text(event.json if event is not None else '{"event": "keepalive"}')
+        await websocket.close()
+
+    async def wait_for_disconnect():
+        # Clients send nothing; receiving is how a closed connection is noticed
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    await websocket.accept()
+    tasks = [asyncio.create_task(send_events()), asyncio.create_task(wait_for_disconnect())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            try:
+                task.result()
+            except WebSocketDisconnect:
+                pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        hub.unsubscribe(subscription)
+
+@router.get("/pool-stats")
+def get_pool_stats():
+    pool = get_browser_pool()
+    if pool is None:
+        raise HTTPException(status_code=503, detail="Browser pool not running")
+    return pool.stats()
 
 @router.get("/export/{job_id}")
 def export_results(
     job_id: str,
-    format: str = Query(..., regex="^(csv|excel|pdf)$")
+    format: str = Query(..., pattern="^(csv|excel|pdf)$")
 ):
-    job = get_job(job_id)
-    if not job or job["status"] != "completed":
+    file_path = export_file(job_id, format)
+    if not file_path:
         raise HTTPException(status_code=404, detail="Job not available for export")
-    
-    # Implementation would create file in /tmp
-    file_path = f"/tmp/{job_id}.{format}"
-    
-    # In a real implementation, we'd generate the file here
-    # For demo, return dummy file
+
+    # Large PDF reports come as a zip of parts
+    extension, media_type = export_type(format, file_path)
     return FileResponse(
         path=file_path,
-        media_type="application/octet-stream",
-        filename=f"results.{format}"
+        media_type=media_type,
+        filename=f"results.{extension}"
     )
@@ -0,0 +1,41 @@
+# backend/app/runtime.py
+from contextlib import asynccontextmanager
+from .browser_pool import BrowserPool, set_browser_pool
+from .extraction_pool import ExtractionPool, set_extraction_pool
+from .fetcher import StaticFetcher, set_static_fetcher
+from .thumbnails import ThumbnailPool, set_thumbnail_pool
+
+
+@asynccontextmanager
+async def crawl_runtime():
+    """Start the process-wide resources crawls share, for the API and for workers"""
+    # One warm browser pool per process, shared by every crawl job
+    pool = BrowserPool()
+    await pool.start()
+    set_browser_pool(pool)
+
+    # Pooled HTTP client for the static fetch tier
+    fetcher = StaticFetcher()
+    await fetcher.start()
+    set_static_fetcher(fetcher)
+
+    # HTML parsing runs in worker processes so it never blocks the event loop
+    extraction_pool = ExtractionPool()
+    await extraction_pool.start()
+    set_extraction_pool(extraction_pool)
+
+    # Screenshot thumbnails for reports are made once, at capture time
+    thumbnail_pool = ThumbnailPool()
+    await thumbnail_pool.start()
+    set_thumbnail_pool(thumbnail_pool)
+    try:
+        yield pool
+    finally:
+        set_thumbnail_pool(None)
+        set_extraction_pool(None)
+        set_static_fetcher(None)
+        set_browser_pool(None)
+        await thumbnail_pool.close()
+        await extraction_pool.close()
+        await fetcher.close()
+        await pool.close()
@@ -1,4 +1,145 @@
-async def capture_screenshot(page, url):
-    path = f"/tmp/{uuid.uuid4()}.png"
-    await page.screenshot(path=path, full_page=True)
+# backend/app/screenshot.py
+import asyncio
+import io
+import logging
+import os
+import time
+import uuid
+from PIL import Image
+from .metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+SCREENSHOT_DIR = os.getenv("SCREENSHOT_DIR", "/tmp/email3-screenshots")
+# "off", "viewport", or "full" (the whole page, cut at SCREENSHOT_MAX_HEIGHT pixels)
+SCREENSHOT_MODE = os.getenv("SCREENSHOT_MODE", "full")
+SCREENSHOT_MAX_HEIGHT = int(os.getenv("SCREENSHOT_MAX_HEIGHT", "8000"))
+# "png", "jpeg" or "webp"
+SCREENSHOT_FORMAT = os.getenv("SCREENSHOT_FORMAT", "jpeg")
+SCREENSHOT_QUALITY = int(os.getenv("SCREENSHOT_QUALITY", "80"))
+
+MODES = ("off", "viewport", "full")
+EXTENSIONS = {"png": "png", "jpeg": "jpg", "webp": "webp"}
+# Formats the browser encodes itself; others are transcoded from its PNG
+BROWSER_FORMATS = ("png", "jpeg")
+
+PAGE_SIZE_SCRIPT = """
+() => {
+    const root = document.documentElement;
+    const body = document.body || root;
+    return [Math.max(root.scrollWidth, body.scrollWidth), Math.max(root.scrollHeight, body.scrollHeight)];
+}
+"""
+
+CAPTURE_MS_BUCKETS = (50, 100, 250, 500, 1000, 2000, 5000, 10000)
+CAPTURE_BYTES_BUCKETS = (50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000, 10_000_000)
+
+# One label value of each family per mode that takes screenshots
+capture_ms = {mode: Histogram("screenshot_capture_ms", "Screenshot capture and write time per mode",
+                              CAPTURE_MS_BUCKETS, {"mode": mode}) for mode in MODES[1:]}
+capture_bytes = {mode: Histogram("screenshot_bytes", "Screenshot file size per mode",
+                                 CAPTURE_BYTES_BUCKETS, {"mode": mode}) for mode in MODES[1:]}
+
+
+class ScreenshotSettings:
+    """How a job's homepage screenshots are taken and encoded"""
+
+    def __init__(self, mode=SCREENSHOT_MODE, format=SCREENSHOT_FORMAT, quality=SCREENSHOT_QUALITY,
+                 max_height=SCREENSHOT_MAX_HEIGHT):
+        if mode not in MODES:
+            raise ValueError(f"Unknown screenshot mode: {mode}")
+        if format not in EXTENSIONS:
+            raise ValueError(f"Unknown screenshot format: {format}")
+        self.mode = mode
+        self.format = format
+        self.quality = quality
+        self.max_height = max_height
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    @property
+    def key(self):
+        """Settings that change what a crawl's screenshot looks like; equal keys can share one"""
+        if not self.enabled:
+            return ("off",)
+        return (self.mode, self.format, self.quality, self.max_height)
+
+
+class ScreenshotStore:
+    """Directory screenshots are written to, off the event loop"""
+
+    def __init__(self, directory=SCREENSHOT_DIR):
+        self.directory = directory
+
+    def write(self, data, settings):
+        """Store captured bytes in the settings' format; returns (path, size)"""
+        if settings.format not in BROWSER_FORMATS:
+            with Image.open(io.BytesIO(data)) as image:
+                output = io.BytesIO()
+                image.save(output, format=settings.format.upper(), quality=settings.quality)
+                data = output.getvalue()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{uuid.uuid4()}.{EXTENSIONS[settings.format]}")
+        # Readers never see a half written file
+        partial = f"{path}.part"
+        with open(partial, "wb") as f:
+            f.write(data)
+        os.replace(partial, path)
+        return path, len(data)
+
+    async def save(self, data, settings):
+        return await asyncio.to_thread(self.write, data, settings)
+
+
+_default_settings = None
+_default_store = None
+
+
+def default_settings():
+    global _default_settings
+    if _default_settings is None:
+        _default_settings = ScreenshotSettings()
+    return _default_settings
+
+
+def get_screenshot_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = ScreenshotStore()
+    return _default_store
+
+
+def set_screenshot_store(store):
+    global _default_store
+    _default_store = store
+
+
+async def capture_screenshot(page, url, settings=None):
+    """Screenshot a loaded page as `settings` say; returns the file's path, or None when off"""
+    settings = settings or default_settings()
+    if not settings.enabled:
+        return None
+    started = time.perf_counter()
+    options = {"type": settings.format if settings.format in BROWSER_FORMATS else "png"}
+    if options["type"] == "jpeg":
+        options["quality"] = settings.quality
+    if settings.mode == "full":
+        width, height = await page.evaluate(PAGE_SIZE_SCRIPT)
+        options["full_page"] = True
+        options["clip"] = {"x": 0, "y": 0, "width": max(1, width), "height": max(1, min(height, settings.max_height))}
+    data = await page.screenshot(**options)
+    path, size = await get_screenshot_store().save(data, settings)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    capture_ms[settings.mode].observe(elapsed_ms)
+    capture_bytes[settings.mode].observe(size)
+    logger.info(f"Screenshot of {url} in {elapsed_ms:.0f} ms ({settings.mode} mode), {size // 1024} KB")
     return path
+
+
+def log_screenshot_histograms():
+    for mode in MODES[1:]:
+        logger.info(f"{mode} mode: {capture_ms[mode].summary()}")
+        logger.info(f"{mode} mode: {capture_bytes[mode].summary()}")
@@ -1,19 +1,193 @@
 import os
+import json
+import atexit
+import logging
 import sqlite3
+import threading
 from datetime import datetime, timedelta
+from urllib.parse import urlparse
 from contextlib import contextmanager
+from .metrics import LATENCY_BUCKETS_MS, Histogram, timed_calls
+
+logger = logging.getLogger(__name__)
 
 # Use SQLite for persistent storage (better than in-memory for production)
 DB_PATH = '/tmp/jobs.db'
 
+BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "30"))
+CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "20000"))
+# Progress rows are buffered and written in batches of this size, or this often
+PROGRESS_FLUSH_SIZE = int(os.getenv("PROGRESS_FLUSH_SIZE", "200"))
+PROGRESS_FLUSH_INTERVAL = float(os.getenv("PROGRESS_FLUSH_INTERVAL", "0.5"))
+
+FINAL_STATUSES = ('completed', 'failed')
+# Result fields listed in the contacts table, and the kind they are stored as
+CONTACT_KINDS = {'emails': 'email', 'facebook': 'facebook', 'instagram': 'instagram', 'tiktok': 'tiktok'}
+# Orders site results can be paged in, by column
+RESULT_SORTS = ('position', 'url', 'emails')
+# Data migrations init_db has run on a database, kept in its user_version
+SCHEMA_VERSION = 1
+
+# Projections of a site result; 'counts' is read from the row without decoding the result
+RESULT_FIELDS = ('emails', 'facebook', 'instagram', 'tiktok', 'screenshots', 'counts')
+
+db_ms = {op: Histogram('job_db_ms', 'Job store call latency', LATENCY_BUCKETS_MS, {'op': op})
+         for op in ('get_job', 'update_job', 'flush')}
+
+_local = threading.local()
+_change_listeners = []
+# Parent of each unfinished child job seen by this process, so its listeners hear about the children
+_parents = {}
+
+def connect(path):
+    """Open a connection tuned for many concurrent readers and one writer"""
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, cached_statements=256)
+    conn.execute('PRAGMA journal_mode=WAL')
+    # With WAL, NORMAL only fsyncs at checkpoints and is still crash safe
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KB}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
 @contextmanager
 def db_connection():
-    """Context manager for database connections"""
-    conn = sqlite3.connect(DB_PATH)
+    """Context manager handing out this thread's pooled connection"""
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(DB_PATH)
+    if conn is None:
+        conn = connections[DB_PATH] = connect(DB_PATH)
     try:
         yield conn
-    finally:
-        conn.close()
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+
+class WriteBehindBuffer:
+    """
+    Collects progress rows, site results and job stats in memory and writes
+    them in one transaction per batch. Later writes to the same row replace
+    earlier ones.
+    Readers only see committed batches, at most flush_interval behind; a
+    batch that fails to commit goes back in the buffer.
+    """
+
+    def __init__(self, flush_size=PROGRESS_FLUSH_SIZE, flush_interval=PROGRESS_FLUSH_INTERVAL):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._progress = {}
+        self._results = {}
+        self._stats = {}
+        # Set from taking a batch until it is committed or put back
+        self._in_flight = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add_progress(self, job_id, url, status, message, trace=None):
+        with self._lock:
+            self._progress[(job_id, url)] = (status, message, trace)
+            full = len(self._progress) >= self.flush_size
+        self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def add_result(self, job_id, url, position, result):
+        with self._lock:
+            self._results[(job_id, position)] = (url, result)
+            full = len(self._results) >= self.flush_size
+        self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def set_stats(self, job_id, stats):
+        with self._lock:
+            self._stats[job_id] = stats
+        self._ensure_thread()
+
+    def pending(self):
+        with self._lock:
+            return bool(self._progress or self._results or self._stats or self._in_flight)
+
+    @timed_calls(db_ms['flush'])
+    def flush(self):
+        """Write everything buffered so far"""
+        with self._flush_lock:
+            with self._lock:
+                progress, self._progress = self._progress, {}
+                results, self._results = self._results, {}
+                stats, self._stats = self._stats, {}
+                self._in_flight = bool(progress or results or stats)
+                if not self._in_flight:
+                    return
+            try:
+                self._write(progress, results, stats)
+            except Exception:
+                # Rows written since the batch was taken are newer and win
+                with self._lock:
+                    self._progress = {**progress, **self._progress}
+                    self._results = {**results, **self._results}
+                    self._stats = {**stats, **self._stats}
+                raise
+            finally:
+                with self._lock:
+                    self._in_flight = False
+
+    def _write(self, progress, results, stats):
+        with db_connection() as conn:
+            # One revision per job per batch; rows written in it carry that revision
+            revisions = {}
+            for job_id in {job_id for job_id, _ in progress} | {job_id for job_id, _ in results} | set(stats):
+                revisions[job_id] = bump_revision(conn, job_id)
+            write_site_results(conn, results)
+            conn.executemany('''
+            INSERT OR REPLACE INTO progress (job_id, url, status, message, rev, trace)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(job_id, url, status, message, revisions[job_id], json.dumps(trace) if trace is not None else None)
+                  for (job_id, url), (status, message, trace) in progress.items()])
+            conn.executemany('''
+            UPDATE jobs SET stats = ? WHERE id = ?
+            ''', [(json.dumps(job_stats), job_id) for job_id, job_stats in stats.items()])
+            conn.commit()
+        for job_id in revisions:
+            notify_change(job_id)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='progress-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing progress, retrying with the next batch: {str(e)}")
+
+write_buffer = WriteBehindBuffer()
+atexit.register(write_buffer.flush)
+
+def add_change_listener(listener):
+    """Call `listener(job_id)` after every committed change to a job, from any thread"""
+    _change_listeners.append(listener)
+
+def remove_change_listener(listener):
+    if listener in _change_listeners:
+        _change_listeners.remove(listener)
+
+def notify_change(job_id):
+    job_ids = [job_id, _parents[job_id]] if job_id in _parents else [job_id]
+    for listener in list(_change_listeners):
+        for changed in job_ids:
+            try:
+                listener(changed)
+            except Exception as e:
+                logger.error(f"Error in change listener: {str(e)}")
 
 def init_db():
     """Initialize database tables"""
@@ -24,7 +198,8 @@ def init_db():
             status TEXT,
             created_at TIMESTAMP,
             completed_at TIMESTAMP,
-            results BLOB
+            results BLOB,
+            stats TEXT
         )
         ''')
         conn.execute('''
@@ -36,58 +211,404 @@ def init_db():
             PRIMARY KEY (job_id, url)
         )
         ''')
+        add_column(conn, 'jobs', 'stats', 'TEXT')
+        add_column(conn, 'jobs', 'revision', 'INTEGER DEFAULT 0')
+        add_column(conn, 'progress', 'rev', 'INTEGER DEFAULT 0')
+        add_column(conn, 'jobs', 'parent_id', 'TEXT')
+        add_column(conn, 'progress', 'trace', 'TEXT')
+        add_column(conn, 'jobs', 'first_position', 'INTEGER DEFAULT 0')
+        # One row per crawled site, under the job its results are reported in
+        # (a split job's parent), at the site's position in the submitted URLs
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS site_results (
+            job_id TEXT,
+            position INTEGER,
+            url TEXT,
+            result TEXT,
+            PRIMARY KEY (job_id, position)
+        )
+        ''')
+        # Every email and social profile found, for queries across sites and jobs
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS contacts (
+            job_id TEXT,
+            position INTEGER,
+            site TEXT,
+            kind TEXT,
+            value TEXT,
+            domain TEXT
+        )
+        ''')
+        # Contact counts and lowercased searchable text, so results are filtered without decoding them
+        for field in CONTACT_KINDS:
+            add_column(conn, 'site_results', field, 'INTEGER')
+        add_column(conn, 'site_results', 'search', 'TEXT')
+        # Data migrations run once per database; user_version counts those done
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version < 1:
+            conn.execute(f'''
+            UPDATE site_results SET
+                {', '.join(f"{field} = COALESCE(json_array_length(result, '$.{field}'), 0)" for field in CONTACT_KINDS)},
+                search = lower(url || ' ' || (SELECT COALESCE(group_concat(value, ' '), '') FROM contacts
+                                              WHERE contacts.job_id = site_results.job_id
+                                              AND contacts.position = site_results.position))
+            WHERE search IS NULL
+            ''')
+        if version < SCHEMA_VERSION:
+            conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_site_results_url ON site_results (job_id, url, position)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_site_results_emails ON site_results (job_id, emails, position)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_contacts_site ON contacts (job_id, position)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_contacts_kind ON contacts (job_id, kind, value, position)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_contacts_domain ON contacts (domain, job_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_parent_id ON jobs (parent_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_progress_rev ON progress (job_id, rev)')
         conn.commit()
 
-def store_job(job_id, data):
-    """Store a new job in the database"""
+def add_column(conn, table, column, declaration):
+    """Add a column to a table created by an older version of the schema"""
+    columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    if column not in columns:
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {declaration}')
+
+def bump_revision(conn, job_id):
+    """
+    Increment and return a job's revision; every visible change gets a new one.
+    Child jobs count on their parent's revision, so it moves with every change
+    to any of them and their progress rows can be read through the parent.
+    """
+    row = conn.execute('''
+    UPDATE jobs SET revision = revision + 1
+    WHERE id = COALESCE((SELECT parent_id FROM jobs WHERE id = ?), ?)
+    RETURNING id, revision
+    ''', (job_id, job_id)).fetchone()
+    if row is None:
+        return 0
+    if row[0] != job_id:
+        _parents[job_id] = row[0]
+        conn.execute('UPDATE jobs SET revision = ? WHERE id = ?', (row[1], job_id))
+    return row[1]
+
+def store_job(job_id, data, parent_id=None, first_position=0):
+    """
+    Store a new job in the database, optionally as a child of a split job
+    whose URLs start at `first_position` of its parent's
+    """
     with db_connection() as conn:
         conn.execute('''
-        INSERT INTO jobs (id, status, created_at)
-        VALUES (?, ?, ?)
-        ''', (job_id, 'pending', datetime.now()))
+        INSERT INTO jobs (id, status, created_at, parent_id, first_position)
+        VALUES (?, ?, ?, ?, ?)
+        ''', (job_id, 'pending', datetime.now(), parent_id, first_position))
         conn.commit()
+    if parent_id:
+        _parents[job_id] = parent_id
+
+def contact_domain(kind, value):
+    """Domain an email address or profile URL belongs to"""
+    if kind == 'email':
+        return value.rpartition('@')[2].lower()
+    host = (urlparse(value).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+def write_site_results(conn, results):
+    """Write {(job_id, position): (url, result)} rows and their contacts, replacing earlier ones"""
+    if not results:
+        return
+    placement = {}
+    for job_id in {job_id for job_id, _ in results}:
+        row = conn.execute('''
+        SELECT COALESCE(parent_id, id), first_position FROM jobs WHERE id = ?
+        ''', (job_id,)).fetchone()
+        placement[job_id] = (row[0], row[1] or 0) if row else (job_id, 0)
+
+    sites = []
+    contacts = []
+    for (job_id, position), (url, result) in results.items():
+        root_id, first_position = placement[job_id]
+        position += first_position
+        values = {field: result.get(field) or [] for field in CONTACT_KINDS}
+        search = ' '.join([url, *(value for field_values in values.values() for value in field_values)]).lower()
+        sites.append((root_id, position, url, json.dumps(result), *map(len, values.values()), search))
+        for field, kind in CONTACT_KINDS.items():
+            for value in values[field]:
+                contacts.append((root_id, position, url, kind, value, contact_domain(kind, value)))
+    conn.executemany('''
+    DELETE FROM contacts WHERE job_id = ? AND position = ?
+    ''', [site[:2] for site in sites])
+    conn.executemany(f'''
+    INSERT OR REPLACE INTO site_results (job_id, position, url, result, {', '.join(CONTACT_KINDS)}, search)
+    VALUES (?, ?, ?, ?, {', '.join('?' for _ in CONTACT_KINDS)}, ?)
+    ''', sites)
+    conn.executemany('''
+    INSERT INTO contacts (job_id, position, site, kind, value, domain) VALUES (?, ?, ?, ?, ?, ?)
+    ''', contacts)
+
+def save_site_result(job_id, url, position, result):
+    """
+    Record one site's result as soon as it is crawled, `position` being the
+    site's index in the job's URLs. It is written with the job's next
+    progress batch, so a crash loses at most that batch.
+    """
+    write_buffer.add_result(job_id, url, position, result)
 
-def get_job(job_id):
-    """Get job details from database"""
+def get_job_revision(job_id):
+    """Current revision of a job, or None if it doesn't exist"""
+    with db_connection() as conn:
+        row = conn.execute('''
+        SELECT revision FROM jobs WHERE id = ?
+        ''', (job_id,)).fetchone()
+        return row[0] if row else None
+
+@timed_calls(db_ms['get_job'])
+def get_job(job_id, since=None, include_results=True):
+    """
+    Get job details from database. With `since`, progress only holds the
+    rows changed after that revision. A job split into child jobs lists their
+    statuses, and reports their progress and results as its own. Rows of
+    traced jobs carry their site's phase timings under 'trace'.
+    """
     with db_connection() as conn:
         job_row = conn.execute('''
-        SELECT id, status, created_at, completed_at, results
+        SELECT id, status, created_at, completed_at, stats, revision
         FROM jobs WHERE id = ?
         ''', (job_id,)).fetchone()
-        
+
         if not job_row:
             return None
-        
+
         job = {
             'id': job_row[0],
             'status': job_row[1],
             'created_at': job_row[2],
             'completed_at': job_row[3],
-            'results': job_row[4]
+            'stats': json.loads(job_row[4]) if job_row[4] else {},
+            'revision': job_row[5]
         }
-        
-        # Get progress details
-        progress_rows = conn.execute('''
-        SELECT url, status, message FROM progress
-        WHERE job_id = ?
+        if include_results:
+            job['results'] = dict(iter_job_results(job_id)) or None
+
+        children = conn.execute('''
+        SELECT id, status FROM jobs WHERE parent_id = ? ORDER BY rowid
         ''', (job_id,)).fetchall()
+        if children:
+            job['children'] = dict(children)
+
+        # Get progress details
+        progress_rows = conn.execute(f'''
+        SELECT url, status, message, trace FROM progress
+        WHERE {'job_id IN (SELECT id FROM jobs WHERE parent_id = ?)' if children else 'job_id = ?'}
+        {'AND rev > ?' if since is not None else ''}
+        ''', (job_id,) if since is None else (job_id, since)).fetchall()
         
-        job['progress'] = {
-            row[0]: {'status': row[1], 'message': row[2]}
-            for row in progress_rows
-        }
+        job['progress'] = {}
+        for url, status, message, trace in progress_rows:
+            job['progress'][url] = {'status': status, 'message': message}
+            if trace is not None:
+                job['progress'][url]['trace'] = json.loads(trace)
         
         return job
 
-def update_job(job_id, message=None, url=None, status=None, overall_status=None, results=None):
-    """Update job progress in database"""
+def iter_job_results(job_id, batch_size=500):
+    """
+    Yield (url, result) pairs of a job one at a time, in submission order,
+    reading a batch of site rows at a time. A split job yields its children's
+    results.
+    """
+    # Its own connection: a streaming response may resume this generator on another thread
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT, check_same_thread=False)
+    try:
+        cursor = conn.execute('''
+        SELECT url, result FROM site_results WHERE job_id = ? ORDER BY position
+        ''', (job_id,))
+        rows = cursor.fetchmany(batch_size)
+        if rows:
+            while rows:
+                for url, result in rows:
+                    yield url, json.loads(result)
+                rows = cursor.fetchmany(batch_size)
+            return
+
+        # Jobs finished before site rows existed keep a results document
+        job_ids = [job_id] + [row[0] for row in conn.execute('''
+        SELECT id FROM jobs WHERE parent_id = ? ORDER BY rowid
+        ''', (job_id,))]
+        for part_id in job_ids:
+            cursor = conn.execute('''
+            SELECT each.key, each.value
+            FROM jobs, json_each(jobs.results) AS each
+            WHERE jobs.id = ? AND jobs.results IS NOT NULL
+            ''', (part_id,))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for url, result in rows:
+                    yield url, json.loads(result)
+    finally:
+        conn.close()
+
+def escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def result_filters(job_id, has_email=None, platform=None, search=None):
+    """SQL conditions and parameters selecting a job's site results"""
+    if platform is not None and platform not in CONTACT_KINDS:
+        raise ValueError(f"Unknown platform: {platform}")
+    conditions = ['job_id = ?']
+    params = [job_id]
+    if has_email is not None:
+        conditions.append('emails > 0' if has_email else 'emails = 0')
+    if platform:
+        conditions.append(f'{platform} > 0')
+    if search:
+        conditions.append("search LIKE ? ESCAPE '\\'")
+        params.append(f'%{escape_like(search.lower())}%')
+    return conditions, params
+
+def get_site_results(job_id, after=None, limit=100, sort='position', descending=False,
+                     has_email=None, platform=None, search=None, fields=None):
+    """
+    A page of a job's site results as dicts of the site's position, url and
+    the result `fields` asked for (all of RESULT_FIELDS by default), ordered
+    by `sort` then position. Optionally only sites with (or without) emails,
+    with a profile on `platform`, or whose URL or contacts contain `search`.
+    Returns (rows, cursor); pass the cursor as `after` for the next page, it
+    is None after the last one. Each page is read straight off an index.
+    """
+    if sort not in RESULT_SORTS:
+        raise ValueError(f"Unknown sort: {sort}")
+    fields = RESULT_FIELDS if fields is None else fields
+    conditions, params = result_filters(job_id, has_email, platform, search)
+
+    direction, compare = ('DESC', '<') if descending else ('ASC', '>')
+    if after is not None:
+        if sort == 'position':
+            conditions.append(f'position {compare} ?')
+            params.append(after[1])
+        else:
+            conditions.append(f'({sort}, position) {compare} (?, ?)')
+            params += list(after)
+    order = f'position {direction}' if sort == 'position' else f'{sort} {direction}, position {direction}'
+    # Projections that need nothing but counts leave the result document unread
+    decode = any(field != 'counts' for field in fields)
+
+    with db_connection() as conn:
+        rows = conn.execute(f'''
+        SELECT position, url, {sort}, {', '.join(CONTACT_KINDS)}, {'result' if decode else 'NULL'}
+        FROM site_results WHERE {' AND '.join(conditions)}
+        ORDER BY {order} LIMIT ?
+        ''', (*params, limit)).fetchall()
+
+    page = []
+    for position, url, _, *counts, result in rows:
+        result = json.loads(result) if decode else None
+        row = {'position': position, 'url': url}
+        for field in fields:
+            if field == 'counts':
+                row['counts'] = dict(zip(CONTACT_KINDS, counts))
+            elif field == 'screenshots':
+                row['screenshots'] = result.get('screenshots') or {}
+            else:
+                row[field] = result.get(field) or []
+        page.append(row)
+    cursor = (rows[-1][2], rows[-1][0]) if len(rows) == limit else None
+    return page, cursor
+
+def count_site_results(job_id, has_email=None, platform=None, search=None):
+    """Number of a job's sites get_site_results would page through with these filters"""
+    conditions, params = result_filters(job_id, has_email, platform, search)
+    with db_connection() as conn:
+        return conn.execute(f'''
+        SELECT COUNT(*) FROM site_results WHERE {' AND '.join(conditions)}
+        ''', params).fetchone()[0]
+
+def get_contacts(job_id, kind=None, domain=None, after=None, limit=100):
+    """
+    A page of the contacts a job found, ordered by kind, value and site, as
+    dicts; optionally only one kind ('email', 'facebook', ...) or domain.
+    Pass the last row as `after` for the next page.
+    """
+    conditions = ['job_id = ?']
+    params = [job_id]
+    if kind:
+        conditions.append('kind = ?')
+        params.append(kind)
+    if domain:
+        conditions.append('domain = ?')
+        params.append(domain.lower())
+    if after:
+        conditions.append('(kind, value, position) > (?, ?, ?)')
+        params += [after['kind'], after['value'], after['position']]
+    with db_connection() as conn:
+        rows = conn.execute(f'''
+        SELECT kind, value, site, position FROM contacts
+        WHERE {' AND '.join(conditions)}
+        ORDER BY kind, value, position LIMIT ?
+        ''', (*params, limit)).fetchall()
+    return [{'kind': kind, 'value': value, 'site': site, 'position': position}
+            for kind, value, site, position in rows]
+
+def find_jobs_with_domain(domain, after=None, limit=100):
+    """A page of the ids of jobs that found contacts on `domain`; pass the last id as `after`"""
+    with db_connection() as conn:
+        rows = conn.execute('''
+        SELECT DISTINCT job_id FROM contacts
+        WHERE domain = ? AND job_id > ? ORDER BY job_id LIMIT ?
+        ''', (domain.lower(), after or '', limit)).fetchall()
+    return [row[0] for row in rows]
+
+def complete_parent(parent_id):
+    """
+    Finish a split job once none of its children is left to run: completed if
+    any of them completed, failed otherwise. Does nothing while the job is
+    still being split (status other than processing).
+    """
+    write_buffer.flush()
+    with db_connection() as conn:
+        row = conn.execute(f'''
+        UPDATE jobs SET
+            status = CASE WHEN EXISTS (
+                SELECT 1 FROM jobs AS child WHERE child.parent_id = jobs.id AND child.status = 'completed'
+            ) THEN 'completed' ELSE 'failed' END,
+            completed_at = ?
+        WHERE id = ? AND status = 'processing' AND NOT EXISTS (
+            SELECT 1 FROM jobs AS child
+            WHERE child.parent_id = jobs.id AND child.status NOT IN {FINAL_STATUSES}
+        )
+        RETURNING status
+        ''', (datetime.now(), parent_id)).fetchone()
+        if row is None:
+            conn.commit()
+            return None
+        bump_revision(conn, parent_id)
+        conn.commit()
+    notify_change(parent_id)
+    # Children finished in other processes are still mapped here
+    for child_id, parent in list(_parents.items()):
+        if parent == parent_id:
+            _parents.pop(child_id, None)
+    return row[0]
+
+@timed_calls(db_ms['update_job'])
+def update_job(job_id, message=None, url=None, status=None, overall_status=None, results=None, stats=None,
+               trace=None):
+    """
+    Update job progress in database; `trace` goes with the URL's progress
+    row. `results` ({url: result}, in submission order) replace the job's
+    site rows; crawls save them a site at a time with save_site_result.
+    """
+    # Per-URL progress and stats are frequent; they go through the write-behind buffer
+    if url and status:
+        write_buffer.add_progress(job_id, url, status, message, trace)
+    if stats:
+        write_buffer.set_stats(job_id, stats)
+    if not (overall_status or results):
+        return
+
+    # Job level changes are written through, after the progress that preceded them
+    write_buffer.flush()
     with db_connection() as conn:
-        if url and status:
-            conn.execute('''
-            INSERT OR REPLACE INTO progress (job_id, url, status, message)
-            VALUES (?, ?, ?, ?)
-            ''', (job_id, url, status, message))
-        
         if overall_status:
             conn.execute('''
             UPDATE jobs SET status = ? WHERE id = ?
@@ -99,12 +620,17 @@ def update_job(job_id, message=None, url=None, status=None, overall_status=None,
                 ''', (datetime.now(), job_id))
         
         if results:
-            import json
-            conn.execute('''
-            UPDATE jobs SET results = ? WHERE id = ?
-            ''', (json.dumps(results), job_id))
-        
+            write_site_results(conn, {(job_id, position): (url, result)
+                                      for position, (url, result) in enumerate(results.items())})
+
+        bump_revision(conn, job_id)
+        parent = conn.execute('SELECT parent_id FROM jobs WHERE id = ?', (job_id,)).fetchone()
         conn.commit()
+    notify_change(job_id)
+    # The last child to finish finishes its parent
+    if overall_status in FINAL_STATUSES and parent and parent[0]:
+        _parents.pop(job_id, None)
+        complete_parent(parent[0])
 
 # Initialize database on import
 init_db()
@@ -0,0 +1,119 @@
+# backend/app/thumbnails.py
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# "jpeg" or "webp"
+THUMBNAIL_FORMAT = os.getenv("THUMBNAIL_FORMAT", "jpeg")
+THUMBNAIL_WIDTH = int(os.getenv("THUMBNAIL_WIDTH", "480"))
+# Full-page screenshots can be very tall; the thumbnail keeps the top of the page
+THUMBNAIL_MAX_HEIGHT = int(os.getenv("THUMBNAIL_MAX_HEIGHT", "720"))
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "70"))
+# "process" or "thread"
+THUMBNAIL_MODE = os.getenv("THUMBNAIL_MODE", "process")
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", str(min(2, os.cpu_count() or 1))))
+
+EXTENSIONS = {"jpeg": "jpg", "webp": "webp"}
+
+
+def thumbnail_path(source, format=THUMBNAIL_FORMAT):
+    return f"{os.path.splitext(source)[0]}.thumb.{EXTENSIONS[format]}"
+
+
+def make_thumbnail(source, dest=None, format=THUMBNAIL_FORMAT, width=THUMBNAIL_WIDTH,
+                   max_height=THUMBNAIL_MAX_HEIGHT, quality=THUMBNAIL_QUALITY):
+    """Write a small compressed thumbnail of the top of a screenshot; returns its path"""
+    if format not in EXTENSIONS:
+        raise ValueError(f"Unknown thumbnail format: {format}")
+    dest = dest or thumbnail_path(source, format)
+    with Image.open(source) as image:
+        if image.format == "JPEG" and width < image.width:
+            # Let the decoder scale down by up to 8x, staying at least `width` wide
+            image.draft("RGB", (width, round(image.height * width / image.width)))
+        scale = min(1.0, width / image.width)
+        height = min(image.height, round(max_height / scale))
+        # Other formats are decoded whole; screenshots stop at SCREENSHOT_MAX_HEIGHT rows
+        top = image.crop((0, 0, image.width, height))
+        top.thumbnail((width, max_height), reducing_gap=2.0)
+        if top.mode != "RGB":
+            top = top.convert("RGB")
+        top.save(dest, format=format.upper(), quality=quality, optimize=True)
+    return dest
+
+
+class ThumbnailPool:
+    """Creates screenshot thumbnails off the event loop, a few at a time"""
+
+    def __init__(self, mode=THUMBNAIL_MODE, workers=THUMBNAIL_WORKERS):
+        if mode not in ("process", "thread"):
+            raise ValueError(f"Unknown thumbnail mode: {mode}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self._executor = None
+        self._stats = {"created": 0, "errors": 0}
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        if self._executor is not None:
+            return
+        if self.mode == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="thumbnail")
+
+    async def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def create(self, source):
+        if self._executor is None:
+            raise RuntimeError("Thumbnail pool is not started")
+        try:
+            path = await asyncio.get_running_loop().run_in_executor(self._executor, make_thumbnail, source)
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        self._stats["created"] += 1
+        return path
+
+    def stats(self):
+        return {**self._stats, "mode": self.mode, "workers": self.workers}
+
+
+_default_pool = None
+
+
+def get_thumbnail_pool():
+    """Pool owned by the running app, if any"""
+    return _default_pool
+
+
+def set_thumbnail_pool(pool):
+    global _default_pool
+    _default_pool = pool
+
+
+async def create_thumbnail(source):
+    """Thumbnail a screenshot through the app's pool; None if it couldn't be made"""
+    pool = get_thumbnail_pool()
+    try:
+        if pool is None:
+            return await asyncio.to_thread(make_thumbnail, source)
+        return await pool.create(source)
+    except Exception as e:
+        logger.warning(f"Error creating thumbnail for {source}: {str(e)}")
+        return None
@@ -1,23 +1,22 @@
 import re
-from urllib.parse import urlparse, urljoin
+from .frontier import DEFAULT_PORTS
+
+# A site URL: optional scheme and credentials, a dotted host, then an optional port and path
+SITE_URL_REGEX = re.compile(
+    r'\s*('
+    r'(?:(https?)://)?'
+    r'(?:[^\s/?#@]*+@)?'
+    r'([\w-]+(?:\.[\w-]+)+)'
+    r'(?::(\d{1,5}))?'
+    r'(?:[/?#]\S*+)?'
+    r')\s*',
+    re.IGNORECASE
+)
 
 def normalize_url(url):
     """Normalize URL for comparison"""
     return url.lower().rstrip('/')
 
-def should_crawl(url, base_url):
-    """Determine if a URL should be crawled based on path"""
-    parsed = urlparse(url)
-    base_parsed = urlparse(base_url)
-    
-    # Ensure same domain
-    if parsed.netloc != base_parsed.netloc:
-        return False
-    
-    # Check for contact-related paths
-    path = parsed.path.lower()
-    return any(kw in path for kw in ['contact', 'about', 'team', 'support', 'connect'])
-
 def normalize_social_url(url, platform):
     """Normalize social media URLs"""
     url = url.strip().lower()
@@ -42,37 +41,40 @@ def normalize_social_url(url, platform):
     
     return url
 
-def validate_urls(urls):
-    """Validate and normalize a list of URLs"""
-    valid_urls = []
+def clean_url(url):
+    """
+    (url, site key) of a submitted URL, or None if it doesn't look like one.
+    URLs without a scheme get https://. The site key is the host without
+    "www." or a default port, so every URL of a site shares it.
+    """
+    return next(clean_urls((url,)))
+
+def clean_urls(urls):
+    """clean_url over many URLs, yielding None for those (and any None) that aren't one"""
+    match = SITE_URL_REGEX.fullmatch
     for url in urls:
-        url = url.strip()
-        if not url:
+        found = match(url) if url is not None else None
+        if found is None:
+            yield None
             continue
-        if not url.startswith(('http://', 'https://')):
+        url, scheme, host, port = found.groups()
+        if scheme is None:
+            scheme = 'https'
             url = 'https://' + url
-        valid_urls.append(url)
-    return valid_urls
+        host = host.lower()
+        if host.startswith('www.'):
+            host = host[4:]
+        if port and int(port) != DEFAULT_PORTS[scheme.lower()]:
+            host = f'{host}:{port}'
+        yield url, host
 
-def process_uploaded_file(file):
-    """Process uploaded CSV/JSON file to extract URLs"""
-    content = file.read().decode('utf-8')
-    
-    # CSV format
-    if file.filename.endswith('.csv'):
-        import csv
-        from io import StringIO
-        reader = csv.reader(StringIO(content))
-        urls = [row[0] for row in reader if row]
-        return validate_urls(urls)
-    
-    # JSON format
-    elif file.filename.endswith('.json'):
-        import json
-        data = json.loads(content)
-        if isinstance(data, list):
-            return validate_urls(data)
-        elif 'urls' in data:
-            return validate_urls(data['urls'])
-    
-    return []
+def validate_urls(urls):
+    """Validate and normalize a list of URLs, keeping the first URL of each site"""
+    valid_urls = []
+    seen = set()
+    for cleaned in clean_urls(urls):
+        if cleaned is None or cleaned[1] in seen:
+            continue
+        seen.add(cleaned[1])
+        valid_urls.append(cleaned[0])
+    return valid_urls
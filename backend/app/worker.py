@@ -0,0 +1,118 @@
+# backend/app/worker.py
+"""
+Crawl worker. Run any number of these next to the API:
+
+    python -m app.worker
+"""
+import asyncio
+import logging
+import os
+import signal
+import socket
+import uuid
+from .crawler import crawl_website
+from .job_queue import get_job_queue
+from .metrics import Gauge
+from .runtime import crawl_runtime
+from .storage import update_job
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "2"))
+HEARTBEAT_INTERVAL = float(os.getenv("WORKER_HEARTBEAT_INTERVAL", "15"))
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))
+# Job payload fields passed through to the crawl as keyword arguments
+JOB_OPTIONS = ("max_age", "screenshot_mode", "trace")
+
+jobs_running = Gauge("crawl_jobs_running", "Jobs being crawled by this process")
+
+
+class CrawlWorker:
+    """Claims jobs from the queue and crawls them while heartbeating"""
+
+    def __init__(self, queue, worker_id=None, crawl=crawl_website,
+                 poll_interval=POLL_INTERVAL, heartbeat_interval=HEARTBEAT_INTERVAL):
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.crawl = crawl
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+
+    async def run(self, stop):
+        """Work until `stop` (an asyncio.Event) is set"""
+        logger.info(f"Worker {self.worker_id} started")
+        while not stop.is_set():
+            try:
+                worked = await self.run_once()
+            except Exception as e:
+                logger.error(f"Worker {self.worker_id} error: {str(e)}")
+                worked = False
+            if not worked:
+                try:
+                    await asyncio.wait_for(stop.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        logger.info(f"Worker {self.worker_id} stopped")
+
+    async def run_once(self):
+        """Claim and run a single job; False if the queue was empty"""
+        for job_id in await asyncio.to_thread(self.queue.reap):
+            update_job(job_id, "Job failed: worker stopped responding", overall_status="failed")
+
+        job = await asyncio.to_thread(self.queue.claim, self.worker_id)
+        if job is None:
+            return False
+
+        logger.info(f"Worker {self.worker_id} claimed job {job.job_id} (attempt {job.attempts})")
+        update_job(job.job_id, f"Started attempt {job.attempts}", overall_status="processing")
+
+        options = {name: job.payload[name] for name in JOB_OPTIONS if job.payload.get(name) is not None}
+        crawl = asyncio.create_task(self.crawl(job.job_id, job.payload["urls"], **options))
+        heartbeat = asyncio.create_task(self._heartbeat(job.job_id, crawl))
+        jobs_running.inc()
+        try:
+            await crawl
+        except asyncio.CancelledError:
+            if not crawl.cancelled():
+                raise
+            logger.warning(f"Job {job.job_id} was reclaimed by another worker")
+        except Exception as e:
+            retry = await asyncio.to_thread(self.queue.fail, job.job_id, self.worker_id, str(e))
+            if retry:
+                update_job(job.job_id, f"Attempt {job.attempts} failed, retrying: {str(e)}", overall_status="pending")
+            else:
+                update_job(job.job_id, f"Job failed: {str(e)}", overall_status="failed")
+        else:
+            await asyncio.to_thread(self.queue.complete, job.job_id, self.worker_id)
+        finally:
+            jobs_running.dec()
+            heartbeat.cancel()
+        return True
+
+    async def _heartbeat(self, job_id, crawl):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            if not await asyncio.to_thread(self.queue.heartbeat, job_id, self.worker_id):
+                crawl.cancel()
+                return
+
+
+async def run_workers(stop, concurrency=WORKER_CONCURRENCY):
+    queue = get_job_queue()
+    workers = [CrawlWorker(queue) for _ in range(concurrency)]
+    await asyncio.gather(*(worker.run(stop) for worker in workers))
+
+
+async def main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    async with crawl_runtime():
+        await run_workers(stop)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,339 @@
+"""
+End-to-end crawl throughput against a farm of synthetic sites on loopback.
+
+    python -m benchmarks.bench_crawl [--sites 2000] [--screenshot-mode off] [--output run.json]
+    python -m benchmarks.bench_crawl --sites 500 --baseline run.json
+
+Every site gets its own loopback address (127.x.y.z), so per-host politeness
+and connection limits apply as they would on the internet. Sites vary page
+size, link fan-out, JS-rendered content, email obfuscation, slow responses,
+and whether they publish robots.txt and a (gzipped) sitemap. The farm runs
+in its own process; the crawl runs through crawl_runtime() and
+crawl_website() like a worker does. Reports pages/sec, sites/min, page loads
+and all requests (discovery included) per site, sites where an email was
+found, p50/p99 per-site latency, peak RSS of the crawler and of its Chromium
+processes, and the most Chromium processes seen at once, as JSON.
+With --baseline, ratios against an earlier report are added.
+
+Needs Playwright's Chromium installed (python -m playwright install chromium).
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+FARM_PORT = 8765
+FILLER = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore "
+          "et dolore magna aliqua enim ad minim veniam quis nostrud exercitation ullamco laboris").split()
+SECTIONS = ("about", "contact", "team", "support", "blog", "products", "careers", "news", "pricing", "docs")
+
+
+def site_address(n):
+    """Loopback address of site `n`; all of 127.0.0.0/8 reaches this machine"""
+    n += 1
+    return f"127.{1 + n // 65536}.{n // 256 % 256}.{n % 256}"
+
+
+def site_number(address):
+    _, a, b, c = map(int, address.split("."))
+    return (a - 1) * 65536 + b * 256 + c - 1
+
+
+class SiteProfile:
+    """What synthetic site `n` looks like; derived from the seed, so both processes agree"""
+
+    def __init__(self, n, seed, js_share, slow_share, slow_ms, sitemap_share):
+        rng = random.Random(f"{seed}:{n}")
+        self.n = n
+        # Log-uniform page size, 5 KB to 500 KB
+        self.page_kb = int(5 * 100 ** rng.random())
+        self.fan_out = rng.randint(2, 40)
+        self.pages = rng.randint(3, 60)
+        self.js_rendered = rng.random() < js_share
+        self.delay = rng.uniform(0.5, 1.0) * slow_ms / 1000 if rng.random() < slow_share else 0
+        self.obfuscation = rng.choice(("plain", "brackets", "parens", "words", "mailto"))
+        self.socials = [platform for platform in ("facebook", "instagram", "tiktok") if rng.random() < 0.6]
+        # Contacts are usually on a contact page, sometimes deep in the site, sometimes missing
+        self.email_page = rng.choice(("/contact", "/contact", "/about", "/", self.paths()[-1], None))
+        # None, or whether the sitemap listed in robots.txt is gzipped
+        self.sitemap = (rng.random() < 0.5) if rng.random() < sitemap_share else None
+
+    def paths(self):
+        return ["/"] + [f"/{SECTIONS[k % len(SECTIONS)]}" if k < len(SECTIONS) else f"/{SECTIONS[k % len(SECTIONS)]}/{k}"
+                        for k in range(self.pages - 1)]
+
+    def email(self):
+        user, domain = f"info{self.n}", f"site{self.n}.example"
+        return {
+            "plain": f"{user}@{domain}.com",
+            "brackets": f"{user} [at] {domain} [dot] com",
+            "parens": f"{user}(at){domain}(dot)com",
+            "words": f"{user} at {domain} dot com",
+            "mailto": f'<a href="mailto:{user}@{domain}.com">Email us</a>',
+        }[self.obfuscation]
+
+    def robots(self, origin):
+        name = "sitemap.xml.gz" if self.sitemap else "sitemap.xml"
+        return f"User-agent: *\nDisallow: /admin\n\nSitemap: {origin}/{name}\n"
+
+    def sitemap_xml(self, origin):
+        locs = "".join(f"<url><loc>{origin}{path}</loc></url>" for path in self.paths())
+        return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{locs}</urlset>'
+
+    def page(self, path):
+        """HTML of a page, or None if the site has no such page"""
+        paths = self.paths()
+        if path not in paths:
+            return None
+        rng = random.Random(f"{self.n}:{path}")
+        links = "".join(f'<li><a href="{link}">{link.strip("/") or "home"}</a></li>'
+                        for link in rng.sample(paths, min(self.fan_out, len(paths))))
+        footer = "".join(f'<a href="https://{platform}.com/{"@" if platform == "tiktok" else ""}site{self.n}">'
+                         f'{platform}</a>' for platform in self.socials)
+        body = [f"<h1>Site {self.n} {path}</h1>", f"<ul class=\"nav\">{links}</ul>"]
+        if path == self.email_page:
+            body.append(f"<p>Write to {self.email()} any time.</p>")
+        size = 0
+        while size < self.page_kb * 1024:
+            paragraph = "<p>" + " ".join(rng.choice(FILLER) for _ in range(rng.randint(20, 120))) + "</p>"
+            body.append(paragraph)
+            size += len(paragraph)
+        body.append(f"<footer>{footer}</footer>")
+        content = "".join(body)
+        if self.js_rendered:
+            # An empty app shell; the content only exists once the script has run
+            return ('<!DOCTYPE html><html><head><title>App</title></head><body><div id="root"></div>'
+                    f'<script>document.getElementById("root").innerHTML = {json.dumps(content)};</script>'
+                    '</body></html>')
+        return f"<!DOCTYPE html><html><head><title>Site {self.n}</title></head><body>{content}</body></html>"
+
+
+async def serve(args):
+    """The site farm: one listening socket per site address, all served by one app"""
+    from aiohttp import web
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    profiles = {}
+
+    async def handle(request):
+        n = site_number(request.transport.get_extra_info("sockname")[0])
+        profile = profiles.get(n)
+        if profile is None:
+            profile = profiles[n] = SiteProfile(n, args.seed, args.js_share, args.slow_share, args.slow_ms,
+                                                args.sitemap_share)
+        if profile.delay:
+            await asyncio.sleep(profile.delay)
+        if profile.sitemap is not None:
+            origin = f"http://{request.host}"
+            if request.path == "/robots.txt":
+                return web.Response(text=profile.robots(origin))
+            if request.path == ("/sitemap.xml.gz" if profile.sitemap else "/sitemap.xml"):
+                xml = profile.sitemap_xml(origin)
+                if profile.sitemap:
+                    return web.Response(body=gzip.compress(xml.encode()), content_type="application/x-gzip")
+                return web.Response(text=xml, content_type="application/xml")
+        html = profile.page(request.path.rstrip("/") or "/")
+        if html is None:
+            return web.Response(status=404, text="Not found")
+        return web.Response(text=html, content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/{path:.*}", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    for n in range(args.sites):
+        await web.TCPSite(runner, site_address(n), args.port).start()
+    print("ready", flush=True)
+    # Runs until the benchmark closes our stdin, or exits without doing so
+    await asyncio.to_thread(sys.stdin.read)
+    await runner.cleanup()
+
+
+class ProcessSampler:
+    """Peak RSS of this process and of its Chromium processes, sampled in a thread"""
+
+    def __init__(self, interval=0.5):
+        import psutil
+        from app.browser_pool import MARKER_ARG
+        self.psutil = psutil
+        self.marker = MARKER_ARG
+        self.interval = interval
+        self.peak_chromium_processes = 0
+        self.peak_chromium_rss = 0
+        self._task = None
+
+    def sample(self):
+        chromium = []
+        for proc in self.psutil.Process().children(recursive=False):
+            try:
+                if any(arg.startswith(self.marker) for arg in proc.cmdline()):
+                    chromium += [proc, *proc.children(recursive=True)]
+                else:
+                    # Playwright's driver: the browsers hang off it
+                    for child in proc.children(recursive=False):
+                        if any(arg.startswith(self.marker) for arg in child.cmdline()):
+                            chromium += [child, *child.children(recursive=True)]
+            except (self.psutil.NoSuchProcess, self.psutil.AccessDenied):
+                continue
+        rss = 0
+        for proc in chromium:
+            try:
+                rss += proc.memory_info().rss
+            except (self.psutil.NoSuchProcess, self.psutil.AccessDenied):
+                pass
+        self.peak_chromium_processes = max(self.peak_chromium_processes, len(chromium))
+        self.peak_chromium_rss = max(self.peak_chromium_rss, rss)
+
+    async def run(self):
+        while True:
+            await asyncio.to_thread(self.sample)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self.sample()
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[max(0, min(len(values) - 1, int(round(q * len(values))) - 1))] if values else None
+
+
+async def crawl(args, urls):
+    from app import storage
+    from app.crawler import crawl_website
+    from app.runtime import crawl_runtime
+
+    storage.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+    storage.init_db()
+    job_id = str(uuid.uuid4())
+    storage.store_job(job_id, {})
+
+    sampler = ProcessSampler()
+    async with crawl_runtime():
+        sampler.start()
+        started = time.perf_counter()
+        await crawl_website(job_id, urls, screenshot_mode=args.screenshot_mode, trace=True)
+        elapsed = time.perf_counter() - started
+        await sampler.stop()
+
+    job = storage.get_job(job_id, include_results=False)
+    site_ms = [row["trace"]["site"]["ms"] for row in job["progress"].values()
+               if row["status"] == "completed" and "site" in row.get("trace", {})]
+    tiers = job["stats"].get("fetch_tiers", {})
+    pages = tiers.get("http", 0) + tiers.get("browser", 0)
+    completed = sum(row["status"] == "completed" for row in job["progress"].values())
+    with_email = storage.count_site_results(job_id, has_email=True)
+    return {
+        "sites": len(urls),
+        "sites_completed": completed,
+        "pages": pages,
+        "pages_http": tiers.get("http", 0),
+        "pages_browser": tiers.get("browser", 0),
+        "pages_per_site": round(pages / len(urls), 2),
+        # Every request a site cost: page loads plus robots.txt, sitemap and contact path probes
+        "discovery_requests": tiers.get("discovery", 0),
+        "requests_per_site": round((pages + tiers.get("discovery", 0)) / len(urls), 2),
+        "sites_with_email": with_email,
+        "seconds": round(elapsed, 2),
+        "pages_per_second": round(pages / elapsed, 2),
+        "sites_per_minute": round(completed / elapsed * 60, 1),
+        "site_p50_ms": percentile(site_ms, 0.5),
+        "site_p99_ms": percentile(site_ms, 0.99),
+        "site_mean_ms": round(statistics.mean(site_ms)) if site_ms else None,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024),
+        "peak_chromium_rss_mb": round(sampler.peak_chromium_rss / 2 ** 20),
+        "peak_chromium_processes": sampler.peak_chromium_processes,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(report, baseline):
+    """Ratio of each numeric result to the baseline's; above 1 means more of it"""
+    ratios = {}
+    for key, value in report["results"].items():
+        before = baseline.get("results", {}).get(key)
+        if isinstance(value, (int, float)) and isinstance(before, (int, float)) and before:
+            ratios[key] = round(value / before, 3)
+    return {"commit": baseline.get("commit"), "ratios": ratios}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sites", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=FARM_PORT)
+    parser.add_argument("--js-share", type=float, default=0.2, help="share of sites rendered by JavaScript")
+    parser.add_argument("--slow-share", type=float, default=0.05, help="share of sites that answer slowly")
+    parser.add_argument("--slow-ms", type=float, default=3000, help="slowest response delay of a slow site")
+    parser.add_argument("--sitemap-share", type=float, default=0.5, help="share of sites with robots.txt and a sitemap")
+    parser.add_argument("--screenshot-mode", default="off", choices=["off", "viewport", "full"])
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--baseline", help="report of an earlier run to compare against")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        asyncio.run(serve(args))
+        return
+    # Every run crawls afresh instead of reading the last run's results
+    os.environ.setdefault("CRAWL_CACHE_ENABLED", "0")
+
+    farm = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.bench_crawl", "--serve", "--sites", str(args.sites),
+        "--seed", str(args.seed), "--port", str(args.port), "--js-share", str(args.js_share),
+        "--slow-share", str(args.slow_share), "--slow-ms", str(args.slow_ms),
+        "--sitemap-share", str(args.sitemap_share),
+    ], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        if farm.stdout.readline().strip() != "ready":
+            raise SystemExit("Site farm failed to start")
+        urls = [f"http://{site_address(n)}:{args.port}/" for n in range(args.sites)]
+        results = asyncio.run(crawl(args, urls))
+    finally:
+        farm.stdin.close()
+        try:
+            farm.wait(10)
+        except subprocess.TimeoutExpired:
+            farm.kill()
+
+    report = {
+        "commit": git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("serve", "output", "baseline")},
+        "env": {name: os.environ[name] for name in sorted(os.environ)
+                if name.startswith(("CRAWL_", "BROWSER_", "STATIC_", "SCREENSHOT_", "SITEMAP_", "DISCOVERY_"))},
+        "results": results,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["baseline"] = compare(report, json.load(f))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
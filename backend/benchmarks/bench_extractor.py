@@ -0,0 +1,71 @@
+"""
+Microbenchmark of the single-pass extractor against the BeautifulSoup one.
+
+    python -m benchmarks.bench_extractor [--pages 20] [--size-kb 1024]
+"""
+import argparse
+import json
+import random
+import time
+from app.extractor import extract_contact_info, extract_contact_info_soup
+
+BLOCKS = [
+    '<div class="card"><h3>Team member</h3><p>{words}</p><a href="/team/{n}">Profile</a></div>',
+    '<p>{words} Reach us at person{n}@example.com or sales{n} [at] example [dot] com.</p>',
+    '<ul class="nav"><li><a href="/page/{n}">Page {n}</a></li><li><a href="/blog/{n}">Blog</a></li></ul>',
+    '<footer><a href="https://facebook.com/company{n}">Facebook</a>'
+    '<a href="https://instagram.com/company{n}">Instagram</a>'
+    '<a href="#" aria-label="TikTok">@company{n}</a></footer>',
+    '<script>window.__STATE__ = {{"id": {n}, "text": "{words}"}};</script>',
+    '<table><tr><td>{words}</td><td>{n}</td></tr></table>',
+]
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor".split()
+
+
+def make_page(size_kb, seed):
+    rng = random.Random(seed)
+    parts = ['<!DOCTYPE html><html><head><title>Fixture</title>'
+             '<meta name="contact" content="meta@example.com"></head><body>']
+    size = 0
+    n = 0
+    while size < size_kb * 1024:
+        words = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 60)))
+        block = rng.choice(BLOCKS).format(words=words, n=n)
+        parts.append(block)
+        size += len(block)
+        n += 1
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def bench(func, pages):
+    started = time.perf_counter()
+    outputs = [func(html, 'https://example.com') for html in pages]
+    return time.perf_counter() - started, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--size-kb', type=int, default=1024)
+    args = parser.parse_args()
+
+    pages = [make_page(args.size_kb, seed) for seed in range(args.pages)]
+    soup_time, soup_out = bench(extract_contact_info_soup, pages)
+    stream_time, stream_out = bench(extract_contact_info, pages)
+
+    mb = sum(len(p) for p in pages) / (1024 * 1024)
+    print(json.dumps({
+        'pages': args.pages,
+        'total_mb': round(mb, 1),
+        'outputs_match': soup_out == stream_out,
+        'soup_seconds': round(soup_time, 3),
+        'streaming_seconds': round(stream_time, 3),
+        'soup_mb_per_s': round(mb / soup_time, 1),
+        'streaming_mb_per_s': round(mb / stream_time, 1),
+        'speedup': round(soup_time / stream_time, 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
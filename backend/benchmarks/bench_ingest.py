@@ -0,0 +1,123 @@
+"""
+URL ingest throughput and peak memory per upload format, against the old
+read-everything path (decode the whole file, build lists, validate in a loop).
+
+    python -m benchmarks.bench_ingest [--rows 1000000] [--duplicates 0.2]
+
+Each run is its own process so peak RSS is not shared.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from app.ingest import UrlIngest
+
+FORMATS = ('csv', 'ndjson', 'json')
+EXTENSIONS = {'csv': 'csv', 'ndjson': 'ndjson', 'json': 'json'}
+
+
+def make_urls(rows, duplicates):
+    rng = random.Random(0)
+    sites = max(1, int(rows * (1 - duplicates)))
+    for n in range(rows):
+        site = n if n < sites else rng.randrange(sites)
+        prefix = rng.choice(('', 'https://', 'http://www.'))
+        yield f'{prefix}site-{site}.example.com/{rng.choice(("", "contact", "about?ref=list"))}'
+
+
+def write_input(path, format, rows, duplicates):
+    with open(path, 'w', encoding='utf-8') as f:
+        if format == 'csv':
+            f.write('url,company,city\n')
+            for n, url in enumerate(make_urls(rows, duplicates)):
+                f.write(f'{url},"Company {n}, Ltd",Springfield\n')
+        elif format == 'ndjson':
+            for n, url in enumerate(make_urls(rows, duplicates)):
+                f.write(json.dumps({'url': url, 'company': f'Company {n}'}) + '\n')
+        else:
+            f.write('{"urls": [')
+            for n, url in enumerate(make_urls(rows, duplicates)):
+                f.write((',' if n else '') + json.dumps(url))
+            f.write(']}')
+
+
+def legacy_ingest(path, format):
+    """The upload path before streaming: whole file in memory, no deduplication"""
+    with open(path, 'rb') as f:
+        content = f.read().decode('utf-8')
+    if format == 'csv':
+        urls = [row[0] for row in csv.reader(io.StringIO(content)) if row]
+    elif format == 'ndjson':
+        urls = [json.loads(line)['url'] for line in content.splitlines() if line]
+    else:
+        urls = json.loads(content)['urls']
+    valid_urls = []
+    for url in urls:
+        url = url.strip()
+        if not url:
+            continue
+        if not url.startswith(('http://', 'https://')):
+            url = 'https://' + url
+        valid_urls.append(url)
+    return len(valid_urls)
+
+
+def streaming_ingest(path, format):
+    with UrlIngest() as ingest, open(path, 'rb') as f:
+        ingest.add_upload(f, format)
+        return ingest.accepted
+
+
+def run(mode, format, path, rows):
+    started = time.perf_counter()
+    accepted = legacy_ingest(path, format) if mode == 'legacy' else streaming_ingest(path, format)
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        'mode': mode,
+        'format': format,
+        'accepted': accepted,
+        'seconds': round(elapsed, 2),
+        'rows_per_second': round(rows / elapsed),
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--duplicates', type=float, default=0.2, help='share of rows repeating an earlier site')
+    parser.add_argument('--formats', default=','.join(FORMATS))
+    parser.add_argument('--run', choices=['legacy', 'streaming'], help=argparse.SUPPRESS)
+    parser.add_argument('--format', help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run(args.run, args.format, args.path, args.rows)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        reports = []
+        for format in args.formats.split(','):
+            path = os.path.join(directory, f'urls.{EXTENSIONS[format]}')
+            write_input(path, format, args.rows, args.duplicates)
+            for mode in ('legacy', 'streaming'):
+                output = subprocess.check_output([
+                    sys.executable, '-m', 'benchmarks.bench_ingest', '--run', mode, '--format', format,
+                    '--path', path, '--rows', str(args.rows)
+                ])
+                report = json.loads(output.splitlines()[-1])
+                report['input_mb'] = round(os.path.getsize(path) / 2 ** 20)
+                reports.append(report)
+        print(json.dumps({'rows': args.rows, 'duplicates': args.duplicates, 'runs': reports}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+PDF report time and peak memory: thumbnails made at capture time against
+the old path that decoded every full-page screenshot while building the PDF.
+
+    python -m benchmarks.bench_pdf [--sites 100] [--height 12000]
+
+Each step runs in its own process so peak RSS is not shared (Linux carries
+a parent's peak over into children it spawns).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from PIL import Image
+from app import exporter, storage
+from app.thumbnails import ThumbnailPool
+
+
+def make_screenshots(directory, sites, height):
+    """Tall screenshots with enough noise that PNG can't shrink them away"""
+    rng = random.Random(0)
+    tile = Image.frombytes('RGB', (1280, 200), rng.randbytes(1280 * 200 * 3))
+    base = os.path.join(directory, 'shot-0.png')
+    image = Image.new('RGB', (1280, height))
+    for y in range(0, height, 200):
+        image.paste(tile, (0, y))
+    image.save(base, compress_level=1)
+    paths = [base]
+    for n in range(1, sites):
+        path = os.path.join(directory, f'shot-{n}.png')
+        os.link(base, path)
+        paths.append(path)
+    return paths
+
+
+def store_results(screenshots, thumbnails=None):
+    results = {}
+    for n, screenshot in enumerate(screenshots):
+        result = {
+            'emails': [f'info@site-{n}.com'], 'facebook': [], 'instagram': [], 'tiktok': [],
+            'screenshots': {'homepage': screenshot},
+        }
+        if thumbnails:
+            result['screenshots']['thumbnail'] = thumbnails[n]
+        results[f'https://site-{n}.com'] = result
+    storage.store_job('bench', {})
+    storage.update_job('bench', 'Done', overall_status='completed', results=results)
+
+
+def legacy_pdf(path):
+    """The report builder as it was before thumbnails"""
+    pdf = exporter.pdf_document()
+    for url, result in storage.iter_job_results('bench'):
+        pdf.set_font('Arial', 'B', 11)
+        pdf.cell(0, 10, url, 0, 1)
+        pdf.set_font('Arial', '', 10)
+        pdf.cell(40, 8, 'Emails:', 0, 0)
+        pdf.multi_cell(0, 8, ', '.join(result['emails']) or 'None', 0, 1)
+        screenshot = result['screenshots'].get('homepage')
+        img = Image.open(screenshot)
+        img.thumbnail((150, 150))
+        temp_path = f"{path}.{os.path.basename(screenshot)}"
+        img.save(temp_path)
+        pdf.cell(40, 8, 'Screenshot:', 0, 1)
+        pdf.image(temp_path, x=10, w=80)
+        os.remove(temp_path)
+        pdf.ln(5)
+    pdf.output(path)
+
+
+async def make_thumbnails(screenshots, workers):
+    async with ThumbnailPool(workers=workers) as pool:
+        return await asyncio.gather(*(pool.create(path) for path in screenshots))
+
+
+def run(mode, directory, workers):
+    storage.DB_PATH = os.path.join(directory, f'{mode}.db')
+    storage.init_db()
+    screenshots = sorted(
+        (os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.png')),
+        key=lambda path: int(path.rsplit('-', 1)[1].split('.')[0])
+    )
+    report = {'mode': mode}
+    started = time.perf_counter()
+    if mode == 'legacy':
+        store_results(screenshots)
+        legacy_pdf(os.path.join(directory, 'legacy.pdf'))
+    else:
+        thumbnails = asyncio.run(make_thumbnails(screenshots, workers))
+        report['thumbnail_seconds'] = round(time.perf_counter() - started, 2)
+        store_results(screenshots, thumbnails)
+        started = time.perf_counter()
+        exporter.write_pdf('bench', os.path.join(directory, 'thumbnails.pdf'))
+    report['pdf_seconds'] = round(time.perf_counter() - started, 2)
+    report['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+    print(json.dumps(report))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sites', type=int, default=100)
+    parser.add_argument('--height', type=int, default=12000, help='screenshot height in pixels')
+    parser.add_argument('--workers', type=int, default=2, help='thumbnail pool workers')
+    parser.add_argument('--run', choices=['setup', 'legacy', 'thumbnails'], help=argparse.SUPPRESS)
+    parser.add_argument('--dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run == 'setup':
+        make_screenshots(args.dir, args.sites, args.height)
+        return
+    if args.run:
+        run(args.run, args.dir, args.workers)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        reports = []
+        for mode in ('setup', 'legacy', 'thumbnails'):
+            output = subprocess.check_output([
+                sys.executable, '-m', 'benchmarks.bench_pdf', '--run', mode, '--dir', directory,
+                '--sites', str(args.sites), '--height', str(args.height), '--workers', str(args.workers)
+            ])
+            if mode != 'setup':
+                reports.append(json.loads(output.splitlines()[-1]))
+        print(json.dumps({
+            'sites': args.sites,
+            'screenshot': f'1280x{args.height}',
+            'runs': reports,
+        }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Latency of reading one page of results as jobs grow, against decoding the
+whole job (what the results table used to receive).
+
+    python -m benchmarks.bench_results [--sizes 1000,10000,100000] [--pages 200] [--limit 50]
+
+Pages start at random positions, in every sort order, with and without filters.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from app import storage
+
+QUERIES = {
+    'position': {},
+    'url': {'sort': 'url'},
+    'emails_desc': {'sort': 'emails', 'descending': True},
+    'has_email': {'has_email': True},
+    'instagram': {'platform': 'instagram'},
+    'compact': {'fields': ('counts',)},
+}
+
+
+def site_result(n, rng):
+    return {
+        'emails': [f'info{k}@site-{n}.example.com' for k in range(rng.choice((0, 0, 1, 2)))],
+        'facebook': [f'https://facebook.com/site{n}'] if rng.random() < 0.5 else [],
+        'instagram': [f'https://instagram.com/site{n}'] if rng.random() < 0.2 else [],
+        'tiktok': [],
+        'screenshots': {'homepage': f'/tmp/shots/{n}.jpg'},
+    }
+
+
+def fill_job(job_id, sites):
+    rng = random.Random(0)
+    storage.store_job(job_id, {})
+    with storage.db_connection() as conn:
+        for start in range(0, sites, 10_000):
+            storage.write_site_results(conn, {
+                (job_id, n): (f'https://site-{n}.example.com', site_result(n, rng))
+                for n in range(start, min(sites, start + 10_000))
+            })
+        conn.commit()
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return {
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p99_ms': round(latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+
+    storage.DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    storage.init_db()
+    rng = random.Random(1)
+    reports = []
+    for sites in map(int, args.sizes.split(',')):
+        job_id = f'job-{sites}'
+        fill_job(job_id, sites)
+        report = {'sites': sites}
+        for name, query in QUERIES.items():
+            latencies = []
+            for _ in range(args.pages):
+                position = rng.randrange(sites)
+                after = {'position': (None, position), 'url': (f'https://site-{position}.example.com', position),
+                         'emails': (rng.choice((0, 1, 2)), position)}[query.get('sort', 'position')]
+                started = time.perf_counter()
+                storage.get_site_results(job_id, after, args.limit, **query)
+                latencies.append(time.perf_counter() - started)
+            report[name] = percentiles(latencies)
+
+        started = time.perf_counter()
+        storage.get_job(job_id)
+        report['whole_job_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        reports.append(report)
+    print(json.dumps({'limit': args.limit, 'runs': reports}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Progress write throughput under concurrent status polling.
+
+    python -m benchmarks.bench_storage [--writers 4] [--readers 8] [--rows 2000] [--write-through]
+
+--write-through flushes after every update, approximating the old
+commit-per-call behaviour for comparison.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from app import storage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=2000, help='progress updates per writer')
+    parser.add_argument('--write-through', action='store_true')
+    args = parser.parse_args()
+
+    storage.DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    storage.init_db()
+    job_ids = [f'job-{n}' for n in range(args.writers)]
+    for job_id in job_ids:
+        storage.store_job(job_id, {})
+
+    done = threading.Event()
+    read_latencies = []
+
+    def writer(job_id):
+        for n in range(args.rows):
+            url = f'https://site-{n % 500}.example.com'
+            storage.update_job(job_id, f'Completed {url}', url, 'completed')
+            if args.write_through:
+                storage.write_buffer.flush()
+
+    def reader(job_id):
+        while not done.is_set():
+            started = time.perf_counter()
+            storage.get_job(job_id)
+            read_latencies.append(time.perf_counter() - started)
+            time.sleep(0.005)
+
+    readers = [threading.Thread(target=reader, args=(job_ids[n % len(job_ids)],)) for n in range(args.readers)]
+    writers = [threading.Thread(target=writer, args=(job_id,)) for job_id in job_ids]
+    for thread in readers:
+        thread.start()
+    started = time.perf_counter()
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    storage.write_buffer.flush()
+    elapsed = time.perf_counter() - started
+    done.set()
+    for thread in readers:
+        thread.join()
+
+    read_latencies.sort()
+    writes = args.writers * args.rows
+    print(json.dumps({
+        'mode': 'write-through' if args.write_through else 'write-behind',
+        'writes': writes,
+        'seconds': round(elapsed, 3),
+        'writes_per_second': round(writes / elapsed),
+        'reads': len(read_latencies),
+        'read_p50_ms': round(statistics.median(read_latencies) * 1000, 2) if read_latencies else None,
+        'read_p99_ms': round(read_latencies[int(len(read_latencies) * 0.99) - 1] * 1000, 2) if read_latencies else None,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+import pytest
+from app.blocking import CONTENT_POLICY, SCREENSHOT_POLICY, ResourcePolicy, load_page, load_time_ms
+from unittest.mock import AsyncMock, MagicMock
+
+
+def test_policies_block_by_type_and_domain():
+    assert CONTENT_POLICY.blocks('image', 'https://example.com/logo.png')
+    assert not CONTENT_POLICY.blocks('document', 'https://example.com/contact')
+    assert not SCREENSHOT_POLICY.blocks('image', 'https://example.com/logo.png')
+    assert SCREENSHOT_POLICY.blocks('script', 'https://www.google-analytics.com/analytics.js')
+    assert SCREENSHOT_POLICY.blocks('script', 'https://static.hotjar.com/c/hotjar.js')
+    assert not SCREENSHOT_POLICY.blocks('script', 'https://notgoogle-analytics.com/app.js')
+
+
+@pytest.mark.asyncio
+async def test_load_page_aborts_blocked_requests_and_records_load():
+    policy = ResourcePolicy('content', {'image', 'font'}, wait_until='domcontentloaded', idle_timeout_ms=10)
+    loads = load_time_ms['content'].count
+    page = AsyncMock()
+    routes = []
+
+    def make_route(resource_type, url):
+        route = AsyncMock()
+        route.request = MagicMock(resource_type=resource_type, url=url)
+        routes.append(route)
+        return route
+
+    async def goto(url, wait_until):
+        handler = page.route.call_args.args[1]
+        await handler(make_route('image', 'https://example.com/a.png'))
+        await handler(make_route('font', 'https://example.com/a.woff2'))
+        await handler(make_route('script', 'https://example.com/app.js'))
+
+    page.goto = goto
+    stats = await load_page(page, 'https://example.com', policy)
+
+    assert stats.blocked == 2
+    assert stats.bytes_saved_estimate > 0
+    assert [r.abort.await_count for r in routes] == [1, 1, 0]
+    assert routes[2].continue_.await_count == 1
+    page.wait_for_load_state.assert_awaited_once_with('networkidle', timeout=10)
+    assert load_time_ms['content'].count == loads + 1
@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+from app.browser_pool import BrowserPool
+from unittest.mock import AsyncMock, MagicMock, patch
+
+
+class FakePage:
+    def __init__(self):
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    async def close(self):
+        self.handlers["close"](self)
+
+
+class FakeContext:
+    def __init__(self):
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    async def new_page(self):
+        page = FakePage()
+        self.handlers["page"](page)
+        return page
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.handlers = {}
+        self.context = FakeContext()
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self):
+        return self.context
+
+    async def close(self):
+        self.connected = False
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.launched = []
+        self.chromium = MagicMock()
+        self.chromium.launch = AsyncMock(side_effect=self._launch)
+        self.stop = AsyncMock()
+
+    async def _launch(self, **options):
+        browser = FakeBrowser()
+        self.launched.append(browser)
+        return browser
+
+
+def fake_async_playwright(fake):
+    return MagicMock(return_value=MagicMock(start=AsyncMock(return_value=fake)))
+
+
+@pytest.mark.asyncio
+async def test_pool_recycles_after_page_limit():
+    fake = FakePlaywright()
+    with patch('app.browser_pool.async_playwright', fake_async_playwright(fake)):
+        async with BrowserPool(size=1, max_pages=2, max_rss_mb=0) as pool:
+            async with pool.lease() as lease:
+                await lease.new_page()
+                await lease.new_page()
+
+            assert pool.stats()["recycles"] == 1
+            assert len(fake.launched) == 2
+            assert not fake.launched[0].connected
+
+
+@pytest.mark.asyncio
+async def test_long_leases_recycle_and_recover_between_pages():
+    fake = FakePlaywright()
+    with patch('app.browser_pool.async_playwright', fake_async_playwright(fake)):
+        async with BrowserPool(size=1, max_pages=2, max_rss_mb=0) as pool:
+            async with pool.lease() as lease:
+                first = await lease.new_page()
+                second = await lease.new_page()
+                # Spent: the next page opens in a fresh browser, the old one closes once its pages do
+                await lease.new_page()
+                assert len(fake.launched) == 2 and pool.stats()["recycles"] == 1
+                assert fake.launched[0].connected
+                await first.close()
+                await asyncio.sleep(0.15)
+                assert fake.launched[0].connected
+                await second.close()
+                await asyncio.sleep(0.15)
+                assert not fake.launched[0].connected
+
+                # A crash mid-job only costs the pages open at the time
+                fake.launched[1].handlers["disconnected"](None)
+                await lease.new_page()
+                assert len(fake.launched) == 3 and pool.stats()["restarts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_restarts_crashed_browser_and_counts_waits():
+    fake = FakePlaywright()
+    with patch('app.browser_pool.async_playwright', fake_async_playwright(fake)):
+        async with BrowserPool(size=1, max_pages=0, max_rss_mb=0) as pool:
+            async def hold(crash):
+                async with pool.lease():
+                    await asyncio.sleep(0.01)
+                    if crash:
+                        fake.launched[-1].handlers["disconnected"](None)
+
+            await asyncio.gather(hold(True), hold(False))
+
+            stats = pool.stats()
+            assert stats["leases"] == 2
+            assert stats["waits"] == 1
+            assert stats["restarts"] == 1
+            assert stats["in_use"] == 0
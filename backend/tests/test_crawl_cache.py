@@ -0,0 +1,115 @@
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from app import crawl_cache, storage
+from app.crawl_cache import CrawlCache
+from app.crawler import CrawlScheduler, crawl_website, fetch_static_page
+from app.fetcher import StaticFetcher
+from app.screenshot import ScreenshotSettings
+
+FILLER = '<p>' + 'We build things for people. ' * 20 + '</p>'
+RESULT = {'emails': ['hi@a.com'], 'facebook': [], 'instagram': [], 'tiktok': [], 'screenshots': {}}
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'DB_PATH', str(tmp_path / 'jobs.db'))
+    storage.init_db()
+    cache = CrawlCache(site_ttl=3600, page_ttl=3600)
+    monkeypatch.setattr(crawl_cache, '_default_cache', cache)
+    return cache
+
+
+@pytest_asyncio.fixture
+async def site():
+    """Serves /contact with an ETag and honours If-None-Match"""
+    requests = []
+
+    async def contact(request):
+        requests.append(request.headers.get('If-None-Match'))
+        if request.headers.get('If-None-Match') == '"v1"':
+            return web.Response(status=304)
+        return web.Response(
+            text=f'<html><body>{FILLER}<p>hello@example.com</p>\n<a href="/team">Team</a></body></html>',
+            content_type='text/html', headers={'ETag': '"v1"'}
+        )
+
+    app = web.Application()
+    app.router.add_get('/contact', contact)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    server = web.TCPSite(runner, '127.0.0.1', 0)
+    await server.start()
+    yield f'http://127.0.0.1:{runner.addresses[0][1]}', requests
+    await runner.cleanup()
+
+
+def test_site_results_honour_ttl_max_age_and_screenshots(cache, tmp_path):
+    cache.put_site('https://Example.com/', RESULT)
+    assert cache.get_site('https://example.com').result == RESULT
+    assert cache.get_site('https://example.com', max_age=0) is None
+    assert cache.get_site('https://other.com') is None
+
+    shot = tmp_path / 'shot.png'
+    shot.write_bytes(b'png')
+    cache.put_site('https://b.com', {**RESULT, 'screenshots': {'homepage': str(shot)}})
+    assert cache.get_site('https://b.com') is not None
+    shot.unlink()
+    assert cache.get_site('https://b.com') is None
+
+    # Only jobs asking for the same screenshots get a crawl's result
+    off = ScreenshotSettings(mode='off').key
+    cache.put_site('https://c.com', RESULT, screenshots=off)
+    assert cache.get_site('https://c.com', screenshots=off) is not None
+    assert cache.get_site('https://c.com', screenshots=ScreenshotSettings(mode='viewport').key) is None
+    assert cache.get_site('https://example.com', screenshots=off) is None
+    full = ScreenshotSettings(mode='full', format='jpeg', quality=60)
+    cache.put_site('https://d.com', RESULT, screenshots=full.key)
+    assert cache.get_site('https://d.com', screenshots=full.key) is not None
+    assert cache.get_site('https://d.com', screenshots=ScreenshotSettings(mode='full', format='png').key) is None
+
+    cache.site_ttl = 0
+    cache.expire()
+    cache.site_ttl = 3600
+    assert cache.get_site('https://example.com') is None
+
+
+@pytest.mark.asyncio
+async def test_unchanged_pages_are_revalidated_not_reextracted(cache, site):
+    base_url, requests = site
+    scheduler = CrawlScheduler(host_rate=1000, host_burst=10)
+    tiers = Counter()
+    async with StaticFetcher() as fetcher:
+        first = await fetch_static_page(fetcher, f'{base_url}/contact', 1, scheduler, tiers=tiers)
+        second = await fetch_static_page(fetcher, f'{base_url}/contact', 1, scheduler, tiers=tiers)
+
+    assert requests == [None, '"v1"']
+    assert first[0]['emails'] == {'hello@example.com'}
+    assert second == first
+    assert tiers['not_modified'] == 1
+    assert cache.get_page(f'{base_url}/contact').etag == '"v1"'
+
+
+class IdlePool:
+    """Browser pool stand-in for jobs that never need a browser"""
+
+    @asynccontextmanager
+    async def lease(self):
+        yield None
+
+
+@pytest.mark.asyncio
+async def test_cached_sites_finish_jobs_without_crawling(cache):
+    cache.put_site('https://a.com', RESULT)
+    storage.store_job('job-1', {})
+    async with StaticFetcher() as fetcher:
+        await crawl_website('job-1', ['https://a.com'], pool=IdlePool(), fetcher=fetcher)
+
+    job = storage.get_job('job-1')
+    assert job['status'] == 'completed'
+    assert job['results'] == {'https://a.com': RESULT}
+    assert job['stats']['cache_hits'] == 1
+    assert job['progress']['https://a.com']['message'].startswith('Completed https://a.com: cached result from')
@@ -1,20 +1,30 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
 import pytest
-from app.crawler import crawl_single_site
-from unittest.mock import AsyncMock, patch
+from app import crawl_cache, storage
+from app.browser_pool import BrowserPool
+from app.crawler import CrawlScheduler, TokenBucket, crawl_single_site, crawl_website
+from app.singleflight import AsyncSingleFlight
+from unittest.mock import AsyncMock, MagicMock, patch
 
 @pytest.mark.asyncio
 async def test_crawler_basic():
-    with patch('app.crawler.async_playwright') as mock_playwright:
-        # Setup mock browser and page
-        mock_browser = AsyncMock()
-        mock_context = AsyncMock()
-        mock_page = AsyncMock()
-        
-        mock_playwright.return_value.__aenter__.return_value = mock_playwright
-        mock_playwright.chromium.launch.return_value = mock_browser
-        mock_browser.new_context.return_value = mock_context
-        mock_context.new_page.return_value = mock_page
-        
+    mock_playwright = MagicMock()
+    mock_browser = MagicMock()
+    mock_context = AsyncMock()
+    mock_page = AsyncMock()
+
+    # Setup a pool whose one browser hands out the mock context
+    mock_playwright.chromium.launch = AsyncMock(return_value=mock_browser)
+    mock_playwright.stop = AsyncMock()
+    mock_browser.new_context = AsyncMock(return_value=mock_context)
+    mock_browser.close = AsyncMock()
+    mock_context.on = MagicMock()
+    mock_context.new_page.return_value = mock_page
+    start = MagicMock(return_value=MagicMock(start=AsyncMock(return_value=mock_playwright)))
+
+    with patch('app.browser_pool.async_playwright', start):
         # Mock page content
         mock_page.content.return_value = '''
             <html>
@@ -31,10 +41,190 @@ async def test_crawler_basic():
         mock_page.goto = AsyncMock()
         
         # Run the crawler
-        results = await crawl_single_site(mock_context, 'https://example.com')
+        with patch('app.crawler.capture_screenshot', AsyncMock(return_value='/tmp/shot.jpg')):
+            async with BrowserPool(size=1, max_rss_mb=0) as pool, pool.lease() as context:
+                results = await crawl_single_site(context, 'https://example.com')
         
         # Assertions
         assert 'contact@example.com' in results['emails']
         assert 'https://facebook.com/company' in results['facebook']
         assert len(results['screenshots']) > 0
         assert mock_page.goto.call_count == 1
+
+
+def make_site_context(pages):
+    """Mock browser context serving `pages` ({url: (html, links)})"""
+    loaded = []
+    context = AsyncMock()
+
+    async def new_page():
+        page = AsyncMock()
+        state = {}
+
+        async def goto(url, **kwargs):
+            state['url'] = url
+            loaded.append(url)
+
+        async def content():
+            return pages[state['url']][0]
+
+        async def links(selector, script):
+            return pages[state['url']][1]
+
+        page.goto = goto
+        page.content = content
+        page.eval_on_selector_all = links
+        return page
+
+    context.new_page = new_page
+    return context, loaded
+
+
+@pytest.mark.asyncio
+async def test_crawler_visits_every_linked_page_within_limits():
+    base = 'https://example.com'
+    pages = {
+        base: ('<p>home@example.com</p>', [f'{base}/contact', f'{base}/about', f'{base}/blog']),
+        f'{base}/contact': ('<p>sales@example.com</p>', [f'{base}/team', f'{base}/about']),
+        f'{base}/about': ('<a href="https://instagram.com/company">ig</a>', [f'{base}/contact/team']),
+        f'{base}/team': ('<p>team@example.com</p>', [f'{base}/team/deep']),
+        f'{base}/contact/team': ('', []),
+    }
+    context, loaded = make_site_context(pages)
+    scheduler = CrawlScheduler(host_rate=1000, host_burst=10)
+
+    with patch('app.crawler.capture_screenshot', AsyncMock(return_value='/tmp/shot.png')):
+        results = await crawl_single_site(context, base, scheduler)
+
+    assert loaded[0] == base
+    assert sorted(loaded) == sorted(pages)
+    assert sorted(results['emails']) == ['home@example.com', 'sales@example.com', 'team@example.com']
+    assert results['instagram'] == ['https://instagram.com/company']
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_spaces_requests_per_host():
+    bucket = TokenBucket(rate=20, burst=1)
+    started = time.monotonic()
+    for _ in range(3):
+        await bucket.acquire()
+    assert time.monotonic() - started >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_host_tokens_are_taken_once_a_slot_is_free():
+    scheduler = CrawlScheduler(global_limit=1, host_rate=10, host_burst=1, max_hosts=2)
+    started = []
+
+    async def load(url, hold=0):
+        async with scheduler.page_slot(url):
+            started.append(time.monotonic())
+            await asyncio.sleep(hold)
+
+    # While another host holds the only slot, the queued pages of a.com don't bank tokens
+    await asyncio.gather(load('https://other.com', 0.35), *(load('https://a.com') for _ in range(3)))
+    gaps = [b - a for a, b in zip(started[1:], started[2:])]
+    assert min(gaps) >= 0.09
+
+    await load('https://b.com')
+    assert list(scheduler._buckets) == ['a.com', 'b.com']
+
+
+class LeasePool:
+    @asynccontextmanager
+    async def lease(self):
+        yield AsyncMock()
+
+
+@pytest.mark.asyncio
+async def test_jobs_share_an_in_flight_site_crawl(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'DB_PATH', str(tmp_path / 'jobs.db'))
+    monkeypatch.setattr(crawl_cache, 'CRAWL_CACHE_ENABLED', False)
+    storage.init_db()
+    crawled = []
+
+    async def fake_crawl(context, url, *args):
+        crawled.append(url)
+        await asyncio.sleep(0.05)
+        return {'emails': [f'info@{len(crawled)}.com'], 'facebook': [], 'instagram': [], 'tiktok': [], 'screenshots': {}}
+
+    storage.store_job('first', {})
+    storage.store_job('second', {})
+    with patch('app.crawler.crawl_single_site', fake_crawl):
+        first = asyncio.create_task(crawl_website('first', ['https://a.com', 'https://b.com'], LeasePool(), AsyncMock()))
+        await asyncio.sleep(0.01)
+        await crawl_website('second', ['https://A.com/', 'https://c.com'], LeasePool(), AsyncMock())
+        await first
+
+    assert sorted(crawled) == ['https://a.com', 'https://b.com', 'https://c.com']
+    second = storage.get_job('second')
+    assert second['results']['https://A.com/'] == storage.get_job('first')['results']['https://a.com']
+    assert second['stats']['shared_sites'] == 1
+    assert second['progress']['https://A.com/']['message'].startswith('Completed https://A.com/: shared crawl')
+
+
+@pytest.mark.asyncio
+async def test_only_crawls_with_the_same_screenshot_settings_are_shared(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'DB_PATH', str(tmp_path / 'jobs.db'))
+    monkeypatch.setattr(crawl_cache, 'CRAWL_CACHE_ENABLED', False)
+    storage.init_db()
+    crawled = []
+
+    async def fake_crawl(context, url, scheduler, job_slots, fetcher, tiers, screenshots):
+        crawled.append(screenshots.mode)
+        await asyncio.sleep(0.05)
+        return {'emails': [], 'facebook': [], 'instagram': [], 'tiktok': [], 'screenshots': {}}
+
+    modes = ['full', 'viewport', 'full', 'off', 'off']
+    for n in range(len(modes)):
+        storage.store_job(f'job-{n}', {})
+    with patch('app.crawler.crawl_single_site', fake_crawl):
+        await asyncio.gather(*(crawl_website(f'job-{n}', ['https://a.com'], LeasePool(), AsyncMock(),
+                                             screenshot_mode=mode) for n, mode in enumerate(modes)))
+
+    assert sorted(crawled) == ['full', 'off', 'viewport']
+
+
+@pytest.mark.asyncio
+async def test_waiters_take_over_when_the_first_caller_is_cancelled():
+    flights = AsyncSingleFlight()
+    started = asyncio.Event()
+    runs = []
+
+    async def work(name):
+        runs.append(name)
+        started.set()
+        await asyncio.sleep(0.05)
+        return name
+
+    leader = asyncio.create_task(flights.do('site', lambda: work('leader')))
+    await started.wait()
+    follower = asyncio.create_task(flights.do('site', lambda: work('follower')))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == 'follower'
+    assert runs == ['leader', 'follower']
+    assert flights.coalesced == 1
+    assert not flights.running('site')
+
+
+@pytest.mark.asyncio
+async def test_crawl_stops_once_every_target_field_is_found(monkeypatch):
+    base = 'https://example.com'
+    pages = {
+        base: ('<p>home@example.com</p>', [f'{base}/team', f'{base}/contact', f'{base}/about']),
+        f'{base}/contact': ('<a href="https://facebook.com/company">fb</a>', []),
+        f'{base}/about': ('', []),
+        f'{base}/team': ('', []),
+    }
+    monkeypatch.setattr('app.crawler.JOB_PAGE_CONCURRENCY', 1)
+    monkeypatch.setattr('app.crawler.found_targets', lambda results: results['emails'] and results['facebook'])
+    context, loaded = make_site_context(pages)
+
+    with patch('app.crawler.capture_screenshot', AsyncMock(return_value='/tmp/shot.png')):
+        results = await crawl_single_site(context, base, CrawlScheduler(host_rate=1000, host_burst=10))
+
+    # The contact page is crawled first, and it completes the target fields
+    assert loaded == [base, f'{base}/contact']
+    assert results['facebook'] == ['https://facebook.com/company']
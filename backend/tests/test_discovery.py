@@ -0,0 +1,143 @@
+import gzip
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from collections import Counter
+from app import discovery, host_health
+from app.crawler import CrawlScheduler, crawl_single_site
+from app.discovery import RobotsCache, RobotsRules, fetch_robots, rank_candidates, read_sitemap
+from app.fetcher import StaticFetcher, StaticFile
+from app.host_health import HostHealth
+from app.screenshot import ScreenshotSettings
+from unittest.mock import AsyncMock
+
+FILLER = '<p>' + 'We build things for people. ' * 20 + '</p>'
+
+
+def test_sitemaps_are_read_plain_gzipped_and_as_text():
+    urlset = ('<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+              '<url><loc>https://a.com/contact?x=1&amp;y=2</loc></url><url><loc> https://a.com/blog </loc></url></urlset>')
+    assert read_sitemap(urlset.encode()) == (False, ['https://a.com/contact?x=1&y=2', 'https://a.com/blog'])
+
+    index = '<sitemapindex><sitemap><loc>https://a.com/post-sitemap.xml</loc></sitemap></sitemapindex>'
+    assert read_sitemap(gzip.compress(index.encode())) == (True, ['https://a.com/post-sitemap.xml'])
+
+    assert read_sitemap(b'https://a.com/about\nhttps://a.com/team\n') == (False, ['https://a.com/about',
+                                                                              'https://a.com/team'])
+
+
+def test_candidates_are_ranked_and_kept_to_the_site():
+    robots = RobotsRules('User-agent: *\nDisallow: /team/private\n')
+    urls = [
+        'https://www.a.com/about/history',
+        'https://www.a.com/Contact-Us',
+        'https://a.com/team/private',
+        'https://a.com/about',
+        'https://a.com/products',
+        'https://b.com/contact',
+    ]
+    assert rank_candidates(urls, 'https://a.com', robots) == [
+        'https://a.com/Contact-Us',
+        'https://a.com/about',
+        'https://a.com/about/history',
+    ]
+
+
+def test_robots_rules():
+    robots = RobotsRules('User-agent: *\nDisallow: /admin\n\nUser-agent: otherbot\nDisallow: /\n\n'
+                         'Sitemap: https://a.com/sitemap_index.xml\n')
+    assert robots.allows('https://a.com/contact')
+    assert not robots.allows('https://a.com/admin/contact')
+    assert robots.sitemaps == ['https://a.com/sitemap_index.xml']
+    assert RobotsRules().allows('https://a.com/admin')
+
+
+@pytest.mark.asyncio
+async def test_only_missing_robots_files_are_cached_as_allow_all(monkeypatch):
+    monkeypatch.setattr(discovery, '_default_robots', RobotsCache())
+    monkeypatch.setattr(discovery, 'ROBOTS_ERROR_TTL', -1)
+    answers = {'https://a.com/robots.txt': StaticFile(503), 'https://b.com/robots.txt': StaticFile(404)}
+    fetched = Counter()
+
+    async def fetch_file(url, max_bytes):
+        fetched[url] += 1
+        return answers[url]
+
+    for _ in range(2):
+        assert (await fetch_robots(fetch_file, 'https://a.com')).allows('https://a.com/contact')
+        assert (await fetch_robots(fetch_file, 'https://b.com')).allows('https://b.com/contact')
+    assert fetched == {'https://a.com/robots.txt': 2, 'https://b.com/robots.txt': 1}
+
+
+@pytest_asyncio.fixture
+async def site():
+    """Local site whose contact page is only listed in its (gzipped, indexed) sitemap"""
+    requests = Counter()
+    base = {}
+
+    async def robots(request):
+        return web.Response(text=f'User-agent: *\nDisallow: /about/private\nSitemap: {base["url"]}/sitemap_index.xml\n')
+
+    async def index(request):
+        return web.Response(text=f'<sitemapindex><sitemap><loc>{base["url"]}/post-sitemap.xml</loc></sitemap>'
+                                 f'<sitemap><loc>{base["url"]}/page-sitemap.xml.gz</loc></sitemap></sitemapindex>',
+                            content_type='application/xml')
+
+    async def pages(request):
+        locs = ''.join(f'<url><loc>{base["url"]}{path}</loc></url>'
+                       for path in ('/', '/about/private', '/services', '/get-in-touch/contact-us'))
+        return web.Response(body=gzip.compress(f'<urlset>{locs}</urlset>'.encode()),
+                            content_type='application/octet-stream')
+
+    async def contact(request):
+        return web.Response(text=f'<html><body>{FILLER}<p>hello@example.com</p></body></html>',
+                            content_type='text/html')
+
+    app = web.Application()
+
+    @web.middleware
+    async def count(request, handler):
+        requests[request.path] += 1
+        return await handler(request)
+
+    app.middlewares.append(count)
+    app.router.add_get('/robots.txt', robots)
+    app.router.add_get('/sitemap_index.xml', index)
+    app.router.add_get('/page-sitemap.xml.gz', pages)
+    app.router.add_get('/get-in-touch/contact-us', contact)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    server = web.TCPSite(runner, '127.0.0.1', 0)
+    await server.start()
+    base['url'] = f'http://127.0.0.1:{runner.addresses[0][1]}'
+    yield base['url'], requests
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_sitemap_pages_are_crawled_before_following_links(site, monkeypatch):
+    url, requests = site
+    monkeypatch.setattr(discovery, '_default_robots', RobotsCache())
+    # Nothing earlier tests learned about 127.0.0.1 ports changes which tier loads what
+    monkeypatch.setattr(host_health, '_default_health', HostHealth(shared=False))
+    context = AsyncMock()
+    page = AsyncMock()
+    context.new_page.return_value = page
+    page.content.return_value = '<p>Home</p>'
+    page.eval_on_selector_all.return_value = [f'{url}/about/private']
+    tiers = Counter()
+    scheduler = CrawlScheduler(host_rate=1000, host_burst=10)
+
+    async with StaticFetcher() as fetcher:
+        results = await crawl_single_site(context, url, scheduler, fetcher=fetcher, tiers=tiers,
+                                          screenshots=ScreenshotSettings(mode='off'))
+        await crawl_single_site(context, url, scheduler, fetcher=fetcher, screenshots=ScreenshotSettings(mode='off'))
+
+    assert results['emails'] == ['hello@example.com']
+    # Sitemaps are read on every crawl, but pages robots.txt disallows are never fetched
+    assert requests['/page-sitemap.xml.gz'] == 2
+    assert requests['/about/private'] == 0
+    # robots.txt is cached for the host; the homepage is tried over HTTP, then the browser
+    assert requests['/robots.txt'] == 1
+    # robots.txt, the sitemap index and both its children, and the two about paths probed
+    assert tiers == Counter(http=1, browser=1, discovery=6)
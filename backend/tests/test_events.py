@@ -0,0 +1,151 @@
+import asyncio
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app import events, routes, storage
+from app.events import EventHub, set_event_hub
+from app.routes import router
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'DB_PATH', str(tmp_path / 'jobs.db'))
+    storage.init_db()
+    storage.store_job('job-1', {})
+    return storage
+
+
+async def next_event(subscription):
+    return await asyncio.wait_for(subscription.events().__anext__(), 2)
+
+
+@pytest.mark.asyncio
+async def test_watchers_get_snapshot_progress_and_completion(db):
+    hub = EventHub(tail_interval=10)
+    await hub.start()
+    db.add_change_listener(hub.notify)
+    try:
+        first = await hub.subscribe('job-1')
+        second = await hub.subscribe('job-1')
+        assert (await next_event(first)).event == 'snapshot'
+        assert (await next_event(second)).event == 'snapshot'
+
+        # The local write wakes the tailer long before its 10s poll
+        db.update_job('job-1', 'Completed', 'https://a.com', 'completed')
+        db.write_buffer.flush()
+        event = await next_event(first)
+        assert event.event == 'progress'
+        assert event.data['progress'] == {'https://a.com': {'status': 'completed', 'message': 'Completed'}}
+        assert (await next_event(second)).id == event.id
+
+        db.update_job('job-1', 'Done', overall_status='completed')
+        assert (await next_event(first)).data['status'] == 'completed'
+        assert (await next_event(first)).event == 'complete'
+        assert hub.stats()['subscribers'] == 2
+    finally:
+        db.remove_change_listener(hub.notify)
+        await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_resume_from_last_event_id_and_drop_slow_watchers(db):
+    hub = EventHub(subscriber_buffer=4, tail_interval=0.01)
+    await hub.start()
+    try:
+        watcher = await hub.subscribe('job-1')
+        slow = await hub.subscribe('job-1')
+        snapshot = await next_event(watcher)
+
+        for n in range(4):
+            db.update_job('job-1', 'Completed', f'https://site-{n}.com', 'completed')
+            db.write_buffer.flush()
+            await next_event(watcher)
+
+        assert slow.dropped
+        assert hub.stats()['dropped'] == 1
+
+        resumed = await hub.subscribe('job-1', last_event_id=snapshot.id)
+        urls = []
+        for _ in range(4):
+            urls.extend((await next_event(resumed)).data['progress'])
+        assert urls == ['https://site-0.com', 'https://site-1.com', 'https://site-2.com', 'https://site-3.com']
+
+        # Further behind than a watcher's buffer: a fresh snapshot instead of the replay
+        hub.subscriber_buffer = 2
+        behind = await hub.subscribe('job-1', last_event_id=snapshot.id)
+        assert (await next_event(behind)).event == 'snapshot'
+        assert await hub.subscribe('missing') is None
+    finally:
+        await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_first_read_fails_the_subscribe_and_the_next_one_retries(db, monkeypatch):
+    get_job = events.get_job
+    calls = []
+
+    def locked_get_job(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise db.sqlite3.OperationalError('database is locked')
+        return get_job(*args, **kwargs)
+
+    monkeypatch.setattr(events, 'get_job', locked_get_job)
+    hub = EventHub(tail_interval=10)
+    await hub.start()
+    try:
+        waiting = [asyncio.create_task(hub.subscribe('job-1')) for _ in range(2)]
+        outcomes = await asyncio.wait_for(asyncio.gather(*waiting, return_exceptions=True), 2)
+        assert all(isinstance(outcome, db.sqlite3.OperationalError) for outcome in outcomes)
+        assert hub.stats()['jobs'] == 0
+
+        subscription = await asyncio.wait_for(hub.subscribe('job-1'), 2)
+        assert (await next_event(subscription)).event == 'snapshot'
+    finally:
+        await hub.close()
+
+
+def test_sse_endpoint_streams_finished_job(db):
+    db.update_job('job-1', 'Completed', 'https://a.com', 'completed')
+    db.update_job('job-1', 'Done', overall_status='completed')
+    app = FastAPI()
+    app.include_router(router, prefix='/api')
+    set_event_hub(EventHub())
+    try:
+        with TestClient(app) as client:
+            response = client.get('/api/jobs/job-1/events')
+            assert response.headers['content-type'].startswith('text/event-stream')
+            assert 'event: snapshot' in response.text
+            assert 'event: complete' in response.text
+
+            with client.websocket_connect('/api/jobs/job-1/ws') as websocket:
+                assert websocket.receive_json()['event'] == 'snapshot'
+                assert websocket.receive_json()['event'] == 'complete'
+
+            assert client.get('/api/jobs/missing/events').status_code == 404
+    finally:
+        set_event_hub(None)
+
+
+def test_websocket_leaves_the_hub_when_the_client_goes(db, monkeypatch):
+    monkeypatch.setattr(routes, 'KEEPALIVE_INTERVAL', 0.05)
+    app = FastAPI()
+    app.include_router(router, prefix='/api')
+    hub = EventHub()
+    set_event_hub(hub)
+    try:
+        with TestClient(app) as client:
+            with client.websocket_connect('/api/jobs/job-1/ws') as websocket:
+                assert websocket.receive_json()['event'] == 'snapshot'
+                # Nothing happens to the job meanwhile
+                assert websocket.receive_json() == {'event': 'keepalive'}
+                assert hub.stats()['subscribers'] == 1
+
+            for _ in range(100):
+                if hub.stats()['subscribers'] == 0:
+                    break
+                time.sleep(0.01)
+            assert hub.stats()['subscribers'] == 0
+    finally:
+        set_event_hub(None)
@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+import pytest
+from app.export_cache import ExportCache
+from app.singleflight import SingleFlight
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ExportCache(str(tmp_path / 'exports'), max_bytes=1000, min_age=0)
+
+
+def writer(content, calls):
+    def build(path):
+        calls.append(path)
+        with open(path, 'w') as file:
+            file.write(content)
+    return build
+
+
+def test_artifacts_are_reused_until_the_revision_changes(cache):
+    calls = []
+    first = cache.get_or_build('job-1', 'csv', 'csv', 3, writer('a,b', calls))
+    again = cache.get_or_build('job-1', 'csv', 'csv', 3, writer('a,b', calls))
+    newer = cache.get_or_build('job-1', 'csv', 'csv', 4, writer('a,b,c', calls))
+
+    assert first == again != newer
+    assert first.endswith('.csv')
+    assert len(calls) == 2
+    assert open(newer).read() == 'a,b,c'
+    assert cache.stats()['hits'] == 1
+    assert not any(name.endswith('.part') for name in os.listdir(cache.directory))
+
+
+def test_failed_build_leaves_nothing_behind(cache):
+    def broken(path):
+        open(path, 'w').write('half')
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_build('job-1', 'pdf', 'pdf', 1, broken)
+    assert os.listdir(cache.directory) == []
+
+
+def test_least_recently_used_artifacts_are_evicted(cache):
+    paths = {}
+    for n in range(3):
+        paths[n] = cache.get_or_build(f'job-{n}', 'csv', 'csv', 1, writer('x' * 100, []))
+        # Keep mtimes distinct on coarse filesystems
+        os.utime(paths[n], (time.time() - 10 + n, time.time() - 10 + n))
+    cache.get_or_build('job-0', 'csv', 'csv', 1, writer('x' * 100, []))
+
+    # 300 bytes against a 250 byte budget: job-1 is the least recently used
+    cache.max_bytes = 250
+    assert cache.evict() == 1
+    assert not os.path.exists(paths[1])
+    assert os.path.exists(paths[0]) and os.path.exists(paths[2])
+
+
+def test_recently_used_artifacts_survive_eviction(tmp_path):
+    cache = ExportCache(str(tmp_path), max_bytes=0, min_age=60)
+    path = cache.get_or_build('job-1', 'csv', 'csv', 1, writer('x' * 100, []))
+    assert cache.evict() == 0
+    assert os.path.exists(path)
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def build():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'artifact'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do('key', build))) for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while flights.coalesced < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == ['artifact'] * 5
+    assert flights.do('key', lambda: 'rebuilt') == 'rebuilt'
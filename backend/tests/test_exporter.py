@@ -0,0 +1,105 @@
+import csv
+import io
+import tracemalloc
+import zipfile
+import pytest
+from openpyxl import load_workbook
+from PIL import Image
+from app import exporter, storage
+from app.thumbnails import make_thumbnail
+
+
+def site_result(n):
+    return {
+        'emails': [f'info@site-{n}.com', f'sales@site-{n}.com'],
+        'facebook': [f'https://facebook.com/site{n}'],
+        'instagram': [],
+        'tiktok': [f'https://tiktok.com/@site{n}'],
+        'screenshots': {'homepage': f'/tmp/screenshots/site-{n}.png'},
+    }
+
+
+@pytest.fixture
+def job(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'DB_PATH', str(tmp_path / 'jobs.db'))
+    storage.init_db()
+    storage.store_job('job-1', {})
+
+    def complete(sites):
+        results = {f'https://site-{n}.com': site_result(n) for n in range(sites)}
+        storage.update_job('job-1', 'Done', overall_status='completed', results=results)
+        return results
+    return complete
+
+
+def test_csv_rows_stream_in_submission_order(job, monkeypatch):
+    monkeypatch.setattr(exporter, 'EXPORT_CHUNK_SIZE', 1024)
+    results = job(200)
+    chunks = list(exporter.iter_csv('job-1'))
+    assert len(chunks) > 1
+
+    rows = list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+    assert rows[0] == exporter.EXPORT_COLUMNS
+    assert [row[0] for row in rows[1:]] == list(results)
+    assert rows[1] == ['https://site-0.com', 'info@site-0.com, sales@site-0.com', 'https://facebook.com/site0',
+                       '', 'https://tiktok.com/@site0', '/tmp/screenshots/site-0.png']
+
+
+def test_excel_workbook_round_trips(job):
+    results = job(50)
+    workbook = load_workbook(io.BytesIO(b''.join(exporter.iter_excel('job-1'))))
+    rows = list(workbook['Results'].iter_rows(values_only=True))
+    assert list(rows[0]) == exporter.EXPORT_COLUMNS
+    assert [row[0] for row in rows[1:]] == list(results)
+    assert rows[1][1] == 'info@site-0.com\nsales@site-0.com'
+
+
+def test_csv_export_memory_does_not_grow_with_job_size(job):
+    def peak_while_exporting():
+        tracemalloc.start()
+        for _ in exporter.iter_csv('job-1'):
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    job(2000)
+    small = peak_while_exporting()
+    job(20000)
+    # Only a chunk and a batch of rows are held at any time
+    assert peak_while_exporting() < small * 1.5
+
+
+def complete_with_screenshots(tmp_path, sites):
+    results = {}
+    for n in range(sites):
+        shot = tmp_path / f'shot-{n}.png'
+        Image.new('RGB', (1280, 3000), (n * 40 % 255, 90, 160)).save(shot)
+        result = site_result(n)
+        result['screenshots'] = {'homepage': str(shot)}
+        # Older jobs have no thumbnail; the report makes one from the screenshot
+        if n % 2 == 0:
+            result['screenshots']['thumbnail'] = make_thumbnail(str(shot))
+        results[f'https://site-{n}.com'] = result
+    storage.update_job('job-1', 'Done', overall_status='completed', results=results)
+
+
+def test_pdf_report_is_a_single_document_when_small(job, tmp_path):
+    complete_with_screenshots(tmp_path, 4)
+    path = str(tmp_path / 'report.pdf')
+    exporter.write_pdf('job-1', path)
+    assert open(path, 'rb').read(4) == b'%PDF'
+    assert exporter.export_type('pdf', path) == ('pdf', 'application/pdf')
+    assert sorted(p.name for p in tmp_path.iterdir() if p.suffix == '.jpg') == ['shot-0.thumb.jpg', 'shot-2.thumb.jpg']
+
+
+def test_large_pdf_report_is_split_into_zipped_parts(job, tmp_path, monkeypatch):
+    monkeypatch.setattr(exporter, 'PDF_PART_MAX_BYTES', 1)
+    complete_with_screenshots(tmp_path, 3)
+    path = str(tmp_path / 'report.pdf')
+    exporter.write_pdf('job-1', path)
+
+    assert exporter.export_type('pdf', path) == ('zip', 'application/zip')
+    with zipfile.ZipFile(path) as archive:
+        assert archive.namelist() == ['report-part-001.pdf', 'report-part-002.pdf', 'report-part-003.pdf']
+        assert all(archive.read(name)[:4] == b'%PDF' for name in archive.namelist())
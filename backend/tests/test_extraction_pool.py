@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from app import extraction_pool
+from app.extraction_pool import ExtractionError, ExtractionPool, extract_batch, extract_page_async
+from unittest.mock import patch
+
+HTML = '<p>Mail hello{n}@example.com</p>\n<a href="/contact">Contact</a>'
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('mode', ['inline', 'thread', 'process'])
+async def test_pool_extracts_pages_in_every_mode(mode):
+    async with ExtractionPool(mode=mode, workers=2, max_pending=4, batch_size=4) as pool:
+        outcomes = await asyncio.gather(*(
+            pool.extract_page(HTML.format(n=n), 'https://example.com') for n in range(10)
+        ))
+    for n, (contact_info, links) in enumerate(outcomes):
+        assert contact_info['emails'] == {f'hello{n}@example.com'}
+        assert links == ['https://example.com/contact']
+
+
+@pytest.mark.asyncio
+async def test_pool_batches_queued_pages_and_bounds_pending():
+    async with ExtractionPool(mode='thread', workers=1, max_pending=6, batch_size=3) as pool:
+        await asyncio.gather(*(pool.extract_page(HTML.format(n=n), 'https://e.com') for n in range(12)))
+        stats = pool.stats()
+    assert stats['pages'] == 12
+    # With one worker and at most six pages pending, pages are grouped into full batches
+    assert stats['batches'] < 12
+
+
+@pytest.mark.asyncio
+async def test_pool_reports_page_failures():
+    with patch('app.extraction_pool.extract_page', side_effect=ValueError('bad page')):
+        async with ExtractionPool(mode='thread', workers=1) as pool:
+            with pytest.raises(ExtractionError, match='bad page'):
+                await pool.extract_page('<p>x</p>', 'https://e.com')
+
+
+@pytest.mark.asyncio
+async def test_pool_replaces_a_broken_executor():
+    crashes = [BrokenProcessPool('A worker died')]
+
+    def crashing_batch(pages):
+        if crashes:
+            raise crashes.pop()
+        return extract_batch(pages)
+
+    with patch('app.extraction_pool.extract_batch', crashing_batch):
+        async with ExtractionPool(mode='thread', workers=1, batch_size=1) as pool:
+            broken = pool._executor
+            with pytest.raises(ExtractionError, match='A worker died'):
+                await pool.extract_page('<p>x</p>', 'https://e.com')
+            contact_info, _ = await pool.extract_page(HTML.format(n=1), 'https://e.com')
+            assert pool._executor is not broken
+    assert contact_info['emails'] == {'hello1@example.com'}
+    assert pool.stats()['restarts'] == 1
+    assert pool._executor is None
+
+
+@pytest.mark.asyncio
+async def test_close_cancels_pages_still_waiting():
+    release = threading.Event()
+
+    def slow_extract(html, url):
+        release.wait(5)
+        return {}, []
+
+    with patch('app.extraction_pool.extract_page', slow_extract):
+        pool = ExtractionPool(mode='thread', workers=1, batch_size=1)
+        await pool.start()
+        pages = [asyncio.create_task(pool.extract_page('<p>x</p>', 'https://e.com')) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        await pool.close()
+        release.set()
+        outcomes = await asyncio.gather(*pages, return_exceptions=True)
+    assert all(isinstance(outcome, asyncio.CancelledError) for outcome in outcomes)
+
+
+@pytest.mark.asyncio
+async def test_pages_are_parsed_off_the_event_loop_without_a_pool(monkeypatch):
+    monkeypatch.setattr(extraction_pool, '_default_pool', None)
+    threads = []
+
+    def recording_extract(html, url):
+        threads.append(threading.current_thread())
+        return {}, []
+
+    with patch('app.extraction_pool.extract_page', recording_extract):
+        await extract_page_async('<p>x</p>', 'https://e.com')
+    assert threads and threads[0] is not threading.current_thread()
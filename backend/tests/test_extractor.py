@@ -0,0 +1,50 @@
+import random
+import pytest
+from app.extractor import extract_contact_info, extract_contact_info_soup, extract_page
+
+FRAGMENTS = [
+    '<p>', '</p>', '<div>', '</div>', '<b>', '</b>', '<br>', '&amp;', '\t', '  \n ',
+    'a@b.com', 'john at example dot com', ' x[at]y[dot]org ', 'dot', ' at ', '@handle',
+    '<a href="https://facebook.com/x">', '<a href="/c" aria-label="Instagram">', '</a>', '<a>',
+    '<a href="https://www.tiktok.com/@q" aria-label="facebook">@ff</a>',
+    '<script>q@w.com</script>', '<style>.a{}</style>', '<template><p>t@t.com</p></template>',
+    '<ruby>k<rt>r@r.com</rt></ruby>', '<pre>  </pre>', '<textarea> \n </textarea>',
+    '<!-- c@c.com -->', '<![CDATA[ d@d.com ]]>', '<meta name="x" content="m@m.com">',
+    '<title>t@x.io</title>', '<noscript>n@n.io</noscript>',
+]
+
+
+def test_matches_soup_extractor_on_generated_pages():
+    rng = random.Random(0)
+    for _ in range(500):
+        html = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 40)))
+        if rng.random() < 0.5:
+            html = f'<!DOCTYPE html><html><head></head><body>{html}</body></html>'
+        assert extract_contact_info(html, 'https://e.com') == extract_contact_info_soup(html, 'https://e.com')
+
+
+def test_extracts_obfuscated_emails_meta_and_socials():
+    html = '''
+        <html><head><meta name="author" content="meta@example.com"></head>
+        <body>
+            <p>Write to sales [at] example [dot] com</p>
+            <script>var hidden = "script@example.com";</script>
+            <a href="https://www.facebook.com/Company/">Facebook</a>
+            <a href="#" aria-label="Follow us on TikTok">@company</a>
+        </body></html>
+    '''
+    result = extract_contact_info(html, 'https://example.com')
+    assert result['emails'] == {'meta@example.com', 'sales@example.com'}
+    assert result['facebook'] == {'https://www.facebook.com/company/'}
+    assert result['tiktok'] == {'https://tiktok.com/@company'}
+    assert result['instagram'] == set()
+
+
+def test_extract_page_returns_absolute_links():
+    _, links = extract_page('<a href="/contact">C</a><a href=" about ">A</a><a>none</a>', 'https://e.com/x/')
+    assert links == ['https://e.com/contact', 'https://e.com/x/about']
+
+
+@pytest.mark.parametrize('html', ['', '   ', 'plain text a@b.com'])
+def test_handles_degenerate_input(html):
+    assert extract_contact_info(html, 'https://e.com') == extract_contact_info_soup(html, 'https://e.com')
@@ -0,0 +1,90 @@
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from collections import Counter
+from app.crawler import CrawlScheduler, crawl_single_site
+from app.fetcher import StaticFetcher, looks_js_rendered
+from unittest.mock import AsyncMock, patch
+
+FILLER = '<p>' + 'We build things for people. ' * 20 + '</p>'
+
+
+@pytest_asyncio.fixture
+async def site():
+    """Local stand-in for a mostly server-rendered website"""
+    async def home(request):
+        return web.Response(text='unused', content_type='text/html')
+
+    async def contact(request):
+        return web.Response(
+            text=f'<html><body>{FILLER}<p>hello@example.com</p>\n<a href="/about">About</a></body></html>',
+            content_type='text/html'
+        )
+
+    async def about(request):
+        return web.Response(
+            text='<html><body><div id="root"></div><script src="/app.js"></script></body></html>',
+            content_type='text/html'
+        )
+
+    app = web.Application()
+    app.router.add_get('/', home)
+    app.router.add_get('/contact', contact)
+    app.router.add_get('/about', about)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    server = web.TCPSite(runner, '127.0.0.1', 0)
+    await server.start()
+    port = runner.addresses[0][1]
+    yield f'http://127.0.0.1:{port}'
+    await runner.cleanup()
+
+
+def test_looks_js_rendered():
+    assert looks_js_rendered('<html><body><div id="__next"></div></body></html>')
+    assert looks_js_rendered('<html><body><script>render()</script></body></html>')
+    assert not looks_js_rendered(f'<html><body>{FILLER}</body></html>')
+
+
+@pytest.mark.asyncio
+async def test_static_tier_serves_pages_and_escalates_app_shells(site):
+    context = AsyncMock()
+    page = AsyncMock()
+    context.new_page.return_value = page
+    page.content.return_value = '<p>Home</p>'
+    page.eval_on_selector_all.return_value = [f'{site}/contact']
+    tiers = Counter()
+    scheduler = CrawlScheduler(host_rate=1000, host_burst=10)
+
+    with patch('app.crawler.capture_screenshot', AsyncMock(return_value='/tmp/shot.png')):
+        async with StaticFetcher() as fetcher:
+            results = await crawl_single_site(context, site, scheduler, fetcher=fetcher, tiers=tiers)
+
+    assert results['emails'] == ['hello@example.com']
+    # Homepage and the JS-rendered /about page need the browser, /contact does not
+    # Discovery asked for robots.txt and /sitemap.xml, and probed /contact and /about
+    assert tiers == Counter(http=1, browser=2, discovery=4)
+    visited = [call.args[0] for call in page.goto.call_args_list]
+    assert visited == [site, f'{site}/about']
+
+
+@pytest.mark.asyncio
+async def test_large_pages_are_read_whole_up_to_the_limit():
+    body = f'<html><body>{FILLER * 2000}<p>footer@example.com</p></body></html>'
+
+    async def page(request):
+        return web.Response(text=body, content_type='text/html')
+
+    app = web.Application()
+    app.router.add_get('/', page)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    url = f'http://127.0.0.1:{runner.addresses[0][1]}/'
+    try:
+        async with StaticFetcher() as fetcher:
+            assert (await fetcher.fetch(url)) == body
+        async with StaticFetcher(max_bytes=len(body) - 1) as fetcher:
+            assert await fetcher.fetch(url) is None
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,49 @@
+from app.frontier import Frontier, found_targets, url_key
+
+BASE = 'https://example.com'
+
+
+def test_url_key_canonicalizes():
+    assert url_key('HTTPS://Example.com:443/Contact/?b=2&a=1#form') == 'https://example.com/contact?a=1&b=2'
+    assert url_key('http://example.com:80/') == 'http://example.com'
+    assert url_key('http://example.com:8080/about') == 'http://example.com:8080/about'
+    assert url_key('http://example.com:bad/') is None
+
+
+def test_frontier_ranks_contact_pages_first_and_dedups():
+    frontier = Frontier(BASE, max_depth=2, max_pages=10)
+    assert frontier.pop_batch(5) == [(BASE, 0)]
+
+    assert frontier.add(f'{BASE}/team', 1)
+    assert frontier.add(f'{BASE}/about-us', 1)
+    assert frontier.add(f'{BASE}/contact', 1)
+    assert not frontier.add(f'{BASE}/Contact/#form', 1)
+    assert not frontier.add(f'{BASE}/contact', 1)
+    assert not frontier.add(f'{BASE}/', 1)
+    assert not frontier.add(f'{BASE}/blog', 1)
+    assert not frontier.add('https://other.com/contact', 1)
+    assert not frontier.add('https://example.com:8443/about', 1)
+    assert not frontier.add('http://www.example.com/contact', 1)
+    assert not frontier.add(f'{BASE}/contact/deep', 3)
+    assert frontier.add(f'{BASE}/support', 2)
+    assert frontier.add(f'{BASE}/contact-sales', 2)
+    assert frontier.add('http://www.example.com/connect', 1)
+
+    assert frontier.pop_batch(10) == [
+        (f'{BASE}/contact', 1), (f'{BASE}/contact-sales', 2), (f'{BASE}/about-us', 1),
+        (f'{BASE}/team', 1), (f'{BASE}/support', 2), ('http://www.example.com/connect', 1),
+    ]
+
+
+def test_frontier_respects_page_budget():
+    frontier = Frontier(BASE, max_depth=2, max_pages=3)
+    frontier.pop_batch(1)
+    for n in range(5):
+        frontier.add(f'{BASE}/contact/{n}', 1)
+    assert len(frontier.pop_batch(10)) == 2
+    assert frontier.pop_batch(10) == []
+
+
+def test_found_targets():
+    assert not found_targets({'emails': {'a@a.com'}, 'facebook': set()}, ('emails', 'facebook'))
+    assert found_targets({'emails': {'a@a.com'}, 'facebook': {'fb'}}, ('emails', 'facebook'))
@@ -0,0 +1,221 @@
+import asyncio
+import threading
+import pytest
+from aiohttp import web
+from app import host_health, storage
+from app.crawler import CrawlScheduler, crawl_single_site
+from app.fetcher import StaticFetcher
+from app.host_health import HOST_TIMEOUT_INITIAL_MS, HostHealth, HostUnavailable
+from app.screenshot import ScreenshotSettings
+from unittest.mock import AsyncMock
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def health(clock, monkeypatch):
+    health = HostHealth(shared=False, clock=clock)
+    monkeypatch.setattr(host_health, '_default_health', health)
+    monkeypatch.setattr(host_health, 'RETRY_BACKOFF', 0)
+    return health
+
+
+def test_timeouts_adapt_to_each_host(health):
+    assert health.timeout_ms('https://new.example.com') == HOST_TIMEOUT_INITIAL_MS
+    for elapsed in (900, 1100, 1000, 1000):
+        health.record_success('https://fast.example.com/page', elapsed)
+    fast = health.timeout_ms('https://fast.example.com')
+    assert host_health.HOST_TIMEOUT_MIN_MS <= fast < HOST_TIMEOUT_INITIAL_MS
+
+    # A timeout buys the next attempt more time, until the host answers again
+    health.record_failure('https://fast.example.com', asyncio.TimeoutError())
+    assert health.timeout_ms('https://fast.example.com') == 2 * fast
+    # Plain HTTP responses are tracked apart from browser loads
+    assert health.timeout_ms('https://fast.example.com', 'http') == HOST_TIMEOUT_INITIAL_MS
+
+
+def test_circuit_opens_after_repeated_failures_and_probes_after_cooldown(health, clock):
+    url = 'https://down.example.com/contact'
+    for _ in range(host_health.HOST_FAILURE_THRESHOLD - 1):
+        health.record_failure(url, Exception('net::ERR_CONNECTION_REFUSED'))
+    assert health.allow(url)
+    health.record_failure(url, Exception('net::ERR_CONNECTION_REFUSED'))
+    assert not health.allow(url)
+    assert not health.available('https://down.example.com')
+    assert health.allow('https://up.example.com')
+
+    # After the cooldown one probe goes through; its failure reopens the circuit for longer
+    clock.now += host_health.HOST_OPEN_SECONDS
+    assert health.available(url)
+    assert health.allow(url)
+    assert not health.allow(url)
+    health.record_failure(url, Exception('net::ERR_CONNECTION_REFUSED'))
+    clock.now += host_health.HOST_OPEN_SECONDS
+    assert not health.allow(url)
+
+    clock.now += host_health.HOST_OPEN_SECONDS
+    assert health.allow(url)
+    health.record_success(url, 500)
+    assert health.allow(url) and health.allow(url)
+
+
+def test_open_circuits_are_shared_between_processes(tmp_path, monkeypatch, clock):
+    monkeypatch.setattr(storage, 'DB_PATH', str(tmp_path / 'jobs.db'))
+    worker_a = HostHealth(clock=clock)
+    worker_b = HostHealth(clock=clock)
+    assert worker_b.allow('https://down.example.com')
+
+    for _ in range(host_health.HOST_FAILURE_THRESHOLD):
+        worker_a.record_failure('https://down.example.com', asyncio.TimeoutError())
+    clock.now += host_health.HOST_HEALTH_SYNC
+    assert not worker_b.allow('https://down.example.com/about')
+
+    # Closed by a successful probe anywhere, the circuit stays closed for newcomers
+    clock.now += host_health.HOST_OPEN_SECONDS
+    assert worker_a.allow('https://down.example.com')
+    worker_a.record_success('https://down.example.com', 800)
+    assert HostHealth(clock=clock).allow('https://down.example.com')
+
+
+@pytest.mark.asyncio
+async def test_shared_state_is_read_and_written_off_the_event_loop(tmp_path, monkeypatch, clock):
+    monkeypatch.setattr(storage, 'DB_PATH', str(tmp_path / 'jobs.db'))
+    worker_a = HostHealth(clock=clock)
+    threads = []
+    write_circuit = worker_a._write_circuit
+
+    def recording_write(*args):
+        threads.append(threading.current_thread())
+        write_circuit(*args)
+
+    monkeypatch.setattr(worker_a, '_write_circuit', recording_write)
+
+    for _ in range(host_health.HOST_FAILURE_THRESHOLD):
+        worker_a.record_failure('https://down.example.com', asyncio.TimeoutError())
+    worker_a.wait_idle()
+    assert threads and threading.current_thread() not in threads
+
+    worker_b = HostHealth(clock=clock)
+    worker_b.available('https://down.example.com')
+    worker_b.wait_idle()
+    assert not worker_b.allow('https://down.example.com')
+
+
+@pytest.mark.asyncio
+async def test_server_errors_count_as_failures(health):
+    async def busy(request):
+        return web.Response(status=503, text='Service unavailable')
+
+    app = web.Application()
+    app.router.add_get('/{path:.*}', busy)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    url = f'http://127.0.0.1:{runner.addresses[0][1]}'
+    try:
+        async with StaticFetcher() as fetcher:
+            for n in range(host_health.HOST_FAILURE_THRESHOLD):
+                assert await fetcher.fetch_page(f'{url}/page-{n}') is None
+    finally:
+        await runner.cleanup()
+
+    # The static tier is off for the host, but the browser may still load it
+    assert not health.allow(url, 'http')
+    assert health.available(url)
+    # Error answers don't pass for fast ones
+    assert health.timeout_ms(url, 'http') == HOST_TIMEOUT_INITIAL_MS
+
+
+def flaky_context(errors):
+    """Mock browser context whose page loads raise the next of `errors` (None loads the page)"""
+    loaded = []
+    context = AsyncMock()
+
+    async def new_page():
+        page = AsyncMock()
+
+        async def goto(url, **kwargs):
+            loaded.append(url)
+            error = errors.pop(0) if errors else None
+            if error is not None:
+                raise error
+
+        page.goto = goto
+        page.content.return_value = '<p>hello@example.com</p>'
+        page.eval_on_selector_all.return_value = []
+        return page
+
+    context.new_page = new_page
+    return context, loaded
+
+
+@pytest.mark.asyncio
+async def test_transient_load_errors_are_retried(health):
+    context, loaded = flaky_context([Exception('net::ERR_CONNECTION_RESET at https://example.com')])
+    results = await crawl_single_site(context, 'https://example.com', CrawlScheduler(host_rate=1000, host_burst=10),
+                                      screenshots=ScreenshotSettings(mode='off'))
+
+    assert loaded == ['https://example.com', 'https://example.com']
+    assert results['emails'] == ['hello@example.com']
+
+
+@pytest.mark.asyncio
+async def test_permanent_errors_and_spent_budgets_are_not_retried(health, monkeypatch):
+    scheduler = CrawlScheduler(host_rate=1000, host_burst=10)
+    context, loaded = flaky_context([Exception('net::ERR_NAME_NOT_RESOLVED')])
+    await crawl_single_site(context, 'https://gone.example.com', scheduler, screenshots=ScreenshotSettings(mode='off'))
+    assert loaded == ['https://gone.example.com']
+
+    monkeypatch.setattr(host_health, 'HOST_RETRY_BUDGET', 0)
+    health = HostHealth(shared=False)
+    monkeypatch.setattr(host_health, '_default_health', health)
+    context, loaded = flaky_context([asyncio.TimeoutError()])
+    await crawl_single_site(context, 'https://slow.example.com', scheduler, screenshots=ScreenshotSettings(mode='off'))
+    assert loaded == ['https://slow.example.com']
+
+
+@pytest.mark.asyncio
+async def test_sites_refusing_plain_http_are_still_crawled_in_the_browser(health):
+    async def busy(request):
+        return web.Response(status=503, text='Service unavailable')
+
+    app = web.Application()
+    app.router.add_get('/{path:.*}', busy)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    url = f'http://127.0.0.1:{runner.addresses[0][1]}'
+    context, loaded = flaky_context([])
+    try:
+        async with StaticFetcher() as fetcher:
+            # robots.txt, sitemaps and path probes all get 503 before the homepage is tried
+            results = await crawl_single_site(context, url, CrawlScheduler(host_rate=1000, host_burst=10),
+                                              fetcher=fetcher, screenshots=ScreenshotSettings(mode='off'))
+    finally:
+        await runner.cleanup()
+
+    assert loaded == [url]
+    assert results['emails'] == ['hello@example.com']
+    assert health.available(url)
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_the_site_fast(health):
+    for _ in range(host_health.HOST_FAILURE_THRESHOLD):
+        health.record_failure('https://down.example.com', asyncio.TimeoutError())
+    context, loaded = flaky_context([])
+
+    with pytest.raises(HostUnavailable):
+        await crawl_single_site(context, 'https://down.example.com', CrawlScheduler(host_rate=1000, host_burst=10))
+    assert loaded == []
@@ -0,0 +1,122 @@
+import io
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app import ingest, storage
+from app.ingest import UrlIngest, iter_upload_urls, submit_ingest
+from app.job_queue import SQLiteJobQueue
+from app.routes import router
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'DB_PATH', str(tmp_path / 'jobs.db'))
+    storage.init_db()
+
+
+def upload_urls(data, format, chunk_size=7):
+    return list(iter_upload_urls(io.BytesIO(data.encode()), format, chunk_size))
+
+
+def test_csv_is_parsed_across_chunks():
+    data = '﻿url,name\nexample.com,"Example, Inc"\n"https://b.com/x","two\nlines"\n\nc.org\n'
+    assert upload_urls(data, 'csv') == ['url', 'example.com', 'https://b.com/x', 'c.org']
+
+
+def test_json_arrays_and_objects_are_streamed_an_item_at_a_time():
+    urls = ['a.com', {'url': 'https://b.com', 'note': 'x' * 50}, 12345, None, 'c.com']
+    assert upload_urls(json.dumps(urls), 'json') == ['a.com', 'https://b.com', None, None, 'c.com']
+
+    document = {'source': {'name': 'crm', 'rows': [1, 2, 3]}, 'urls': ['d.com', 'e.com'], 'after': True}
+    assert upload_urls(json.dumps(document, indent=2), 'json') == ['d.com', 'e.com']
+    assert upload_urls('[]', 'json') == []
+
+    with pytest.raises(ValueError):
+        upload_urls('["a.com", "b.com"', 'json')
+    with pytest.raises(ValueError):
+        upload_urls('"a.com"', 'json')
+
+
+def test_long_json_arrays_are_decoded_in_runs_of_items():
+    urls = [f'https://site-{n}.com/?a=1,b={n}' if n % 7 else {'url': f'site-{n}.com', 'tags': [1, 2]}
+            for n in range(3000)]
+    expected = [url if isinstance(url, str) else url['url'] for url in urls]
+    for chunk_size in (1000, 5000, 1 << 20):
+        assert upload_urls(json.dumps(urls), 'json', chunk_size) == expected
+
+
+def test_ndjson_skips_lines_that_are_not_json():
+    data = '"a.com"\n{"url": "b.com"}\nnot json\n\n{"other": 1}\n'
+    assert upload_urls(data, 'ndjson') == ['a.com', 'b.com', None, None]
+
+
+def test_urls_are_cleaned_and_kept_once_per_site():
+    with UrlIngest() as urls:
+        urls.add_all(['example.com', 'https://www.Example.com/contact', 'http://example.com:80', None, 'nope',
+                      'example.com:8080', 'b.com'])
+        assert list(urls.urls()) == ['https://example.com', 'https://example.com:8080', 'https://b.com']
+        assert urls.stats() == {'urls': 3, 'duplicates': 2, 'invalid': 2}
+
+
+def test_small_inputs_make_a_single_job(db):
+    queue = SQLiteJobQueue()
+    with UrlIngest() as urls:
+        urls.add_all(['a.com', 'b.com'])
+        job_id, children = submit_ingest(urls, {'max_age': None}, batch_size=2, queue=queue)
+
+    assert children == []
+    assert queue.claim('worker').payload == {'urls': ['https://a.com', 'https://b.com'], 'max_age': None}
+
+
+def test_large_inputs_are_split_into_child_jobs(db):
+    queue = SQLiteJobQueue()
+    with UrlIngest() as urls:
+        urls.add_all([f'site-{n}.com' for n in range(5)])
+        parent_id, children = submit_ingest(urls, {}, batch_size=2, queue=queue)
+
+    assert len(children) == 3
+    parent = storage.get_job(parent_id)
+    assert parent['status'] == 'processing'
+    assert parent['stats'] == {'urls': 5, 'duplicates': 0, 'invalid': 0, 'child_jobs': 3}
+    assert [queue.claim('worker').payload['urls'] for _ in children] == [
+        ['https://site-0.com', 'https://site-1.com'], ['https://site-2.com', 'https://site-3.com'], ['https://site-4.com']
+    ]
+
+    # Children report through the parent and finish it together
+    revision = storage.get_job_revision(parent_id)
+    for n, child_id in enumerate(children):
+        url = f'https://site-{2 * n}.com'
+        storage.update_job(child_id, 'Completed', url, 'completed')
+        storage.update_job(child_id, 'Done', overall_status='completed' if n else 'failed',
+                           results={url: {'emails': [f'info@site-{2 * n}.com']}})
+        if n < 2:
+            assert storage.get_job(parent_id)['status'] == 'processing'
+
+    parent = storage.get_job(parent_id)
+    assert parent['status'] == 'completed'
+    assert parent['children'] == {children[0]: 'failed', children[1]: 'completed', children[2]: 'completed'}
+    assert sorted(parent['progress']) == ['https://site-0.com', 'https://site-2.com', 'https://site-4.com']
+    assert list(parent['results']) == ['https://site-0.com', 'https://site-2.com', 'https://site-4.com']
+    assert storage.get_job_revision(parent_id) > revision
+    assert list(storage.get_job(parent_id, since=revision)['progress']) != []
+    # Finished children aren't remembered
+    assert not set(children) & set(storage._parents)
+
+
+def test_upload_route_splits_and_reports_counts(db, monkeypatch):
+    monkeypatch.setattr(ingest, 'JOB_MAX_URLS', 2)
+    app = FastAPI()
+    app.include_router(router, prefix='/api')
+    client = TestClient(app)
+    data = '\n'.join(['url', 'a.com', 'www.a.com', 'b.com', 'c.com'])
+
+    response = client.post('/api/submit-urls', files={'file': ('sites.csv', data, 'text/csv')})
+    body = response.json()
+    assert response.status_code == 200
+    assert body['urls'] == 3 and body['duplicates'] == 1 and body['invalid'] == 1
+    assert len(body['child_job_ids']) == 2
+
+    assert client.post('/api/submit-urls', files={'file': ('sites.json', '["a.com"', 'application/json')}).status_code == 400
+    assert client.post('/api/submit-urls', files={'file': ('sites.xml', '<a/>', 'text/xml')}).status_code == 400
+    assert client.post('/api/submit-urls', params={'urls': ['nope']}).status_code == 400
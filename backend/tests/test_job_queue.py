@@ -0,0 +1,137 @@
+import asyncio
+from contextlib import asynccontextmanager
+import pytest
+from app import crawler, job_queue, storage
+from app.cleanup import cleanup_old_jobs
+from app.job_queue import SQLiteJobQueue
+from app.worker import CrawlWorker
+from unittest.mock import AsyncMock
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'DB_PATH', str(tmp_path / 'jobs.db'))
+    storage.init_db()
+    return SQLiteJobQueue(visibility_timeout=60)
+
+
+def test_claim_is_exclusive_and_completes(queue):
+    queue.enqueue('job-1', {'urls': ['https://example.com']})
+    assert queue.depth() == 1
+
+    job = queue.claim('worker-a')
+    assert job.job_id == 'job-1'
+    assert job.payload == {'urls': ['https://example.com']}
+    assert job.attempts == 1
+    assert queue.claim('worker-b') is None
+
+    assert queue.heartbeat('job-1', 'worker-a')
+    assert not queue.heartbeat('job-1', 'worker-b')
+    queue.complete('job-1', 'worker-a')
+    assert queue.claim('worker-b') is None
+    assert queue.depth() == 0
+
+
+def test_failed_jobs_retry_until_attempts_run_out(queue, monkeypatch):
+    monkeypatch.setattr('app.job_queue.retry_delay', lambda attempts: 0)
+    queue.enqueue('job-1', {'urls': []}, max_attempts=2)
+
+    assert queue.fail('job-1', 'worker-a', 'boom') is False  # not claimed by worker-a
+    queue.claim('worker-a')
+    assert queue.fail('job-1', 'worker-a', 'boom') is True
+    job = queue.claim('worker-b')
+    assert job.attempts == 2
+    assert queue.fail('job-1', 'worker-b', 'boom again') is False
+    assert queue.claim('worker-c') is None
+
+
+def test_stale_jobs_are_reclaimed_then_reaped(queue):
+    queue.visibility_timeout = -1  # every running job is already stale
+    queue.enqueue('job-1', {'urls': []}, max_attempts=2)
+
+    queue.claim('worker-a')
+    job = queue.claim('worker-b')
+    assert job.job_id == 'job-1' and job.attempts == 2
+    assert not queue.heartbeat('job-1', 'worker-a')
+
+    assert queue.claim('worker-c') is None
+    assert queue.reap() == ['job-1']
+
+
+def test_cleanup_prunes_queue_entries_with_their_jobs(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, '_default_queue', queue)
+    for job_id in ('old-done', 'old-running', 'recent'):
+        storage.store_job(job_id, {})
+        queue.enqueue(job_id, {'urls': []})
+    queue.claim('worker-a')
+    queue.complete('old-done', 'worker-a')
+    queue.claim('worker-a')
+    with storage.db_connection() as conn:
+        conn.execute("UPDATE jobs SET created_at = datetime('now', '-8 days') WHERE id LIKE 'old-%'")
+        conn.commit()
+
+    cleanup_old_jobs()
+
+    with storage.db_connection() as conn:
+        rows = conn.execute('SELECT job_id FROM job_queue ORDER BY job_id').fetchall()
+    # A worker may still be running its job
+    assert [row[0] for row in rows] == ['old-running', 'recent']
+
+
+@pytest.mark.asyncio
+async def test_worker_runs_jobs_and_records_failures(queue, monkeypatch):
+    monkeypatch.setattr('app.job_queue.retry_delay', lambda attempts: 0)
+    crawled = []
+
+    async def crawl(job_id, urls):
+        crawled.append((job_id, urls))
+        if job_id == 'bad':
+            raise RuntimeError('crawl failed')
+
+    storage.store_job('good', {})
+    storage.store_job('bad', {})
+    queue.enqueue('good', {'urls': ['https://a.com']})
+    queue.enqueue('bad', {'urls': ['https://b.com']}, max_attempts=1)
+    worker = CrawlWorker(queue, 'worker-a', crawl=crawl, heartbeat_interval=0.01)
+
+    assert await worker.run_once()
+    assert await worker.run_once()
+    assert not await worker.run_once()
+    assert crawled == [('good', ['https://a.com']), ('bad', ['https://b.com'])]
+    assert storage.get_job('good')['status'] == 'processing'
+    assert storage.get_job('bad')['status'] == 'failed'
+    assert queue.depth() == 0
+
+
+class BrokenPool:
+    @asynccontextmanager
+    async def lease(self):
+        raise RuntimeError('browser failed to start')
+        yield
+
+
+@pytest.mark.asyncio
+async def test_only_the_worker_marks_a_job_failed(queue, monkeypatch):
+    monkeypatch.setattr('app.job_queue.retry_delay', lambda attempts: 0)
+    statuses = []
+    update_job = crawler.update_job
+
+    def recording_update(job_id, *args, **kwargs):
+        statuses.append(kwargs.get('overall_status'))
+        update_job(job_id, *args, **kwargs)
+
+    monkeypatch.setattr(crawler, 'update_job', recording_update)
+
+    def crawl(job_id, urls, **options):
+        return crawler.crawl_website(job_id, urls, BrokenPool(), AsyncMock(), **options)
+
+    storage.store_job('job-1', {})
+    queue.enqueue('job-1', {'urls': ['https://a.com']}, max_attempts=2)
+    worker = CrawlWorker(queue, 'worker-a', crawl=crawl, heartbeat_interval=0.01)
+
+    # A failed attempt that will be retried never reports the job as failed
+    assert await worker.run_once()
+    assert storage.get_job('job-1')['status'] == 'pending'
+    assert await worker.run_once()
+    assert storage.get_job('job-1')['status'] == 'failed'
+    assert 'failed' not in statuses
@@ -0,0 +1,128 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, patch
+from app import crawl_cache, metrics, storage
+from app.crawler import CrawlScheduler, crawl_website, phase_ms
+from app.metrics import Counter, Gauge, Histogram, render_metrics, start_trace, timed, timed_calls
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(metrics, '_registry', [])
+
+
+def test_metrics_render_in_prometheus_text_format(registry):
+    for phase in ('goto', 'content'):
+        histogram = Histogram('test_phase_ms', 'Time per phase', (10, 100), {'phase': phase})
+    histogram.observe(5)
+    histogram.observe(100)
+    histogram.observe(1000)
+    Counter('test_pages_total', 'Pages loaded').inc(3)
+    Gauge('test_queue_depth', 'Jobs queued', callback=lambda: 7)
+
+    assert render_metrics().splitlines() == [
+        '# HELP test_phase_ms Time per phase',
+        '# TYPE test_phase_ms histogram',
+        'test_phase_ms_bucket{phase="goto",le="10"} 0',
+        'test_phase_ms_bucket{phase="goto",le="100"} 0',
+        'test_phase_ms_bucket{phase="goto",le="+Inf"} 0',
+        'test_phase_ms_sum{phase="goto"} 0',
+        'test_phase_ms_count{phase="goto"} 0',
+        'test_phase_ms_bucket{phase="content",le="10"} 1',
+        'test_phase_ms_bucket{phase="content",le="100"} 2',
+        'test_phase_ms_bucket{phase="content",le="+Inf"} 3',
+        'test_phase_ms_sum{phase="content"} 1105',
+        'test_phase_ms_count{phase="content"} 3',
+        '# HELP test_pages_total Pages loaded',
+        '# TYPE test_pages_total counter',
+        'test_pages_total 3',
+        '# HELP test_queue_depth Jobs queued',
+        '# TYPE test_queue_depth gauge',
+        'test_queue_depth 7',
+    ]
+
+
+def test_timers_record_phases_into_the_current_trace(registry):
+    histogram = Histogram('test_ms', 'Test', (10,))
+
+    async def site():
+        trace = start_trace()
+        with timed(histogram, 'goto'):
+            pass
+        # Tasks started from here add to the same trace
+        await asyncio.gather(*(phase() for _ in range(2)))
+        return trace
+
+    async def phase():
+        with timed(histogram, 'content'):
+            await asyncio.sleep(0)
+
+    trace = asyncio.run(site())
+    assert {phase: entry['count'] for phase, entry in trace.summary().items()} == {'goto': 1, 'content': 2}
+    assert histogram.count == 3
+    # Outside the traced task nothing is traced
+    with timed(histogram, 'goto'):
+        pass
+    assert trace.summary()['goto']['count'] == 1
+
+
+def test_disabled_metrics_leave_hot_paths_untouched(registry, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_ENABLED', False)
+    histogram = Histogram('test_ms', 'Test', (10,))
+
+    def query():
+        return 'rows'
+
+    assert timed_calls(histogram)(query) is query
+    with timed(histogram, 'goto'):
+        pass
+    histogram.observe(5)
+    counter = Counter('test_total', 'Test')
+    counter.inc()
+    gauge = Gauge('test_in_flight', 'Test')
+    gauge.inc()
+    gauge.dec()
+    gauge.dec()
+    assert histogram.count == 0 and counter.value == 0 and gauge.value == 0
+
+
+class LeasePool:
+    def lease(self):
+        context = AsyncMock()
+        context.new_page.return_value.content.return_value = '<p>info@a.com</p>'
+        context.new_page.return_value.eval_on_selector_all.return_value = []
+        pool = AsyncMock()
+        pool.__aenter__.return_value = context
+        return pool
+
+
+def test_traced_jobs_store_phase_timings_with_their_progress(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'DB_PATH', str(tmp_path / 'jobs.db'))
+    monkeypatch.setattr(crawl_cache, 'CRAWL_CACHE_ENABLED', False)
+    storage.init_db()
+    storage.store_job('job-1', {})
+    goto_count = phase_ms['goto'].count
+
+    fetcher = AsyncMock()
+    fetcher.fetch_page.return_value = None
+    fetcher.fetch_file.return_value = None
+    with patch('app.crawler.get_scheduler', lambda: CrawlScheduler(host_rate=1000, host_burst=10)), \
+            patch('app.crawler.capture_screenshot', AsyncMock(return_value=None)):
+        asyncio.run(crawl_website('job-1', ['https://a.com'], LeasePool(), fetcher, trace=True))
+
+    progress = storage.get_job('job-1')['progress']['https://a.com']
+    assert progress['status'] == 'completed'
+    assert {'slot', 'lease', 'goto', 'screenshot', 'content', 'extract', 'discover', 'site'} <= set(progress['trace'])
+    assert progress['trace']['goto'] == {'count': 1, 'ms': progress['trace']['goto']['ms']}
+    assert phase_ms['goto'].count == goto_count + 1
+
+
+def test_metrics_endpoint_serves_the_registry():
+    from app.main import app
+
+    response = TestClient(app).get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    assert 'crawl_phase_ms_bucket{phase="goto",le="+Inf"}' in response.text
+    assert '# TYPE job_db_ms histogram' in response.text
@@ -0,0 +1,116 @@
+import json
+import shutil
+import subprocess
+import pytest
+from unittest.mock import AsyncMock, patch
+from app import page_extraction
+from app.crawler import CrawlScheduler, crawl_single_site
+from app.extractor import contact_info_from_collector, contact_info_from_payload, parse_page
+from app.page_extraction import extract_in_page, script_args
+
+
+def payload_from_html(html, links=()):
+    """What the in-page script returns for a page, built from the HTML parser"""
+    collector = parse_page(html)
+    return {
+        'text': ''.join(collector.text),
+        'truncated': False,
+        'meta': collector.meta,
+        'anchors': [[href, ''.join(parts), aria] for href, parts, aria in collector.anchors],
+        'links': list(links),
+    }
+
+
+def test_payload_gives_same_contact_info_as_parsing_html():
+    html = '''
+        <html><head><meta name="author" content="meta@example.com"></head>
+        <body>
+            <p>Write to sales [at] example [dot] com</p>
+            <script>hidden@example.com</script>
+            <a href="https://www.facebook.com/company/">fb</a>
+            <a href="/x" aria-label="Instagram">@company</a>
+        </body></html>
+    '''
+    assert contact_info_from_payload(payload_from_html(html)) == contact_info_from_collector(parse_page(html))
+
+
+def test_script_args_filter_on_the_sites_canonical_host():
+    args = script_args('HTTPS://Example.com:443/home')
+    assert args['host'] == 'example.com'
+    assert 'contact' in args['keywords']
+    assert 'script' in args['nonText']
+    assert script_args('http://example.com:8080')['host'] == 'example.com:8080'
+    assert script_args('https://www.example.com')['host'] == 'example.com'
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='needs node to run the page script')
+def test_script_keeps_links_to_the_sites_www_twin():
+    hrefs = ['https://example.com/contact', 'http://www.example.com/about-us', 'https://other.com/contact',
+             'https://www.example.com/blog']
+    # Just enough of a document for the link part of the script
+    program = f'''
+        const anchors = {json.dumps(hrefs)}.map(href => ({{ href, textContent: "", getAttribute: () => href }}));
+        global.document = {{ documentElement: null, querySelectorAll: s => s === "a[href]" ? anchors : [] }};
+        const extract = {page_extraction.PAGE_EXTRACT_SCRIPT};
+        console.log(JSON.stringify(extract({json.dumps(script_args('https://www.example.com'))}).links));
+    '''
+    output = subprocess.run(['node', '-e', program], capture_output=True, text=True, check=True).stdout
+    assert json.loads(output) == ['https://example.com/contact', 'http://www.example.com/about-us']
+
+
+@pytest.mark.asyncio
+async def test_extract_in_page_makes_one_evaluate_call():
+    page = AsyncMock()
+    page.evaluate.return_value = payload_from_html('<p>info@example.com</p>', ['https://example.com/contact'])
+
+    contact_info, links = await extract_in_page(page, 'https://example.com', with_links=False)
+
+    assert contact_info['emails'] == {'info@example.com'}
+    assert links == ['https://example.com/contact']
+    assert page.evaluate.await_count == 1
+    assert page.evaluate.await_args.args[1]['withLinks'] is False
+    page.content.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_extract_in_page_gives_up_when_the_script_fails(monkeypatch):
+    page = AsyncMock()
+    page.evaluate.side_effect = Exception('Execution context was destroyed')
+    assert await extract_in_page(page, 'https://example.com') is None
+
+    monkeypatch.setattr(page_extraction, 'IN_PAGE_EXTRACTION', False)
+    page.evaluate.side_effect = None
+    assert await extract_in_page(page, 'https://example.com') is None
+
+
+@pytest.mark.asyncio
+async def test_crawler_uses_in_page_payload_instead_of_the_dom():
+    base = 'https://example.com'
+    payloads = {
+        base: payload_from_html('<a href="https://tiktok.com/@co">t</a>', [f'{base}/contact']),
+        f'{base}/contact': payload_from_html('<p>sales@example.com</p>'),
+    }
+    context = AsyncMock()
+
+    async def new_page():
+        page = AsyncMock()
+
+        async def goto(url, **kwargs):
+            page.url = url
+
+        async def evaluate(script, args):
+            return payloads[page.url]
+
+        page.goto = goto
+        page.evaluate = evaluate
+        return page
+
+    context.new_page = new_page
+    scheduler = CrawlScheduler(host_rate=1000, host_burst=10)
+    with patch('app.crawler.capture_screenshot', AsyncMock(return_value='/tmp/shot.png')), \
+            patch('app.crawler.extract_page_async') as parse:
+        results = await crawl_single_site(context, base, scheduler)
+
+    parse.assert_not_called()
+    assert results['emails'] == ['sales@example.com']
+    assert results['tiktok'] == ['https://tiktok.com/@co']
@@ -0,0 +1,102 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app import export_cache, storage
+from app.export_cache import ExportCache
+from app.routes import router
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'DB_PATH', str(tmp_path / 'jobs.db'))
+    storage.init_db()
+    storage.store_job('job-1', {})
+    app = FastAPI()
+    app.include_router(router, prefix='/api')
+    return TestClient(app)
+
+
+def test_job_status_etag_and_304(client):
+    storage.update_job('job-1', 'Completed', 'https://a.com', 'completed')
+    storage.write_buffer.flush()
+    response = client.get('/api/job-status/job-1')
+    assert response.status_code == 200
+    assert 'results' not in response.json()
+    etag = response.headers['etag']
+
+    assert client.get('/api/job-status/job-1', headers={'If-None-Match': etag}).status_code == 304
+
+    storage.update_job('job-1', 'Completed', 'https://b.com', 'completed')
+    storage.write_buffer.flush()
+    changed = client.get('/api/job-status/job-1', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['etag'] != etag
+
+
+def test_job_status_since_returns_only_changed_rows(client):
+    storage.update_job('job-1', 'Completed', 'https://a.com', 'completed')
+    storage.write_buffer.flush()
+    first = client.get('/api/job-status/job-1').json()
+    storage.update_job('job-1', 'Completed', 'https://b.com', 'completed')
+    storage.write_buffer.flush()
+
+    delta = client.get(f'/api/job-status/job-1?since={first["revision"]}').json()
+    assert list(delta['progress']) == ['https://b.com']
+    assert delta['revision'] > first['revision']
+    assert client.get(f'/api/job-status/job-1?since={delta["revision"]}').json()['progress'] == {}
+
+
+def test_job_status_results_only_on_request(client):
+    storage.update_job('job-1', 'Done', overall_status='completed', results={'https://a.com': {'emails': ['a@a.com']}})
+    plain = client.get('/api/job-status/job-1')
+    full = client.get('/api/job-status/job-1?include_results=true')
+    assert 'results' not in plain.json()
+    assert full.json()['results'] == {'https://a.com': {'emails': ['a@a.com']}}
+    assert plain.headers['etag'] != full.headers['etag']
+    assert client.get('/api/job-status/missing').status_code == 404
+
+
+def test_export_builds_once_and_serves_from_cache(client, tmp_path, monkeypatch):
+    cache = ExportCache(str(tmp_path / 'exports'))
+    monkeypatch.setattr(export_cache, '_default_cache', cache)
+    assert client.get('/api/export/job-1?format=csv').status_code == 404
+    storage.update_job('job-1', 'Done', overall_status='completed', results={
+        'https://a.com': {'emails': ['a@a.com'], 'facebook': [], 'instagram': [], 'tiktok': [], 'screenshots': {}}
+    })
+
+    response = client.get('/api/export/job-1?format=csv')
+    assert response.headers['content-type'].startswith('text/csv')
+    assert 'results.csv' in response.headers['content-disposition']
+    assert response.text.splitlines()[1] == 'https://a.com,a@a.com,,,,'
+    assert client.get('/api/export/job-1?format=csv').text == response.text
+    assert cache.stats()['builds'] == 1
+    assert cache.stats()['hits'] == 1
+
+    excel = client.get('/api/export/job-1?format=excel')
+    assert 'results.xlsx' in excel.headers['content-disposition']
+    assert excel.content[:2] == b'PK'
+    assert client.get('/api/export/job-1?format=txt').status_code == 422
+
+
+def test_results_are_paged_filtered_and_projected(client):
+    storage.update_job('job-1', 'Done', overall_status='completed', results={
+        f'https://site-{n}.com': {'emails': [f'info@site-{n}.com'] if n % 2 else [], 'facebook': [],
+                                  'instagram': [], 'tiktok': [], 'screenshots': {}}
+        for n in range(5)
+    })
+
+    first = client.get('/api/jobs/job-1/results?limit=2&has_email=true&total=true').json()
+    assert [item['url'] for item in first['items']] == ['https://site-1.com', 'https://site-3.com']
+    assert first['total'] == 2
+    rest = client.get(f'/api/jobs/job-1/results?limit=2&has_email=true&cursor={first["next_cursor"]}').json()
+    assert rest['items'] == [] and rest['next_cursor'] is None
+
+    compact = client.get('/api/jobs/job-1/results?sort=url&order=desc&limit=1&fields=emails').json()
+    assert compact['items'] == [{'position': 4, 'url': 'https://site-4.com', 'emails': []}]
+    searched = client.get('/api/jobs/job-1/results?q=INFO@SITE-3').json()
+    assert [item['url'] for item in searched['items']] == ['https://site-3.com']
+
+    assert client.get('/api/jobs/job-1/results?fields=emails,html').status_code == 400
+    assert client.get('/api/jobs/job-1/results?cursor=nonsense').status_code == 400
+    assert client.get('/api/jobs/job-1/results?platform=myspace').status_code == 422
+    assert client.get('/api/jobs/missing/results').status_code == 404
@@ -0,0 +1,93 @@
+import io
+import pytest
+from unittest.mock import AsyncMock, patch
+from PIL import Image
+from app import screenshot
+from app.crawler import CrawlScheduler, crawl_single_site
+from app.screenshot import ScreenshotSettings, ScreenshotStore, capture_screenshot
+
+
+def encoded(format, size=(1280, 800)):
+    output = io.BytesIO()
+    Image.new('RGB', size, (20, 120, 200)).save(output, format=format)
+    return output.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ScreenshotStore(str(tmp_path / 'shots'))
+    monkeypatch.setattr(screenshot, '_default_store', store)
+    return store
+
+
+def fake_page(data, page_size=(1280, 20000)):
+    page = AsyncMock()
+    page.screenshot.return_value = data
+    page.evaluate.return_value = list(page_size)
+    return page
+
+
+@pytest.mark.asyncio
+async def test_viewport_jpeg_is_encoded_by_the_browser(store):
+    page = fake_page(encoded('JPEG'))
+    before = screenshot.capture_bytes['viewport'].count
+
+    path = await capture_screenshot(page, 'https://a.com', ScreenshotSettings('viewport', 'jpeg', quality=60))
+
+    assert path.startswith(store.directory) and path.endswith('.jpg')
+    assert page.screenshot.await_args.kwargs == {'type': 'jpeg', 'quality': 60}
+    page.evaluate.assert_not_called()
+    assert screenshot.capture_bytes['viewport'].count == before + 1
+    assert screenshot.capture_bytes['viewport'].labels == {'mode': 'viewport'}
+
+
+@pytest.mark.asyncio
+async def test_full_page_is_cut_at_max_height(store):
+    page = fake_page(encoded('PNG'))
+    await capture_screenshot(page, 'https://a.com', ScreenshotSettings('full', 'png', max_height=3000))
+
+    options = page.screenshot.await_args.kwargs
+    assert options['full_page'] is True
+    assert options['clip'] == {'x': 0, 'y': 0, 'width': 1280, 'height': 3000}
+
+    page = fake_page(encoded('PNG'), page_size=(1280, 900))
+    await capture_screenshot(page, 'https://a.com', ScreenshotSettings('full', 'png', max_height=3000))
+    assert page.screenshot.await_args.kwargs['clip']['height'] == 900
+
+
+@pytest.mark.asyncio
+async def test_webp_is_transcoded_from_the_browsers_png(store):
+    page = fake_page(encoded('PNG'))
+    path = await capture_screenshot(page, 'https://a.com', ScreenshotSettings('viewport', 'webp'))
+
+    assert page.screenshot.await_args.kwargs == {'type': 'png'}
+    with Image.open(path) as image:
+        assert image.format == 'WEBP'
+        assert image.size == (1280, 800)
+
+
+@pytest.mark.asyncio
+async def test_screenshots_off_skips_the_capture(store):
+    page = fake_page(b'')
+    assert await capture_screenshot(page, 'https://a.com', ScreenshotSettings('off')) is None
+    page.screenshot.assert_not_called()
+
+    with pytest.raises(ValueError):
+        ScreenshotSettings('thumbnail')
+
+
+@pytest.mark.asyncio
+async def test_crawl_without_screenshots_renders_homepage_for_content_only():
+    context = AsyncMock()
+    page = context.new_page.return_value
+    page.evaluate.return_value = {'text': 'info@a.com', 'meta': [], 'anchors': [], 'links': []}
+    capture = AsyncMock()
+
+    with patch('app.crawler.capture_screenshot', capture), patch('app.crawler.load_page') as load:
+        results = await crawl_single_site(context, 'https://a.com', CrawlScheduler(host_rate=1000),
+                                          screenshots=ScreenshotSettings('off'))
+
+    capture.assert_not_called()
+    assert load.call_args.args[2].name == 'content'
+    assert results['emails'] == ['info@a.com']
+    assert results['screenshots'] == {}
@@ -0,0 +1,186 @@
+import threading
+import pytest
+from app import storage
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'DB_PATH', str(tmp_path / 'jobs.db'))
+    storage.init_db()
+    storage.store_job('job-1', {})
+    return storage
+
+
+def test_connections_are_reused_per_thread_and_use_wal(db):
+    with db.db_connection() as first, db.db_connection() as second:
+        assert first is second
+        assert first.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(db.db_connection().__enter__()))
+    thread.start()
+    thread.join()
+    assert other[0] is not first
+
+
+def test_readers_see_buffered_progress_once_it_is_flushed(db):
+    db.update_job('job-1', 'Processing', 'https://a.com', 'processing')
+    db.update_job('job-1', 'Completed', 'https://a.com', 'completed', stats={'fetch_tiers': {'http': 1}})
+    assert db.write_buffer.pending()
+
+    # Polling doesn't write the batch early
+    assert db.get_job('job-1')['progress'] == {}
+    assert db.write_buffer.pending()
+
+    db.write_buffer.flush()
+    job = db.get_job('job-1')
+    assert job['progress'] == {'https://a.com': {'status': 'completed', 'message': 'Completed'}}
+    assert job['stats'] == {'fetch_tiers': {'http': 1}}
+    assert not db.write_buffer.pending()
+
+
+def test_failed_batches_are_put_back(db, monkeypatch):
+    db.update_job('job-1', 'Processing', 'https://a.com', 'processing')
+    db.update_job('job-1', 'Processing', 'https://b.com', 'processing')
+    write = db.write_buffer._write
+
+    def locked_write(*batch):
+        # A newer row arriving while the batch is being written
+        db.update_job('job-1', 'Completed', 'https://b.com', 'completed')
+        raise db.sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(db.write_buffer, '_write', locked_write)
+    with pytest.raises(db.sqlite3.OperationalError):
+        db.write_buffer.flush()
+    assert db.write_buffer.pending()
+
+    monkeypatch.setattr(db.write_buffer, '_write', write)
+    db.write_buffer.flush()
+    assert db.get_job('job-1')['progress'] == {
+        'https://a.com': {'status': 'processing', 'message': 'Processing'},
+        'https://b.com': {'status': 'completed', 'message': 'Completed'},
+    }
+
+
+def test_job_status_changes_flush_progress_first(db):
+    db.update_job('job-1', 'Completed', 'https://a.com', 'completed')
+    db.update_job('job-1', 'All URLs processed', overall_status='completed', results={'https://a.com': {}})
+    assert not db.write_buffer.pending()
+
+    with db.db_connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM progress').fetchone()[0] == 1
+        assert conn.execute("SELECT status FROM jobs WHERE id = 'job-1'").fetchone()[0] == 'completed'
+
+
+def test_concurrent_writers_lose_nothing(db):
+    def write(n):
+        for i in range(200):
+            db.update_job('job-1', 'Completed', f'https://site-{n}-{i}.com', 'completed')
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    db.write_buffer.flush()
+    assert len(db.get_job('job-1')['progress']) == 800
+
+
+def site_result(emails=(), facebook=()):
+    return {'emails': list(emails), 'facebook': list(facebook), 'instagram': [], 'tiktok': [], 'screenshots': {}}
+
+
+def test_site_results_are_saved_as_they_finish_and_read_in_submission_order(db):
+    db.save_site_result('job-1', 'https://b.com', 1, site_result(['info@b.com']))
+    db.save_site_result('job-1', 'https://a.com', 0, site_result(['info@a.com']))
+    # Visible with the next batch, before the job finishes
+    db.write_buffer.flush()
+    assert list(db.get_job('job-1')['results']) == ['https://a.com', 'https://b.com']
+
+    db.save_site_result('job-1', 'https://c.com', 2, site_result())
+    db.write_buffer.flush()
+    page, cursor = db.get_site_results('job-1', limit=2)
+    assert [row['url'] for row in page] == ['https://a.com', 'https://b.com']
+    rest, cursor = db.get_site_results('job-1', after=cursor)
+    assert [row['url'] for row in rest] == ['https://c.com'] and cursor is None
+
+    # A retried site replaces its row and its contacts
+    db.save_site_result('job-1', 'https://b.com', 1, site_result(['sales@b.com']))
+    db.write_buffer.flush()
+    assert [contact['value'] for contact in db.get_contacts('job-1', kind='email')] == ['info@a.com', 'sales@b.com']
+
+
+def test_contacts_are_paginated_and_found_by_domain(db):
+    db.store_job('job-2', {})
+    db.update_job('job-1', 'Done', overall_status='completed', results={
+        'https://a.com': site_result(['x@a.com', 'y@a.com'], ['https://www.facebook.com/a']),
+        'https://b.com': site_result(['x@Shared.com']),
+    })
+    db.update_job('job-2', 'Done', overall_status='completed', results={'https://c.com': site_result(['z@shared.com'])})
+
+    first = db.get_contacts('job-1', limit=2)
+    assert [(contact['kind'], contact['value']) for contact in first] == [('email', 'x@Shared.com'), ('email', 'x@a.com')]
+    rest = db.get_contacts('job-1', after=first[-1])
+    assert [(contact['kind'], contact['value'], contact['site']) for contact in rest] == [
+        ('email', 'y@a.com', 'https://a.com'), ('facebook', 'https://www.facebook.com/a', 'https://a.com')
+    ]
+    assert [contact['value'] for contact in db.get_contacts('job-1', domain='a.com')] == ['x@a.com', 'y@a.com']
+    assert db.find_jobs_with_domain('shared.com') == ['job-1', 'job-2']
+    assert db.find_jobs_with_domain('shared.com', after='job-1') == ['job-2']
+    assert db.find_jobs_with_domain('facebook.com') == ['job-1']
+
+
+def test_jobs_with_a_results_document_are_still_readable(db):
+    with db.db_connection() as conn:
+        conn.execute("UPDATE jobs SET results = ? WHERE id = 'job-1'", ('{"https://a.com": {"emails": []}}',))
+        conn.commit()
+    assert db.get_job('job-1')['results'] == {'https://a.com': {'emails': []}}
+
+
+def test_older_site_rows_are_backfilled_once(db):
+    db.update_job('job-1', 'Done', results={'https://a.com': site_result(['x@a.com'])})
+    with db.db_connection() as conn:
+        conn.execute("UPDATE site_results SET emails = NULL, search = NULL")
+        conn.execute('PRAGMA user_version = 0')
+        conn.commit()
+
+    db.init_db()
+    assert db.count_site_results('job-1', has_email=True) == 1
+    assert db.count_site_results('job-1', search='x@a') == 1
+
+    with db.db_connection() as conn:
+        conn.execute("UPDATE site_results SET search = NULL")
+        conn.commit()
+    db.init_db()
+    with db.db_connection() as conn:
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == db.SCHEMA_VERSION
+        assert conn.execute('SELECT search FROM site_results').fetchone()[0] is None
+
+
+def test_site_results_are_sorted_filtered_and_projected(db):
+    db.update_job('job-1', 'Done', overall_status='completed', results={
+        'https://c.com': site_result(['a@c.com', 'b@c.com']),
+        'https://a.com': site_result(facebook=['https://facebook.com/a_b']),
+        'https://b.com': site_result(['x@b.com']),
+        'https://d.com': site_result(['y@d.com']),
+    })
+
+    def urls(**query):
+        pages, cursor = [], None
+        while True:
+            page, cursor = db.get_site_results('job-1', after=cursor, limit=2, **query)
+            pages += [row['url'] for row in page]
+            if cursor is None:
+                return pages
+
+    assert urls(sort='url') == ['https://a.com', 'https://b.com', 'https://c.com', 'https://d.com']
+    assert urls(sort='emails', descending=True) == ['https://c.com', 'https://d.com', 'https://b.com', 'https://a.com']
+    assert urls(has_email=True) == ['https://c.com', 'https://b.com', 'https://d.com']
+    assert urls(platform='facebook') == ['https://a.com']
+    assert urls(search='A_B') == ['https://a.com']
+    assert urls(search='%') == []
+    assert db.count_site_results('job-1', has_email=True) == 3
+
+    page, _ = db.get_site_results('job-1', limit=1, fields=('counts',))
+    assert page == [{'position': 0, 'url': 'https://c.com',
+                     'counts': {'emails': 2, 'facebook': 0, 'instagram': 0, 'tiktok': 0}}]
@@ -0,0 +1,59 @@
+import pytest
+from PIL import Image
+from app import thumbnails
+from app.thumbnails import ThumbnailPool, create_thumbnail, make_thumbnail
+
+
+def screenshot(path, width=1280, height=6000):
+    Image.new('RGBA', (width, height), (200, 30, 30, 255)).save(path)
+    return str(path)
+
+
+@pytest.mark.parametrize('format', ['jpeg', 'webp'])
+def test_thumbnail_keeps_the_top_of_the_page(tmp_path, format):
+    path = make_thumbnail(screenshot(tmp_path / 'page.png'), format=format, width=480, max_height=720)
+    assert path == str(tmp_path / f'page.thumb.{thumbnails.EXTENSIONS[format]}')
+    with Image.open(path) as image:
+        assert image.format == format.upper()
+        assert image.size == (480, 720)
+
+
+def test_short_narrow_screenshots_are_not_upscaled(tmp_path):
+    path = make_thumbnail(screenshot(tmp_path / 'page.png', 300, 200), width=480, max_height=720)
+    with Image.open(path) as image:
+        assert image.size == (300, 200)
+
+
+@pytest.mark.asyncio
+async def test_pool_creates_thumbnails_and_failures_return_none(tmp_path):
+    async with ThumbnailPool(mode='thread', workers=2) as pool:
+        thumbnails.set_thumbnail_pool(pool)
+        try:
+            assert await create_thumbnail(screenshot(tmp_path / 'page.png')) == str(tmp_path / 'page.thumb.jpg')
+            assert await create_thumbnail(str(tmp_path / 'missing.png')) is None
+        finally:
+            thumbnails.set_thumbnail_pool(None)
+    assert pool.stats()['created'] == 1
+    assert pool.stats()['errors'] == 1
+
+
+def test_tall_screenshots_are_cut_to_their_top(tmp_path):
+    path = tmp_path / 'page.png'
+    image = Image.new('RGB', (100, 1000), (255, 255, 255))
+    image.paste((0, 0, 255), (0, 0, 100, 150))
+    image.save(path)
+
+    thumb = make_thumbnail(str(path), width=100, max_height=150)
+    with Image.open(thumb) as image:
+        assert image.size == (100, 150)
+        red, green, blue = image.getpixel((50, 140))
+        assert blue > 200 and red < 50
+
+
+def test_jpeg_screenshots_are_decoded_at_reduced_scale(tmp_path):
+    path = tmp_path / 'page.jpg'
+    Image.new('RGB', (1920, 8000), (30, 30, 200)).save(path, quality=80)
+
+    thumb = make_thumbnail(str(path), width=480, max_height=720)
+    with Image.open(thumb) as image:
+        assert image.size == (480, 720)
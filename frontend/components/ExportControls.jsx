@@ -1,3 +1,5 @@
+const FILE_EXTENSIONS = { csv: 'csv', excel: 'xlsx', pdf: 'pdf' };
+
 export default function ExportControls({ jobId }) {
   const [isExporting, setIsExporting] = useState(false);
   
@@ -16,7 +18,10 @@ export default function ExportControls({ jobId }) {
       const url = window.URL.createObjectURL(blob);
       const a = document.createElement('a');
       a.href = url;
-      a.download = `contact-extraction-${jobId}.${format}`;
+      // Large PDF reports arrive as a zip of parts
+      const disposition = response.headers.get('content-disposition') || '';
+      const extension = /filename="?[^";]*\.(\w+)"?/.exec(disposition)?.[1] || FILE_EXTENSIONS[format];
+      a.download = `contact-extraction-${jobId}.${extension}`;
       document.body.appendChild(a);
       a.click();
       a.remove();
@@ -8,22 +8,37 @@ export default function ProgressTracker({ jobId, onComplete, onError }) {
   useEffect(() => {
     if (!jobId) return;
     
+    // Revision of the last payload; later polls only fetch rows changed since then
+    let revision = null;
+    let etag = null;
+    
     const interval = setInterval(() => {
-      fetch(`/api/job-status/${jobId}`)
+      const query = revision === null ? '' : `?since=${revision}`;
+      fetch(`/api/job-status/${jobId}${query}`, {
+        headers: etag ? { 'If-None-Match': etag } : {}
+      })
         .then(response => {
+          if (response.status === 304) {
+            return null;
+          }
           if (!response.ok) {
             throw new Error('Failed to fetch job status');
           }
+          etag = response.headers.get('etag');
           return response.json();
         })
         .then(data => {
-          setProgress(data.progress || {});
-          setOverallStatus(data.status || 'pending');
           setLastUpdate(new Date());
+          if (!data) return;
+          
+          revision = data.revision;
+          setProgress(previous => ({ ...previous, ...(data.progress || {}) }));
+          setOverallStatus(data.status || 'pending');
           
           if (data.status === 'completed') {
             clearInterval(interval);
-            onComplete(data.results);
+            // The results table pages through the results itself
+            onComplete();
           } else if (data.status === 'failed') {
             clearInterval(interval);
             onError(data.message || 'Job failed');
@@ -1,45 +1,86 @@
-import { useState, useMemo } from 'react';
-import { format } from 'date-fns';
+import { useState, useEffect } from 'react';
 
-export default function ResultsTable({ data }) {
+const PAGE_SIZE = 10;
+// Only what the table shows is sent by the server
+const FIELDS = 'emails,facebook,instagram,tiktok,screenshots';
+
+export default function ResultsTable({ jobId }) {
   const [filter, setFilter] = useState('');
-  const [currentPage, setCurrentPage] = useState(1);
+  const [search, setSearch] = useState('');
+  const [contactFilter, setContactFilter] = useState('');
+  const [sort, setSort] = useState('position');
+  // Cursor of every page up to the current one, so Previous can go back
+  const [cursors, setCursors] = useState([null]);
+  const [page, setPage] = useState({ items: [], next_cursor: null });
+  const [total, setTotal] = useState(null);
+  const [loading, setLoading] = useState(false);
   const [selectedSite, setSelectedSite] = useState(null);
-  const itemsPerPage = 10;
+  const currentPage = cursors.length;
   
-  // Flatten data for table
-  const tableData = useMemo(() => {
-    return Object.entries(data).map(([url, result]) => ({
-      url,
-      emails: result.emails,
-      facebook: result.facebook,
-      instagram: result.instagram,
-      tiktok: result.tiktok,
-      screenshot: result.screenshots?.homepage,
-      timestamp: result.timestamp
-    }));
-  }, [data]);
+  // Search once typing pauses
+  useEffect(() => {
+    const next = filter.trim();
+    if (next === search) return;
+    const timeout = setTimeout(() => {
+      setSearch(next);
+      setCursors([null]);
+    }, 300);
+    return () => clearTimeout(timeout);
+  }, [filter, search]);
   
-  // Apply filtering
-  const filteredData = useMemo(() => {
-    if (!filter) return tableData;
+  useEffect(() => {
+    if (!jobId) return;
     
-    const lowerFilter = filter.toLowerCase();
-    return tableData.filter(item => 
-      item.url.toLowerCase().includes(lowerFilter) ||
-      item.emails.some(email => email.toLowerCase().includes(lowerFilter)) ||
-      item.facebook.some(fb => fb.toLowerCase().includes(lowerFilter)) ||
-      item.instagram.some(ig => ig.toLowerCase().includes(lowerFilter)) ||
-      item.tiktok.some(tt => tt.toLowerCase().includes(lowerFilter))
-    );
-  }, [tableData, filter]);
+    const params = new URLSearchParams({ limit: PAGE_SIZE, fields: FIELDS });
+    if (sort === 'emails') {
+      params.set('sort', 'emails');
+      params.set('order', 'desc');
+    } else {
+      params.set('sort', sort);
+    }
+    if (search) params.set('q', search);
+    if (contactFilter === 'email') params.set('has_email', 'true');
+    else if (contactFilter) params.set('platform', contactFilter);
+    const cursor = cursors[cursors.length - 1];
+    if (cursor) params.set('cursor', cursor);
+    // Matching sites are only counted for the first page of a query
+    if (!cursor) params.set('total', 'true');
+    
+    const controller = new AbortController();
+    setLoading(true);
+    fetch(`/api/jobs/${jobId}/results?${params}`, { signal: controller.signal })
+      .then(response => {
+        if (!response.ok) {
+          throw new Error('Failed to fetch results');
+        }
+        return response.json();
+      })
+      .then(data => {
+        setPage(data);
+        if (data.total !== undefined) setTotal(data.total);
+        setLoading(false);
+      })
+      .catch(error => {
+        if (error.name === 'AbortError') return;
+        console.error('Results error:', error);
+        setLoading(false);
+      });
+    
+    return () => controller.abort();
+  }, [jobId, search, contactFilter, sort, cursors]);
   
-  // Pagination
-  const totalPages = Math.ceil(filteredData.length / itemsPerPage);
-  const currentItems = filteredData.slice(
-    (currentPage - 1) * itemsPerPage,
-    currentPage * itemsPerPage
-  );
+  const resetPages = (setter) => (e) => {
+    setter(e.target.value);
+    setCursors([null]);
+  };
+  const goToNext = () => {
+    if (page.next_cursor) setCursors(previous => [...previous, page.next_cursor]);
+  };
+  const goToPrevious = () => {
+    setCursors(previous => (previous.length > 1 ? previous.slice(0, -1) : previous));
+  };
+  const firstShown = (currentPage - 1) * PAGE_SIZE + 1;
+  const lastShown = (currentPage - 1) * PAGE_SIZE + page.items.length;
   
   const renderSocialLinks = (links) => {
     if (links.length === 0) return '-';
@@ -70,7 +111,7 @@ export default function ResultsTable({ data }) {
               Extraction Results
             </h3>
             <p className="mt-1 text-sm text-gray-500">
-              {filteredData.length} websites processed
+              {total ?? '…'} websites {search || contactFilter ? 'match' : 'processed'}
             </p>
           </div>
           
@@ -80,11 +121,28 @@ export default function ResultsTable({ data }) {
               placeholder="Filter results..."
               className="border border-gray-300 rounded-md px-3 py-1 text-sm"
               value={filter}
-              onChange={(e) => {
-                setFilter(e.target.value);
-                setCurrentPage(1);
-              }}
+              onChange={(e) => setFilter(e.target.value)}
             />
+            <select
+              className="border border-gray-300 rounded-md px-2 py-1 text-sm"
+              value={contactFilter}
+              onChange={resetPages(setContactFilter)}
+            >
+              <option value="">All sites</option>
+              <option value="email">With email</option>
+              <option value="facebook">With Facebook</option>
+              <option value="instagram">With Instagram</option>
+              <option value="tiktok">With TikTok</option>
+            </select>
+            <select
+              className="border border-gray-300 rounded-md px-2 py-1 text-sm"
+              value={sort}
+              onChange={resetPages(setSort)}
+            >
+              <option value="position">Submission order</option>
+              <option value="url">Website</option>
+              <option value="emails">Most emails</option>
+            </select>
           </div>
         </div>
         
@@ -112,14 +170,11 @@ export default function ResultsTable({ data }) {
                 </th>
               </tr>
             </thead>
-            <tbody className="divide-y divide-gray-200 bg-white">
-              {currentItems.map((item) => (
+            <tbody className={`divide-y divide-gray-200 bg-white ${loading ? 'opacity-50' : ''}`}>
+              {page.items.map((item) => (
                 <tr key={item.url} className="hover:bg-gray-50">
                   <td className="whitespace-nowrap py-4 pl-4 pr-3 text-sm sm:pl-6">
                     <div className="font-medium text-gray-900">{item.url}</div>
-                    <div className="text-gray-500 text-xs mt-1">
-                      {format(new Date(item.timestamp), 'MMM d, yyyy h:mm a')}
-                    </div>
                   </td>
                   <td className="whitespace-normal px-3 py-4 text-sm text-gray-500">
                     {item.emails.length > 0 ? (
@@ -149,7 +204,7 @@ export default function ResultsTable({ data }) {
                     {renderSocialLinks(item.tiktok)}
                   </td>
                   <td className="whitespace-nowrap px-3 py-4 text-sm text-gray-500">
-                    {item.screenshot ? (
+                    {item.screenshots.homepage ? (
                       <button
                         onClick={() => setSelectedSite(item)}
                         className="text-blue-600 hover:underline"
@@ -170,15 +225,15 @@ export default function ResultsTable({ data }) {
         <div className="flex items-center justify-between border-t border-gray-200 px-4 py-3 sm:px-6">
           <div className="flex flex-1 justify-between sm:hidden">
             <button
-              onClick={() => setCurrentPage(p => Math.max(1, p - 1))}
+              onClick={goToPrevious}
               disabled={currentPage === 1}
               className="relative inline-flex items-center rounded-md border border-gray-300 bg-white px-4 py-2 text-sm font-medium text-gray-700 hover:bg-gray-50 disabled:opacity-50"
             >
               Previous
             </button>
             <button
-              onClick={() => setCurrentPage(p => Math.min(totalPages, p + 1))}
-              disabled={currentPage === totalPages}
+              onClick={goToNext}
+              disabled={!page.next_cursor}
               className="relative ml-3 inline-flex items-center rounded-md border border-gray-300 bg-white px-4 py-2 text-sm font-medium text-gray-700 hover:bg-gray-50 disabled:opacity-50"
             >
               Next
@@ -187,17 +242,24 @@ export default function ResultsTable({ data }) {
           <div className="hidden sm:flex sm:flex-1 sm:items-center sm:justify-between">
             <div>
               <p className="text-sm text-gray-700">
-                Showing <span className="font-medium">{(currentPage - 1) * itemsPerPage + 1}</span> to{' '}
-                <span className="font-medium">
-                  {Math.min(currentPage * itemsPerPage, filteredData.length)}
-                </span>{' '}
-                of <span className="font-medium">{filteredData.length}</span> results
+                {page.items.length > 0 ? (
+                  <>
+                    Showing <span className="font-medium">{firstShown}</span> to{' '}
+                    <span className="font-medium">{lastShown}</span>
+                    {total !== null && (
+                      <> of <span className="font-medium">{total}</span></>
+                    )}{' '}
+                    results
+                  </>
+                ) : (
+                  'No results'
+                )}
               </p>
             </div>
             <div>
               <nav className="isolate inline-flex -space-x-px rounded-md shadow-sm" aria-label="Pagination">
                 <button
-                  onClick={() => setCurrentPage(p => Math.max(1, p - 1))}
+                  onClick={goToPrevious}
                   disabled={currentPage === 1}
                   className="relative inline-flex items-center rounded-l-md px-2 py-2 text-gray-400 ring-1 ring-inset ring-gray-300 hover:bg-gray-50 focus:z-20 focus:outline-offset-0 disabled:opacity-50"
                 >
@@ -207,23 +269,13 @@ export default function ResultsTable({ data }) {
                   </svg>
                 </button>
                 
-                {Array.from({ length: totalPages }, (_, i) => i + 1).map(page => (
-                  <button
-                    key={page}
-                    onClick={() => setCurrentPage(page)}
-                    className={`relative inline-flex items-center px-4 py-2 text-sm font-semibold ${
-                      currentPage === page 
-                        ? 'z-10 bg-blue-600 text-white focus-visible:outline focus-visible:outline-2 focus-visible:outline-offset-2 focus-visible:outline-blue-600'
-                        : 'text-gray-900 ring-1 ring-inset ring-gray-300 hover:bg-gray-50 focus:outline-offset-0'
-                    }`}
-                  >
-                    {page}
-                  </button>
-                ))}
+                <span className="relative z-10 inline-flex items-center bg-blue-600 px-4 py-2 text-sm font-semibold text-white">
+                  {currentPage}
+                </span>
                 
                 <button
-                  onClick={() => setCurrentPage(p => Math.min(totalPages, p + 1))}
-                  disabled={currentPage === totalPages}
+                  onClick={goToNext}
+                  disabled={!page.next_cursor}
                   className="relative inline-flex items-center rounded-r-md px-2 py-2 text-gray-400 ring-1 ring-inset ring-gray-300 hover:bg-gray-50 focus:z-20 focus:outline-offset-0 disabled:opacity-50"
                 >
                   <span className="sr-only">Next</span>
@@ -253,9 +305,9 @@ export default function ResultsTable({ data }) {
               </button>
             </div>
             <div className="p-4">
-              {selectedSite.screenshot ? (
+              {selectedSite.screenshots.homepage ? (
                 <img 
-                  src={selectedSite.screenshot} 
+                  src={selectedSite.screenshots.homepage} 
                   alt={`Screenshot of ${selectedSite.url}`}
                   className="w-full h-auto border"
                 />
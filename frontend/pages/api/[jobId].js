@@ -1,3 +1,10 @@
+import { Readable } from 'stream';
+import { pipeline } from 'stream/promises';
+
+export const config = {
+  api: { responseLimit: false },
+};
+
 export default async function handler(req, res) {
   const { jobId } = req.query;
   const { format } = req.query;
@@ -19,18 +26,21 @@ export default async function handler(req, res) {
       throw new Error(`Backend error: ${error}`);
     }
     
-    // Get the blob and set appropriate headers
-    const blob = await backendResponse.blob();
+    // Pass the export through as it is generated instead of buffering it
     const contentType = backendResponse.headers.get('content-type');
-    
+    const disposition = backendResponse.headers.get('content-disposition');
+
     res.setHeader('Content-Type', contentType || 'application/octet-stream');
-    res.setHeader('Content-Disposition', `attachment; filename=export-${jobId}.${format}`);
-    
-    // Send the blob as response
-    const buffer = await blob.arrayBuffer();
-    res.send(Buffer.from(buffer));
+    res.setHeader('Content-Disposition', disposition || `attachment; filename=export-${jobId}.${format}`);
+
+    await pipeline(Readable.fromWeb(backendResponse.body), res);
   } catch (error) {
     console.error('Export API error:', error);
+    if (res.headersSent) {
+      // Failed mid-stream; all we can do is cut the download short
+      res.destroy(error);
+      return;
+    }
     res.status(500).json({ error: error.message });
   }
 }
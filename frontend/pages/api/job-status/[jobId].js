@@ -1,17 +1,34 @@
 export default async function handler(req, res) {
-  const { jobId } = req.query;
+  const { jobId, ...query } = req.query;
   
   if (req.method !== 'GET') {
     return res.status(405).json({ error: 'Method not allowed' });
   }
   
   try {
-    // Forward request to backend
-    const backendResponse = await fetch(`${process.env.BACKEND_URL}/api/job-status/${jobId}`, {
-      headers: {
-        'Authorization': `Bearer ${process.env.API_KEY}`
-      }
-    });
+    // Forward request to backend, keeping the delta cursor and ETag
+    const params = new URLSearchParams(query).toString();
+    const headers = {
+      'Authorization': `Bearer ${process.env.API_KEY}`
+    };
+    if (req.headers['if-none-match']) {
+      headers['If-None-Match'] = req.headers['if-none-match'];
+    }
+    
+    const backendResponse = await fetch(
+      `${process.env.BACKEND_URL}/api/job-status/${jobId}${params ? `?${params}` : ''}`,
+      { headers }
+    );
+    
+    const etag = backendResponse.headers.get('etag');
+    if (etag) {
+      res.setHeader('ETag', etag);
+    }
+    res.setHeader('Cache-Control', 'no-cache');
+    
+    if (backendResponse.status === 304) {
+      return res.status(304).end();
+    }
     
     if (!backendResponse.ok) {
       const error = await backendResponse.text();
@@ -0,0 +1,44 @@
+export default async function handler(req, res) {
+  const { jobId, ...query } = req.query;
+  
+  if (req.method !== 'GET') {
+    return res.status(405).json({ error: 'Method not allowed' });
+  }
+  
+  try {
+    // Forward the page request to the backend, which filters and sorts
+    const params = new URLSearchParams(query).toString();
+    const headers = {
+      'Authorization': `Bearer ${process.env.API_KEY}`
+    };
+    if (req.headers['if-none-match']) {
+      headers['If-None-Match'] = req.headers['if-none-match'];
+    }
+    
+    const backendResponse = await fetch(
+      `${process.env.BACKEND_URL}/api/jobs/${jobId}/results${params ? `?${params}` : ''}`,
+      { headers }
+    );
+    
+    const etag = backendResponse.headers.get('etag');
+    if (etag) {
+      res.setHeader('ETag', etag);
+    }
+    res.setHeader('Cache-Control', 'no-cache');
+    
+    if (backendResponse.status === 304) {
+      return res.status(304).end();
+    }
+    
+    if (!backendResponse.ok) {
+      const error = await backendResponse.text();
+      return res.status(backendResponse.status).json({ error: `Backend error: ${error}` });
+    }
+    
+    const data = await backendResponse.json();
+    res.status(200).json(data);
+  } catch (error) {
+    console.error('API error:', error);
+    res.status(500).json({ error: error.message });
+  }
+}
@@ -7,7 +7,8 @@ import ExportControls from '../components/ExportControls';
 
 export default function Home() {
   const [jobId, setJobId] = useState(null);
-  const [results, setResults] = useState(null);
+  const [completed, setCompleted] = useState(false);
+  const handleComplete = useCallback(() => setCompleted(true), []);
   
   const handleSubmit = useCallback(async (urls) => {
     try {
@@ -25,7 +26,7 @@ export default function Home() {
       
       const data = await response.json();
       setJobId(data.jobId);
-      setResults(null);
+      setCompleted(false);
     } catch (error) {
       console.error('Submission error:', error);
       alert(`Error: ${error.message}`);
@@ -55,11 +56,11 @@ export default function Home() {
               <div className="space-y-6">
                 <ProgressTracker 
                   jobId={jobId} 
-                  onComplete={setResults} 
+                  onComplete={handleComplete} 
                   onError={(error) => alert(`Job failed: ${error}`)}
                 />
                 
-                {results && (
+                {completed && (
                   <div className="mt-8">
                     <div className="flex justify-between items-center mb-4">
                       <h2 className="text-xl font-semibold text-gray-700">
@@ -67,7 +68,7 @@ export default function Home() {
                       </h2>
                       <ExportControls jobId={jobId} />
                     </div>
-                    <ResultsTable data={results} />
+                    <ResultsTable jobId={jobId} />
                   </div>
                 )}
               </div>